@@ -0,0 +1,220 @@
+"""
+Аналитика заполнения игр по истории: как быстро игры проходят путь
+«свободные места» -> «осталось мало мест» -> резерв, по местам и дням недели.
+
+Для каждой игры ведётся хронология уровней заполнения. Хронологии
+пополняются только новыми запусками из истории и сохраняются в
+data/analytics_index.json, поэтому запросы не перечитывают всю историю.
+
+    python src/analytics.py
+    python src/analytics.py --json
+"""
+
+import os
+import json
+import logging
+import argparse
+import statistics
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+
+from game_dates import parse_weekday
+
+logger = logging.getLogger(__name__)
+
+WEEKDAY_NAMES = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
+
+LEVEL_FREE = 'free'  # Свободные места
+LEVEL_FEW = 'few'  # Осталось мало мест
+LEVEL_RESERVE = 'reserve'  # Только резерв
+LEVEL_UNKNOWN = 'unknown'
+
+
+def fill_level(game: Dict) -> str:
+    """Уровень заполнения игры по статусу"""
+    status = (game.get('status') or '').lower()
+    if game.get('availability_type') == 'reserve' or 'резерв' in status or 'нет мест' in status:
+        return LEVEL_RESERVE
+    if 'мало мест' in status:
+        return LEVEL_FEW
+    if game.get('availability_type') == 'active':
+        return LEVEL_FREE
+    return LEVEL_UNKNOWN
+
+
+class FillRateAnalytics:
+    """Хронологии заполнения игр и статистика по ним"""
+
+    def __init__(self, history, index_file: str):
+        self.history = history
+        self.index_file = index_file
+        self.index = self._load()
+
+    def _load(self) -> Dict:
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.warning(f"Индекс аналитики повреждён, будет построен заново: {str(e)}")
+        return {'first_ts': None, 'last_ts': None, 'current': [], 'games': {}}
+
+    def _save(self) -> None:
+        tmp_path = f"{self.index_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_file)
+
+    def update(self) -> int:
+        """Добавление в хронологии запусков, появившихся после прошлого обновления"""
+        timelines = self.index['games']
+        processed = 0
+
+        for timestamp, games in self.history.iter_runs(since=self.index['last_ts']):
+            if self.index['first_ts'] is None:
+                self.index['first_ts'] = timestamp
+            for game in games:
+                level = fill_level(game)
+                timeline = timelines.get(game['id'])
+                if timeline is None:
+                    timeline = timelines[game['id']] = {
+                        'game_number': game.get('game_number', ''),
+                        'venue': game.get('place') or game.get('address') or 'Не указано',
+                        'weekday': parse_weekday(game.get('date', '')),
+                        'first_seen': timestamp,
+                        'levels': [[timestamp, level]],
+                        'flips': 0,
+                        'sold_out_at': timestamp if level == LEVEL_RESERVE else None,
+                    }
+                elif timeline['levels'][-1][1] != level:
+                    timeline['levels'].append([timestamp, level])
+                    timeline['flips'] += 1
+                    if level == LEVEL_RESERVE and not timeline['sold_out_at']:
+                        timeline['sold_out_at'] = timestamp
+                timeline['last_seen'] = timestamp
+            self.index['last_ts'] = timestamp
+            self.index['current'] = [game['id'] for game in games]
+            processed += 1
+
+        if processed:
+            self._save()
+            logger.info(f"Аналитика: обработано новых запусков - {processed}")
+        return processed
+
+    def _hours_to_sell_out(self, timeline: Dict) -> Optional[float]:
+        """
+        Часы от появления игры до резерва. Игры, которые уже были в первом
+        запуске истории или появились сразу в резерве, не учитываются:
+        момент их анонса неизвестен
+        """
+        if not timeline['sold_out_at'] or timeline['first_seen'] == self.index['first_ts']:
+            return None
+        if timeline['levels'][0][1] == LEVEL_RESERVE:
+            return None
+        delta = datetime.fromisoformat(timeline['sold_out_at']) - datetime.fromisoformat(timeline['first_seen'])
+        return delta.total_seconds() / 3600
+
+    def group_stats(self) -> List[Dict]:
+        """Время до резерва и число смен статуса по месту и дню недели"""
+        groups: Dict[Tuple[str, Optional[int]], Dict] = {}
+        for timeline in self.index['games'].values():
+            key = (timeline['venue'], timeline['weekday'])
+            group = groups.setdefault(key, {'games': 0, 'flips': 0, 'hours': []})
+            group['games'] += 1
+            group['flips'] += timeline['flips']
+            hours = self._hours_to_sell_out(timeline)
+            if hours is not None:
+                group['hours'].append(hours)
+
+        result = []
+        for (venue, weekday), group in sorted(groups.items(), key=lambda item: (item[0][0], item[0][1] or 0)):
+            hours = group['hours']
+            result.append({
+                'venue': venue,
+                'weekday': weekday,
+                'games': group['games'],
+                'sold_out': len(hours),
+                'median_hours_to_sell_out': round(statistics.median(hours), 1) if hours else None,
+                'avg_flips': round(group['flips'] / group['games'], 2),
+            })
+        return result
+
+    def forecast(self) -> List[Dict]:
+        """Ожидаемое время ухода в резерв для игр последнего запуска, где ещё есть места"""
+        by_group: Dict[Tuple, List[float]] = {}
+        by_venue: Dict[str, List[float]] = {}
+        overall: List[float] = []
+        for timeline in self.index['games'].values():
+            hours = self._hours_to_sell_out(timeline)
+            if hours is None:
+                continue
+            by_group.setdefault((timeline['venue'], timeline['weekday']), []).append(hours)
+            by_venue.setdefault(timeline['venue'], []).append(hours)
+            overall.append(hours)
+
+        now = datetime.fromisoformat(self.index['last_ts']) if self.index['last_ts'] else datetime.now()
+        forecasts = []
+        for game_id in self.index['current']:
+            timeline = self.index['games'].get(game_id)
+            if not timeline or timeline['levels'][-1][1] == LEVEL_RESERVE:
+                continue
+            sample = (by_group.get((timeline['venue'], timeline['weekday']))
+                      or by_venue.get(timeline['venue']) or overall)
+            if not sample:
+                continue
+            expected = datetime.fromisoformat(timeline['first_seen']) + timedelta(hours=statistics.median(sample))
+            forecasts.append({
+                'game_id': game_id,
+                'game_number': timeline['game_number'],
+                'venue': timeline['venue'],
+                'level': timeline['levels'][-1][1],
+                'expected_sell_out': expected.isoformat(timespec='minutes'),
+                'hours_left': round(max((expected - now).total_seconds() / 3600, 0.0), 1),
+                'based_on': len(sample),
+            })
+        forecasts.sort(key=lambda item: item['hours_left'])
+        return forecasts
+
+    def report(self) -> Dict:
+        return {'groups': self.group_stats(), 'forecast': self.forecast()}
+
+    def render_summary(self, limit: int = 10) -> str:
+        """Сводка для Telegram"""
+        lines = ["📈 *АНАЛИТИКА ЗАПОЛНЕНИЯ ИГР*", ""]
+        groups = [g for g in self.group_stats() if g['median_hours_to_sell_out'] is not None]
+        if groups:
+            lines.append("*Время до резерва (медиана):*")
+            for group in sorted(groups, key=lambda g: g['median_hours_to_sell_out'])[:limit]:
+                weekday = WEEKDAY_NAMES[group['weekday']] if group['weekday'] is not None else '?'
+                lines.append(f"• {group['venue']}, {weekday}: {group['median_hours_to_sell_out']} ч "
+                             f"({group['sold_out']} игр, смен статуса в среднем {group['avg_flips']})")
+        else:
+            lines.append("Пока недостаточно истории для статистики")
+
+        forecast = self.forecast()
+        if forecast:
+            lines.extend(["", "*Прогноз ухода в резерв:*"])
+            for item in forecast[:limit]:
+                lines.append(f"• {item['game_number']} ({item['venue']}): ~{item['hours_left']} ч")
+        return "\n".join(lines)
+
+
+def main():
+    from extract_classic_games import GameStorage
+
+    arg_parser = argparse.ArgumentParser(description="Аналитика заполнения игр по истории")
+    arg_parser.add_argument('--json', action='store_true', help="Вывести результат в JSON")
+    args = arg_parser.parse_args()
+
+    storage = GameStorage()
+    analytics = FillRateAnalytics(storage.history, os.path.join(storage.output_dir, 'analytics_index.json'))
+    analytics.update()
+
+    if args.json:
+        print(json.dumps(analytics.report(), ensure_ascii=False, indent=2))
+    else:
+        print(analytics.render_summary(limit=50).replace('*', ''))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Локальный HTTP API только для чтения: последнее расписание из памяти.
+
+Снимок расписания собирается один раз после каждого запуска мониторинга
+и подменяется целиком одной операцией присваивания, поэтому запросы
+никогда не видят наполовину обновлённые данные и не ходят на сайт.
+
+    GET /games?date=2026-10-24&status=active&venue=бар&max_price=700&type=music
+    GET /games/<id>
+    GET /health
+
+Ответы поддерживают ETag (304 Not Modified) и gzip.
+
+    python src/api_server.py --port 8080
+"""
+
+import os
+import json
+import gzip
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+
+from game_dates import parse_game_datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 8080,
+    'gzip_min_size': 1024,  # Меньшие ответы не сжимаются
+}
+
+# Сколько вариантов отфильтрованных ответов держать в снимке
+MAX_CACHED_QUERIES = 256
+
+
+class Response:
+    """Готовый ответ: тело, сжатое тело и ETag считаются один раз"""
+
+    def __init__(self, payload, status: int = 200, gzip_min_size: int = 1024):
+        self.status = status
+        self.body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:20] + '"'
+        self.gzip_body = gzip.compress(self.body, mtime=0) if len(self.body) >= gzip_min_size else None
+
+
+class ApiSnapshot:
+    """Неизменяемый снимок расписания с индексами для фильтров"""
+
+    def __init__(self, games: List[Dict], updated_at: str = None, gzip_min_size: int = 1024):
+        self.games = games
+        self.updated_at = updated_at or datetime.now().isoformat(timespec='seconds')
+        self.gzip_min_size = gzip_min_size
+        self.by_id = {game['id']: game for game in games}
+        self.by_status: Dict[str, List[Dict]] = {}
+        self.by_date: Dict[str, List[Dict]] = {}
+        for game in games:
+            self.by_status.setdefault(game.get('availability_type', 'unknown'), []).append(game)
+            start = parse_game_datetime(game.get('date', ''), game.get('time', ''))
+            if start:
+                self.by_date.setdefault(start.date().isoformat(), []).append(game)
+        self._responses: Dict[Tuple, Response] = {}
+
+    def _select(self, date: str = None, status: str = None, venue: str = None,
+                min_price: int = None, max_price: int = None, game_type: str = None) -> List[Dict]:
+        games = self.games
+        if date:
+            games = self.by_date.get(date, [])
+        if game_type:
+            games = [game for game in games if game.get('game_type', 'classic') == game_type]
+        if status:
+            allowed = {id(game) for game in self.by_status.get(status, [])}
+            games = [game for game in games if id(game) in allowed]
+        if venue:
+            venue = venue.lower()
+            games = [game for game in games
+                     if venue in (game.get('place') or '').lower() or venue in (game.get('address') or '').lower()]
+        if min_price is not None or max_price is not None:
+            games = [game for game in games if game.get('price_amount') is not None
+                     and (min_price is None or game['price_amount'] >= min_price)
+                     and (max_price is None or game['price_amount'] <= max_price)]
+        return games
+
+    def games_response(self, date: str = None, status: str = None, venue: str = None,
+                       min_price: int = None, max_price: int = None, game_type: str = None) -> Response:
+        """Список игр по фильтрам; ответ на одинаковый запрос собирается один раз"""
+        key = ('games', date, status, venue and venue.lower(), min_price, max_price, game_type)
+        response = self._responses.get(key)
+        if response is None:
+            games = self._select(date, status, venue, min_price, max_price, game_type)
+            response = Response({'updated_at': self.updated_at, 'count': len(games), 'games': games},
+                                gzip_min_size=self.gzip_min_size)
+            if len(self._responses) < MAX_CACHED_QUERIES:
+                self._responses[key] = response
+        return response
+
+    def game_response(self, game_id: str) -> Response:
+        game = self.by_id.get(game_id)
+        if game is None:
+            return Response({'error': 'not found'}, status=404)
+        key = ('game', game_id)
+        response = self._responses.get(key)
+        if response is None:
+            response = Response(game, gzip_min_size=self.gzip_min_size)
+            if len(self._responses) < MAX_CACHED_QUERIES:
+                self._responses[key] = response
+        return response
+
+    def health_response(self) -> Response:
+        return Response({'status': 'ok', 'updated_at': self.updated_at, 'count': len(self.games)})
+
+
+class SnapshotApi:
+    """Хранит текущий снимок; update подключается как слушатель снимков монитора"""
+
+    def __init__(self, config: Dict = None):
+        self.config = {**DEFAULT_API_CONFIG, **(config or {})}
+        self.snapshot = ApiSnapshot([], gzip_min_size=self.config['gzip_min_size'])
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def update(self, games: List) -> None:
+        """Сборка нового снимка и его атомарная подмена"""
+        games = [game if isinstance(game, dict) else game.to_dict() for game in games]
+        self.snapshot = ApiSnapshot(games, gzip_min_size=self.config['gzip_min_size'])
+        logger.info(f"🌐 API: снимок обновлён, игр - {len(games)}")
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._respond(with_body=True)
+
+            def do_HEAD(self):
+                self._respond(with_body=False)
+
+            def _respond(self, with_body: bool) -> None:
+                # Снимок берётся один раз: весь ответ строится по одной версии данных
+                snapshot = api.snapshot
+                url = urlparse(self.path)
+                path = url.path.rstrip('/')
+
+                if path == '/games':
+                    query = {name: values[0] for name, values in parse_qs(url.query).items()}
+                    try:
+                        prices = [int(query[name]) if query.get(name) else None
+                                  for name in ('min_price', 'max_price')]
+                    except ValueError:
+                        prices = None
+                    if prices is None:
+                        response = Response({'error': 'min_price и max_price должны быть целыми'}, status=400)
+                    else:
+                        response = snapshot.games_response(query.get('date'), query.get('status'),
+                                                           query.get('venue'), *prices, query.get('type'))
+                elif path.startswith('/games/'):
+                    response = snapshot.game_response(path[len('/games/'):])
+                elif path == '/health':
+                    response = snapshot.health_response()
+                else:
+                    response = Response({'error': 'not found'}, status=404)
+
+                use_gzip = response.gzip_body is not None and 'gzip' in self.headers.get('Accept-Encoding', '')
+                etag = response.etag[:-1] + '-gz"' if use_gzip else response.etag
+
+                if response.status == 200 and etag in self.headers.get('If-None-Match', ''):
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+
+                body = response.gzip_body if use_gzip else response.body
+                self.send_response(response.status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Vary', 'Accept-Encoding')
+                if use_gzip:
+                    self.send_header('Content-Encoding', 'gzip')
+                self.end_headers()
+                if with_body:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"API {self.address_string()} - {format % args}")
+
+        return Handler
+
+    def start(self) -> ThreadingHTTPServer:
+        """Запуск сервера в фоновом потоке"""
+        self.server = ThreadingHTTPServer((self.config['host'], self.config['port']), self._handler_class())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='api-server', daemon=True).start()
+        logger.info(f"🌐 API запущено: http://{self.config['host']}:{self.server.server_port}/games")
+        return self.server
+
+    def stop(self) -> None:
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def main():
+    """Отдельный режим: снимок берётся из сохранённого classic_games.json"""
+    from extract_classic_games import GameStorage, load_optional_config
+
+    config = {**DEFAULT_API_CONFIG, **load_optional_config('API_CONFIG')}
+    arg_parser = argparse.ArgumentParser(description="HTTP API с последним расписанием игр")
+    arg_parser.add_argument('--host', default=config['host'])
+    arg_parser.add_argument('--port', type=int, default=config['port'])
+    args = arg_parser.parse_args()
+
+    storage = GameStorage()
+    filepath = os.path.join(storage.output_dir, 'classic_games.json')
+    api = SnapshotApi({**config, 'host': args.host, 'port': args.port})
+    api.start()
+
+    mtime = None
+    while True:
+        current = os.path.getmtime(filepath) if os.path.exists(filepath) else None
+        if current != mtime:
+            mtime = current
+            api.update(storage.load_games())
+        time.sleep(5)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
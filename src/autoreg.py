@@ -0,0 +1,441 @@
+"""
+Автоматическая регистрация команды на отслеживаемые игры.
+
+Медленная часть (загрузка страницы регистрации, разбор формы, поиск полей,
+токенов и cookies) выполняется заранее, пока игра ещё в резерве. Когда игра
+становится доступной, остаётся один POST с уже собранными данными формы.
+
+Проверка на локальной копии страницы регистрации:
+    python src/autoreg.py --selftest
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+import requests
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Callable
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+# Признаки полей формы (ищутся в name, id и placeholder) для данных команды
+FIELD_KEYWORDS = {
+    'team_name': ['team', 'команд'],
+    'captain_name': ['captain', 'капитан', 'name', 'имя'],
+    'email': ['email', 'mail', 'почт'],
+    'phone': ['phone', 'tel', 'телефон'],
+    'players_count': ['count', 'players', 'member', 'количеств', 'участник'],
+    'comment': ['comment', 'коммент'],
+}
+
+# Признаки страницы об успешной записи, если сайт отвечает 200 без перенаправления
+DEFAULT_SUCCESS_MARKERS = ['спасибо', 'заявка принята', 'вы зарегистрированы', 'успешно']
+
+
+@dataclass
+class RegistrationForm:
+    """Заранее подготовленная форма: остаётся только отправить payload"""
+    game_id: str
+    action_url: str
+    method: str
+    payload: Dict[str, str]
+    fetched_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class RegistrationResult:
+    """Итог попытки регистрации"""
+    game_id: str
+    game_number: str
+    success: bool
+    status_code: int = 0
+    submit_ms: float = 0.0  # Длительность самого запроса
+    detection_to_submit_ms: float = 0.0  # От обнаружения свободных мест до отправки формы
+    error: str = ""
+    used_prefetched_form: bool = True
+
+    def to_telegram_message(self) -> str:
+        if self.success:
+            return (f"🤖 *АВТОРЕГИСТРАЦИЯ: УСПЕХ*\n"
+                    f"🎯 Игра {self.game_number}\n"
+                    f"⏱ Форма отправлена через {self.detection_to_submit_ms:.0f} мс после обнаружения")
+        return (f"🤖 *АВТОРЕГИСТРАЦИЯ: ОШИБКА*\n"
+                f"🎯 Игра {self.game_number}\n"
+                f"❌ {self.error or f'HTTP {self.status_code}'}")
+
+
+class AutoRegistrar:
+    """Регистрация команды на отслеживаемые игры"""
+
+    def __init__(self, config: Dict, state_file: str, session: requests.Session = None,
+                 on_result: Callable[[RegistrationResult], None] = None, transport=None):
+        self.team: Dict[str, str] = {k: str(v) for k, v in (config.get('team') or {}).items()}
+        self.watched = {str(number).lstrip('#') for number in config.get('watched_games', [])}
+        self.watch_all = bool(config.get('watch_all', False))
+        self.watch_types = set(config.get('game_types', ['classic']))  # Типы игр для watch_all
+        self.field_map: Dict[str, str] = config.get('field_map') or {}
+        self.action_url: Optional[str] = config.get('action_url')
+        self.form_ttl = config.get('form_ttl', 600)
+        self.timeout = config.get('timeout', 10)
+        self.success_statuses = set(config.get('success_statuses', [200, 201, 302, 303]))
+        self.success_markers = [marker.lower() for marker in
+                                config.get('success_markers', DEFAULT_SUCCESS_MARKERS)]
+        self.max_attempts = config.get('max_attempts', 5)
+        self.retry_delay = config.get('retry_delay', 60)
+        self.state_file = state_file
+        self.on_result = on_result
+        self.forms: Dict[str, RegistrationForm] = {}
+        # Неудачные попытки по играм: {'attempts': N, 'next_attempt_at': time.time()}
+        self.failures: Dict[str, Dict] = {}
+        self.registered = self._load_state()
+
+        # Транспорт парсера: страницы регистрации нескольких игр загружаются
+        # одним пакетом fetch_all (у httpx - параллельно по одному соединению HTTP/2)
+        self.transport = transport
+        self.session = session or requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
+            'Connection': 'keep-alive',
+        })
+
+    def _load_state(self) -> set:
+        if not os.path.exists(self.state_file):
+            return set()
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.failures = state.get('failures', {})
+            return set(state.get('registered', []))
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать состояние авторегистрации: {str(e)}")
+            return set()
+
+    def _save_state(self) -> None:
+        """Запись через временный файл: оборванная запись не стирает список регистраций"""
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'registered': sorted(self.registered), 'failures': self.failures},
+                      f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_file)
+
+    def is_watched(self, game) -> bool:
+        if game.id in self.registered or not game.registration_url or game.registration_url == '#':
+            return False
+        if self.max_attempts and self.failures.get(game.id, {}).get('attempts', 0) >= self.max_attempts:
+            return False
+        if game.game_number.lstrip('#') in self.watched:
+            return True
+        return self.watch_all and getattr(game, 'game_type', 'classic') in self.watch_types
+
+    def _backing_off(self, game) -> bool:
+        """Пауза после неудачной попытки ещё не истекла"""
+        return time.time() < self.failures.get(game.id, {}).get('next_attempt_at', 0)
+
+    def prepare(self, games: List) -> int:
+        """
+        Подготовка форм для отслеживаемых игр (вызывается между запусками):
+        прогревает соединение и кэширует токены и раскладку полей
+        """
+        now = time.time()
+        stale = []
+        for game in games:
+            if not self.is_watched(game):
+                continue
+            form = self.forms.get(game.id)
+            if form and now - form.fetched_at < self.form_ttl:
+                continue
+            stale.append(game)
+
+        if self.transport is not None and len(stale) > 1:
+            prepared = self._prefetch_all(stale)
+        else:
+            prepared = sum(1 for game in stale if self.prefetch(game))
+        if prepared:
+            logger.info(f"Авторегистрация: подготовлено форм - {prepared}")
+        return prepared
+
+    def prefetch(self, game) -> Optional[RegistrationForm]:
+        """Загрузка страницы регистрации и сборка данных формы"""
+        try:
+            response = self.session.get(game.registration_url, timeout=self.timeout)
+            response.raise_for_status()
+            form = self._build_form(game.id, response.url, response.text)
+            if form:
+                self.forms[game.id] = form
+            return form
+        except Exception as e:
+            logger.error(f"Не удалось подготовить форму для {game.game_number}: {str(e)}")
+            return None
+
+    def _prefetch_all(self, games: List) -> int:
+        """
+        Загрузка страниц регистрации одним пакетом через транспорт парсера.
+        Cookie сайта (сессия, CSRF) переносятся в сессию отправки формы
+        """
+        try:
+            pages = self.transport.fetch_all([game.registration_url for game in games], self.timeout)
+            for cookie in self.transport.cookie_jar():
+                self.session.cookies.set_cookie(cookie)
+        except Exception as e:
+            logger.error(f"Не удалось загрузить страницы регистрации: {str(e)}")
+            return 0
+
+        prepared = 0
+        for game in games:
+            page = pages.get(game.registration_url)
+            if page is None:
+                continue
+            try:
+                form = self._build_form(game.id, page.url, page.text)
+            except Exception as e:
+                logger.error(f"Не удалось подготовить форму для {game.game_number}: {str(e)}")
+                continue
+            if form:
+                self.forms[game.id] = form
+                prepared += 1
+        return prepared
+
+    def _build_form(self, game_id: str, page_url: str, html: str) -> Optional[RegistrationForm]:
+        soup = BeautifulSoup(html, 'html.parser')
+        try:
+            form_elem = next((f for f in soup.find_all('form')
+                              if f.find(['input', 'select', 'textarea'])), None)
+            if form_elem is None:
+                logger.warning(f"На странице {page_url} не найдена форма регистрации")
+                return None
+
+            # Поля со значениями по умолчанию, включая скрытые токены
+            payload: Dict[str, str] = {}
+            candidates: List[tuple] = []
+            for elem in form_elem.find_all(['input', 'select', 'textarea']):
+                name = elem.get('name')
+                if not name:
+                    continue
+                input_type = (elem.get('type') or 'text').lower()
+                if input_type in ('submit', 'button', 'image', 'file', 'reset'):
+                    continue
+                if input_type in ('checkbox', 'radio'):
+                    # Согласия на обработку данных и т.п. отмечаем
+                    if input_type == 'checkbox' or name not in payload:
+                        payload[name] = elem.get('value', 'on')
+                    continue
+                if elem.name == 'select':
+                    option = elem.find('option', selected=True) or elem.find('option')
+                    payload[name] = option.get('value', option.text.strip()) if option else ""
+                else:
+                    payload[name] = elem.get('value', elem.text if elem.name == 'textarea' else "")
+                if input_type != 'hidden':
+                    hint = ' '.join(filter(None, [name, elem.get('id'), elem.get('placeholder')])).lower()
+                    candidates.append((name, hint))
+
+            for team_key, field_name in self._map_fields(candidates).items():
+                if team_key in self.team:
+                    payload[field_name] = self.team[team_key]
+
+            action = self.action_url or urljoin(page_url, form_elem.get('action') or page_url)
+            method = (form_elem.get('method') or 'post').lower()
+            return RegistrationForm(game_id, action, method, payload)
+        finally:
+            soup.decompose()
+
+    def _map_fields(self, candidates: List[tuple]) -> Dict[str, str]:
+        """Соответствие данных команды полям формы: явное из конфигурации или по признакам"""
+        mapping = {key: name for key, name in self.field_map.items()}
+        used = set(mapping.values())
+        for team_key, keywords in FIELD_KEYWORDS.items():
+            if team_key in mapping:
+                continue
+            for name, hint in candidates:
+                if name not in used and any(keyword in hint for keyword in keywords):
+                    mapping[team_key] = name
+                    used.add(name)
+                    break
+        return mapping
+
+    def register(self, game, detected_at: float = None) -> Optional[RegistrationResult]:
+        """
+        Быстрый путь: один запрос с заранее собранной формой, без разбора HTML.
+        detected_at - time.monotonic() момента обнаружения свободных мест
+        """
+        if not self.is_watched(game) or self._backing_off(game):
+            return None
+
+        detected_at = detected_at or time.monotonic()
+        form = self.forms.get(game.id)
+        if form is not None and time.time() - form.fetched_at >= self.form_ttl:
+            # Токены устаревшей формы сайт может уже не принять
+            logger.info(f"Форма для {game.game_number} устарела, загружаем заново")
+            form = None
+        used_prefetched = form is not None
+        if form is None:
+            if game.id not in self.forms:
+                logger.warning(f"Форма для {game.game_number} не подготовлена заранее, загружаем сейчас")
+            form = self.prefetch(game)
+            if form is None:
+                return self._finish(RegistrationResult(game.id, game.game_number, False,
+                                                       error="форма регистрации не найдена",
+                                                       used_prefetched_form=False))
+
+        submit_started = time.monotonic()
+        try:
+            if form.method == 'get':
+                response = self.session.get(form.action_url, params=form.payload,
+                                            timeout=self.timeout, allow_redirects=False)
+            else:
+                response = self.session.post(form.action_url, data=form.payload,
+                                             timeout=self.timeout, allow_redirects=False)
+            finished = time.monotonic()
+            status_code = response.status_code
+            success = self._is_success(response)
+            error = "" if success or status_code not in self.success_statuses else \
+                "сайт не подтвердил запись (форма вернулась без перенаправления)"
+        except requests.RequestException as e:
+            finished = time.monotonic()
+            status_code = 0
+            success = False
+            error = str(e)
+
+        result = RegistrationResult(
+            game_id=game.id,
+            game_number=game.game_number,
+            success=success,
+            status_code=status_code,
+            submit_ms=(finished - submit_started) * 1000,
+            detection_to_submit_ms=(submit_started - detected_at) * 1000,
+            error=error,
+            used_prefetched_form=used_prefetched
+        )
+        return self._finish(result)
+
+    def _is_success(self, response: requests.Response) -> bool:
+        """
+        Запись подтверждена перенаправлением после отправки формы или признаком
+        успеха на странице. Ответ 200 без признака - обычно та же форма
+        с ошибками проверки
+        """
+        if response.status_code not in self.success_statuses:
+            return False
+        if response.is_redirect:
+            return True
+        text = response.text.lower()
+        return any(marker in text for marker in self.success_markers)
+
+    def _finish(self, result: RegistrationResult) -> RegistrationResult:
+        if result.success:
+            self.registered.add(result.game_id)
+            self.forms.pop(result.game_id, None)
+            self.failures.pop(result.game_id, None)
+            self._save_state()
+            logger.info(f"✅ Авторегистрация на {result.game_number}: форма отправлена через "
+                        f"{result.detection_to_submit_ms:.1f} мс, запрос {result.submit_ms:.1f} мс")
+        else:
+            # Следующая попытка - после паузы, которая удваивается; после max_attempts игра не отслеживается
+            failure = self.failures.setdefault(result.game_id, {'attempts': 0})
+            failure['attempts'] += 1
+            failure['next_attempt_at'] = time.time() + self.retry_delay * 2 ** (failure['attempts'] - 1)
+            # Форма могла устареть или не подойти: перед следующей попыткой загружается заново
+            form = self.forms.get(result.game_id)
+            if form:
+                form.fetched_at = 0
+            self._save_state()
+            if self.max_attempts and failure['attempts'] >= self.max_attempts:
+                result.error = f"{result.error or f'HTTP {result.status_code}'}; " \
+                               f"попытки исчерпаны ({failure['attempts']}), игра больше не отслеживается"
+            logger.error(f"❌ Авторегистрация на {result.game_number} не удалась "
+                         f"(попытка {failure['attempts']}): {result.error or result.status_code}")
+
+        if self.on_result:
+            try:
+                self.on_result(result)
+            except Exception as e:
+                logger.error(f"Ошибка при отправке результата авторегистрации: {str(e)}")
+        return result
+
+
+def run_selftest() -> bool:
+    """Проверка полного цикла на локальной копии страницы регистрации"""
+    import tempfile
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from urllib.parse import parse_qs
+    from types import SimpleNamespace
+
+    token = 'selftest-csrf-token'
+    submissions = []
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = (
+                '<html><body><form action="/register" method="post">'
+                f'<input type="hidden" name="_csrf" value="{token}">'
+                '<input name="team_name" placeholder="Название команды">'
+                '<input name="captain" placeholder="Имя капитана">'
+                '<input name="email" type="email"><input name="phone" type="tel">'
+                '<select name="count"><option value="2">2</option><option value="6">6</option></select>'
+                '<input type="checkbox" name="agree" value="1">'
+                '<button type="submit">Записаться</button></form></body></html>'
+            ).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Set-Cookie', 'session=selftest')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            data = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+            ok = data.get('_csrf') == token and 'session=selftest' in (self.headers.get('Cookie') or '')
+            submissions.append(data)
+            self.send_response(302 if ok else 403)
+            self.send_header('Location', '/success')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        config = {
+            'watched_games': ['#999'],
+            'team': {'team_name': 'Тестовая команда', 'captain_name': 'Иван',
+                     'email': 'team@example.com', 'phone': '+70000000000', 'players_count': 6},
+        }
+        state_file = os.path.join(tempfile.mkdtemp(), 'autoreg_state.json')
+        registrar = AutoRegistrar(config, state_file)
+        game = SimpleNamespace(id='game_999', game_number='#999',
+                               registration_url=f"{base_url}/game-page?id=999")
+
+        registrar.prepare([game])
+        result = registrar.register(game, detected_at=time.monotonic())
+
+        print(f"Отправлено полей: {submissions[-1] if submissions else {}}")
+        print(f"Успех: {result.success}, HTTP {result.status_code}")
+        print(f"От обнаружения до отправки: {result.detection_to_submit_ms:.2f} мс, "
+              f"запрос: {result.submit_ms:.2f} мс")
+        return result.success
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    arg_parser = argparse.ArgumentParser(description="Авторегистрация на игры")
+    arg_parser.add_argument('--selftest', action='store_true',
+                            help="Проверить полный цикл на локальной копии страницы регистрации")
+    args = arg_parser.parse_args()
+    if args.selftest:
+        raise SystemExit(0 if run_selftest() else 1)
+    arg_parser.print_help()
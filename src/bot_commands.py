@@ -0,0 +1,261 @@
+"""
+Команды Telegram-бота (/games, /active, /next, /game <номер>).
+Ответы строятся только из кэша последнего сохранённого расписания,
+сайт quizplease.ru при этом никогда не запрашивается.
+"""
+
+import os
+import time
+import logging
+import requests
+from datetime import datetime
+from typing import List, Dict, Optional, Callable
+
+from game_dates import parse_game_datetime
+from telegram_updates import UpdateReader, ChatIndex
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+
+AVAILABILITY_EMOJI = {'active': '✅', 'reserve': '⚠️'}
+
+
+class ScheduleIndex:
+    """Неизменяемый индекс одного снимка расписания"""
+
+    def __init__(self, games: List):
+        now = datetime.now()
+        dated = [(parse_game_datetime(game.date, game.time, now=now), game) for game in games]
+        dated.sort(key=lambda item: item[0] or datetime.max)
+
+        self.games = [game for _, game in dated]
+        self.starts = [start for start, _ in dated]
+        self.active = [game for game in self.games if game.availability_type == 'active']
+        self.by_number: Dict[str, object] = {}
+        for game in self.games:
+            number = game.game_number.lstrip('#')
+            if number:
+                self.by_number[number] = game
+        self.updated_at = games[0].extracted_at if games else ""
+
+    def next_game(self, now: datetime = None):
+        """Ближайшая игра, которая ещё не началась"""
+        now = now or datetime.now()
+        for start, game in zip(self.starts, self.games):
+            if start and start >= now:
+                return game
+        return None
+
+
+class ScheduleCache:
+    """
+    Кэш расписания в памяти. Обновляется подменой индекса целиком:
+    из монитора после каждого запуска или по изменению файла снимка
+    """
+
+    def __init__(self, storage=None, filename: str = "classic_games.json"):
+        self.storage = storage
+        self.filename = filename
+        self._index = ScheduleIndex([])
+        self._mtime: Optional[float] = None
+
+    @property
+    def index(self) -> ScheduleIndex:
+        return self._index
+
+    def update(self, games: List) -> None:
+        """Подмена снимка (используется как слушатель QuizPleaseMonitor)"""
+        self._index = ScheduleIndex(games)
+        logger.info(f"Кэш расписания обновлён: {len(games)} игр")
+
+    def refresh_if_changed(self) -> bool:
+        """Перечитывает файл снимка, только если изменилось время его модификации"""
+        if not self.storage:
+            return False
+
+        filepath = os.path.join(self.storage.output_dir, self.filename)
+        try:
+            mtime = os.path.getmtime(filepath)
+        except OSError:
+            return False
+
+        if mtime == self._mtime:
+            return False
+
+        self._mtime = mtime
+        self.update(self.storage.load_games(self.filename))
+        return True
+
+
+class BotCommandHandler:
+    """Обработчик команд бота через long polling getUpdates"""
+
+    def __init__(self, token: str, cache: ScheduleCache, poll_timeout: int = 25, analytics=None,
+                 data_dir: str = None):
+        self.api_url = f"https://api.telegram.org/bot{token}"
+        self.cache = cache
+        self.analytics = analytics
+        self.poll_timeout = poll_timeout
+        self.session = requests.Session()
+        # Номер последнего обработанного обновления переживает перезапуск,
+        # а чаты пишущих боту попадают в общий индекс (его показывает get_chat_id.py)
+        self.updates = UpdateReader(
+            token,
+            os.path.join(data_dir, 'telegram_updates.json') if data_dir else None,
+            session=self.session,
+            allowed_updates=['message'],
+            chats=ChatIndex(os.path.join(data_dir, 'telegram_chats.json') if data_dir else None)
+        )
+        self.commands: Dict[str, Callable[[str], List[str]]] = {
+            '/start': self._cmd_help,
+            '/help': self._cmd_help,
+            '/games': self._cmd_games,
+            '/active': self._cmd_active,
+            '/next': self._cmd_next,
+            '/game': self._cmd_game,
+            '/stats': self._cmd_stats,
+        }
+
+    def run_forever(self) -> None:
+        """Бесконечный цикл получения и обработки обновлений"""
+        logger.info("Бот ожидает команды...")
+        while True:
+            try:
+                self.poll_once()
+            except KeyboardInterrupt:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка при обработке обновлений: {str(e)}")
+                time.sleep(5)
+
+    def poll_once(self) -> int:
+        """Одна страница getUpdates и обработка полученных сообщений"""
+        updates = self.updates.fetch(timeout=self.poll_timeout)
+
+        self.cache.refresh_if_changed()
+        try:
+            for update in updates:
+                message = update.get('message') or {}
+                try:
+                    if message.get('text'):
+                        self.handle_message(message['chat']['id'], message['text'])
+                except Exception as e:
+                    # Обновление всё равно подтверждается: иначе оно приходило бы
+                    # снова и снова, и следующие команды остались бы без ответа
+                    logger.error(f"Ошибка при обработке команды {message.get('text', '')[:50]!r}: {str(e)}",
+                                 exc_info=True)
+                self.updates.acknowledge(update)
+        finally:
+            self.updates.save()
+        return len(updates)
+
+    def handle_message(self, chat_id, text: str) -> None:
+        """Ответ на одну команду"""
+        command, _, argument = text.strip().partition(' ')
+        # В группах команда приходит в виде /games@BotName
+        command = command.split('@')[0].lower()
+        handler = self.commands.get(command)
+        if not handler:
+            return
+
+        for reply in handler(argument.strip()):
+            self.send(chat_id, reply)
+
+    def send(self, chat_id, text: str) -> None:
+        try:
+            response = self.session.post(f"{self.api_url}/sendMessage", data={
+                'chat_id': chat_id,
+                'text': text,
+                'parse_mode': 'Markdown',
+                'disable_web_page_preview': True
+            }, timeout=10)
+            if response.status_code != 200:
+                logger.warning(f"Telegram вернул {response.status_code}: {response.text[:200]}")
+        except requests.RequestException as e:
+            logger.error(f"Ошибка при отправке ответа: {str(e)}")
+
+    def _cmd_help(self, argument: str) -> List[str]:
+        return [
+            "🤖 *Команды бота:*\n"
+            "/games - все игры\n"
+            "/active - игры со свободными местами\n"
+            "/next - ближайшая игра\n"
+            "/game <номер> - подробности об игре\n"
+            "/stats - как быстро заканчиваются места"
+        ]
+
+    def _cmd_games(self, argument: str) -> List[str]:
+        index = self.cache.index
+        if not index.games:
+            return ["Расписание пока не загружено"]
+        return self._paginate(f"📋 *Все игры ({len(index.games)}):*", index.games, index.updated_at)
+
+    def _cmd_active(self, argument: str) -> List[str]:
+        index = self.cache.index
+        if not index.active:
+            return ["Сейчас нет игр со свободными местами"]
+        return self._paginate(f"✅ *Доступно для записи ({len(index.active)}):*", index.active, index.updated_at)
+
+    def _cmd_next(self, argument: str) -> List[str]:
+        game = self.cache.index.next_game()
+        if not game:
+            return ["Ближайших игр не найдено"]
+        return [game.to_telegram_message()]
+
+    def _cmd_game(self, argument: str) -> List[str]:
+        number = argument.lstrip('#')
+        if not number:
+            return ["Укажите номер игры, например: /game 500"]
+        game = self.cache.index.by_number.get(number)
+        if not game:
+            return [f"Игра #{number} не найдена в расписании"]
+        return [game.to_telegram_message()]
+
+    def _cmd_stats(self, argument: str) -> List[str]:
+        if not self.analytics:
+            return ["Аналитика недоступна"]
+        self.analytics.update()
+        return [self.analytics.render_summary()]
+
+    @staticmethod
+    def _short_line(game) -> str:
+        emoji = AVAILABILITY_EMOJI.get(game.availability_type, '❓')
+        line = f"{emoji} {game.game_number} {game.date} {game.time}"
+        if game.place and game.place != 'Не указано':
+            line += f" - {game.place}"
+        return line
+
+    def _paginate(self, header: str, games: List, updated_at: str) -> List[str]:
+        """Разбиение длинного списка на сообщения в пределах лимита Telegram"""
+        footer = f"\n🕐 *Обновлено:* {updated_at}" if updated_at else ""
+        pages, current = [], header
+        for game in games:
+            line = "\n" + self._short_line(game)
+            if len(current) + len(line) + len(footer) > MAX_MESSAGE_LENGTH:
+                pages.append(current)
+                current = line.lstrip("\n")
+            else:
+                current += line
+        pages.append(current + footer)
+        return pages
+
+
+def main():
+    """Запуск бота в режиме ответов на команды"""
+    from extract_classic_games import GameStorage, get_settings
+    from analytics import FillRateAnalytics
+
+    storage = GameStorage()
+    cache = ScheduleCache(storage=storage)
+    cache.refresh_if_changed()
+    analytics = FillRateAnalytics(storage.history, os.path.join(storage.output_dir, 'analytics_index.json'))
+    handler = BotCommandHandler(get_settings().telegram.token, cache, analytics=analytics, data_dir=storage.output_dir)
+    handler.run_forever()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        logger.info("Бот остановлен пользователем")
@@ -0,0 +1,221 @@
+"""
+Лента изменений расписания для сторонних сервисов.
+
+Каждое отличие нового снимка от предыдущего (игра добавлена, удалена,
+изменились поля) записывается событием с возрастающим номером seq в
+файл data/changes.jsonl, который только дополняется. Потребитель хранит
+номер последнего обработанного события (курсор) и читает только новые:
+
+    python src/change_feed.py --cursor 120
+    python src/change_feed.py --cursor 120 --follow
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка файла недоступна
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Поля, которые меняются при каждом запуске и не являются изменением игры
+VOLATILE_FIELDS = {'extracted_at', 'game_hash', 'timestamp', 'parsed_at'}
+
+# Как часто сохранять смещение события в разреженный индекс
+INDEX_EVERY = 256
+
+
+def diff_snapshots(previous: List[Dict], current: List[Dict]) -> List[Dict]:
+    """События изменений между двумя снимками (игры в виде словарей)"""
+    previous_by_id = {game['id']: game for game in previous}
+    current_by_id = {game['id']: game for game in current}
+    events = []
+
+    for game_id, game in current_by_id.items():
+        old = previous_by_id.get(game_id)
+        if old is None:
+            events.append({'type': 'added', 'game_id': game_id, 'game': game})
+            continue
+
+        changes = {
+            name: [old.get(name), value]
+            for name, value in game.items()
+            if name not in VOLATILE_FIELDS and old.get(name) != value
+        }
+        if changes:
+            events.append({'type': 'changed', 'game_id': game_id, 'changes': changes, 'game': game})
+
+    for game_id, game in previous_by_id.items():
+        if game_id not in current_by_id:
+            events.append({'type': 'removed', 'game_id': game_id, 'game': game})
+
+    return events
+
+
+class ChangeFeed:
+    """Упорядоченная лента событий в JSONL файле с разреженным индексом смещений"""
+
+    def __init__(self, directory: str, name: str = 'changes'):
+        self.feed_file = os.path.join(directory, f'{name}.jsonl')
+        self.index_file = os.path.join(directory, f'{name}.idx.json')
+        self.lock_file = os.path.join(directory, f'{name}.lock')
+
+    @contextmanager
+    def _locked(self):
+        """Эксклюзивная блокировка записи (несколько процессов мониторинга)"""
+        with open(self.lock_file, 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _load_index(self) -> Dict[int, int]:
+        """seq -> смещение строки события в файле"""
+        if not os.path.exists(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return {int(seq): offset for seq, offset in json.load(f).items()}
+        except Exception as e:
+            logger.warning(f"Индекс ленты изменений повреждён, будет построен заново: {str(e)}")
+            return {}
+
+    def _save_index(self, index: Dict[int, int]) -> None:
+        tmp_path = f"{self.index_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({str(seq): offset for seq, offset in sorted(index.items())}, f)
+        os.replace(tmp_path, self.index_file)
+
+    def _start_offset(self, index: Dict[int, int], cursor: int) -> int:
+        """Смещение ближайшего проиндексированного события не позже cursor + 1"""
+        candidates = [seq for seq in index if seq <= cursor + 1]
+        return index[max(candidates)] if candidates else 0
+
+    def _tail_state(self, index: Dict[int, int]) -> tuple:
+        """(номер последнего события, смещение конца последней целой строки, последнее событие)"""
+        offset = index[max(index)] if index else 0
+        last_seq, end, last = 0, offset, None
+        if not os.path.exists(self.feed_file):
+            return last_seq, end, last
+        with open(self.feed_file, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                last = json.loads(line)
+                last_seq = last['seq']
+                end += len(line)
+        return last_seq, end, last
+
+    def last_seq(self) -> int:
+        """Номер последнего записанного события (0 - лента пуста)"""
+        return self._tail_state(self._load_index())[0]
+
+    def append(self, events: List[Dict], run: str = None) -> List[Dict]:
+        """
+        Запись событий с очередными номерами; возвращает записанные события.
+        run - ключ запуска: события повторённого после сбоя запуска, которые
+        уже дописаны в ленту, второй раз не записываются
+        """
+        if not events:
+            return []
+
+        with self._locked():
+            index = self._load_index()
+            seq, end, last = self._tail_state(index)
+            if run and last and last.get('run') == run:
+                logger.info(f"Лента изменений: события запуска уже записаны (seq до {seq})")
+                return []
+            timestamp = datetime.now().isoformat(timespec='seconds')
+            written = []
+
+            # Строка, недописанная при аварийном завершении, отбрасывается
+            if os.path.exists(self.feed_file) and os.path.getsize(self.feed_file) > end:
+                logger.warning("Лента изменений: отброшена недописанная последняя строка")
+                with open(self.feed_file, 'r+b') as f:
+                    f.truncate(end)
+
+            with open(self.feed_file, 'ab') as f:
+                for event in events:
+                    seq += 1
+                    record = {'seq': seq, 'ts': timestamp, **event}
+                    if run:
+                        record['run'] = run
+                    if seq % INDEX_EVERY == 1:
+                        index[seq] = f.tell()
+                    f.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+                    written.append(record)
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._save_index(index)
+
+        logger.info(f"В ленту изменений записано {len(written)} событий (seq до {seq})")
+        return written
+
+    def _scan(self, offset: int) -> Iterator[Dict]:
+        """Чтение событий с заданного смещения; недописанная строка в конце пропускается"""
+        if not os.path.exists(self.feed_file):
+            return
+        with open(self.feed_file, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                yield json.loads(line)
+
+    def read(self, cursor: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        """События с номером больше cursor"""
+        events = []
+        for event in self.iter_from(cursor):
+            events.append(event)
+            if limit and len(events) >= limit:
+                break
+        return events
+
+    def iter_from(self, cursor: int = 0) -> Iterator[Dict]:
+        index = self._load_index()
+        for event in self._scan(self._start_offset(index, cursor)):
+            if event['seq'] > cursor:
+                yield event
+
+    def tail(self, cursor: int = 0, poll_interval: float = 1.0) -> Iterator[Dict]:
+        """Бесконечное чтение новых событий по мере появления"""
+        while True:
+            for event in self.iter_from(cursor):
+                cursor = event['seq']
+                yield event
+            time.sleep(poll_interval)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Чтение ленты изменений расписания")
+    arg_parser.add_argument('--cursor', type=int, default=0, help="Номер последнего обработанного события")
+    arg_parser.add_argument('--limit', type=int, default=None, help="Не больше N событий")
+    arg_parser.add_argument('--follow', action='store_true', help="Ждать новые события")
+    arg_parser.add_argument('--data-dir', default=os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+    args = arg_parser.parse_args()
+
+    feed = ChangeFeed(args.data_dir)
+    events = feed.tail(args.cursor) if args.follow else feed.read(args.cursor, args.limit)
+    for event in events:
+        print(json.dumps(event, ensure_ascii=False), flush=True)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
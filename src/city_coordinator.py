@@ -0,0 +1,339 @@
+"""
+Распределение городов между процессами мониторинга.
+
+Координатор хранит в общей SQLite базе (data/cities.sqlite3) список городов
+и аренды: город опрашивает только тот процесс, который взял его в аренду.
+Аренда ограничена по времени и продлевается, пока идёт опрос; если процесс
+завис или упал, аренда истекает и город забирает любой свободный процесс.
+Каждый захват увеличивает номер аренды, поэтому процесс, потерявший аренду,
+не может освободить город, уже занятый другим.
+
+Процессы не знают друг о друге, поэтому их можно запускать сколько угодно:
+
+    python src/extract_classic_games.py --worker   # процесс мониторинга городов из CITIES_CONFIG
+    python src/city_coordinator.py status          # кто какой город опрашивает
+    python src/city_coordinator.py simulate --workers 4 --cities 16 --kill-one
+"""
+
+import os
+import sys
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+import multiprocessing
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CITIES_CONFIG = {
+    'cities': {},  # Город -> адрес расписания
+    'lease_seconds': 120,  # Срок аренды; продлевается каждую треть срока, пока идёт опрос
+    'idle_sleep': 5,  # Пауза, когда все города заняты или ещё не пора
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cities (
+    city TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    owner TEXT,
+    token INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL NOT NULL DEFAULT 0,
+    next_due REAL NOT NULL DEFAULT 0,
+    last_polled_at REAL,
+    polls INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+@dataclass
+class Lease:
+    """Аренда города; token защищает от действий по просроченной аренде"""
+    city: str
+    url: str
+    owner: str
+    token: int
+    expires_at: float
+    lost: bool = False
+
+    def is_held(self) -> bool:
+        """Аренда не потеряна при продлении и ещё не истекла"""
+        return not self.lost and time.time() < self.expires_at
+
+
+class CityCoordinator:
+    """Аренды городов в общей SQLite базе"""
+
+    def __init__(self, path: str, lease_seconds: float = 120):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Подключение на поток: продление аренды идёт из отдельного потока
+        self._local = threading.local()
+        with self._db() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # Без неявных транзакций: захват делается явным BEGIN IMMEDIATE
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.db = db
+        return db
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        return self._db().execute(sql, params)
+
+    def sync_cities(self, cities: Dict[str, str]) -> None:
+        """Список городов из конфигурации: новые добавляются, убранные удаляются"""
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            for city, url in cities.items():
+                db.execute('INSERT INTO cities (city, url) VALUES (?, ?) '
+                           'ON CONFLICT(city) DO UPDATE SET url = excluded.url', (city, url))
+            if cities:
+                placeholders = ','.join('?' * len(cities))
+                db.execute(f'DELETE FROM cities WHERE city NOT IN ({placeholders})', tuple(cities))
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+
+    def acquire(self, owner: str) -> Optional[Lease]:
+        """
+        Аренда города, которого пора опросить и который никто не держит
+        (или чья аренда истекла). Сначала - самый давно ожидающий
+        """
+        now = time.time()
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute('SELECT city, url, owner, token FROM cities '
+                             'WHERE next_due <= ? AND (owner IS NULL OR lease_until < ?) '
+                             'ORDER BY next_due LIMIT 1', (now, now)).fetchone()
+            if row is None:
+                db.execute('COMMIT')
+                return None
+            city, url, previous_owner, token = row
+            expires_at = now + self.lease_seconds
+            db.execute('UPDATE cities SET owner = ?, token = ?, lease_until = ? WHERE city = ?',
+                       (owner, token + 1, expires_at, city))
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+
+        if previous_owner:
+            logger.warning(f"♻️ Аренда города {city} у {previous_owner} истекла, город забирает {owner}")
+        return Lease(city, url, owner, token + 1, expires_at)
+
+    def renew(self, lease: Lease) -> bool:
+        """Продление аренды; False - аренда уже потеряна"""
+        expires_at = time.time() + self.lease_seconds
+        updated = self._execute('UPDATE cities SET lease_until = ? WHERE city = ? AND owner = ? AND token = ?',
+                                (expires_at, lease.city, lease.owner, lease.token)).rowcount
+        if updated:
+            lease.expires_at = expires_at
+        return bool(updated)
+
+    def release(self, lease: Lease, next_in: float) -> bool:
+        """Освобождение города после опроса; следующий опрос - через next_in секунд"""
+        now = time.time()
+        updated = self._execute(
+            'UPDATE cities SET owner = NULL, lease_until = 0, next_due = ?, last_polled_at = ?, polls = polls + 1 '
+            'WHERE city = ? AND owner = ? AND token = ?',
+            (now + next_in, now, lease.city, lease.owner, lease.token)).rowcount
+        if not updated:
+            logger.warning(f"⚠️ Аренда города {lease.city} была потеряна до окончания опроса")
+        return bool(updated)
+
+    def seconds_until_due(self) -> Optional[float]:
+        """Через сколько секунд какой-нибудь город станет доступен"""
+        now = time.time()
+        row = self._execute('SELECT MIN(MAX(next_due, CASE WHEN owner IS NULL THEN 0 ELSE lease_until END)) '
+                            'FROM cities').fetchone()
+        return None if row[0] is None else max(0.0, row[0] - now)
+
+    def status(self) -> List[Dict]:
+        now = time.time()
+        rows = self._execute('SELECT city, owner, lease_until, next_due, last_polled_at, polls '
+                             'FROM cities ORDER BY city').fetchall()
+        return [{
+            'city': city,
+            'owner': owner if owner and lease_until >= now else None,
+            'expired_owner': owner if owner and lease_until < now else None,
+            'due_in': round(max(0.0, next_due - now)),
+            'last_polled_at': last_polled_at,
+            'polls': polls,
+        } for city, owner, lease_until, next_due, last_polled_at, polls in rows]
+
+
+class CityWorker:
+    """
+    Цикл процесса мониторинга: взять город, опросить, освободить.
+    poll(city, url) возвращает паузу до следующего опроса этого города
+    """
+
+    def __init__(self, coordinator: CityCoordinator, poll: Callable[[str, str], float],
+                 worker_id: str = None, idle_sleep: float = 5):
+        self.coordinator = coordinator
+        self.poll = poll
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:4]}"
+        self.idle_sleep = idle_sleep
+        self.polls = 0
+        self.lease: Optional[Lease] = None
+
+    def holds_lease(self) -> bool:
+        """
+        Аренда текущего опроса ещё у этого процесса. poll проверяет её перед
+        записью данных и уведомлениями: потерянный город уже опрашивает другой
+        """
+        return self.lease is not None and self.lease.is_held()
+
+    def _keep_alive(self, lease: Lease, stop: threading.Event) -> None:
+        """Продление аренды, пока идёт опрос"""
+        while not stop.wait(self.coordinator.lease_seconds / 3):
+            if not self.coordinator.renew(lease):
+                lease.lost = True
+                logger.warning(f"⚠️ {self.worker_id}: аренда города {lease.city} потеряна во время опроса")
+                return
+
+    def run_once(self) -> bool:
+        """Один опрос; False - свободных городов нет"""
+        lease = self.coordinator.acquire(self.worker_id)
+        if lease is None:
+            return False
+
+        self.lease = lease
+        stop = threading.Event()
+        keeper = threading.Thread(target=self._keep_alive, args=(lease, stop), daemon=True)
+        keeper.start()
+        next_in = self.idle_sleep
+        try:
+            logger.info(f"🏙 {self.worker_id}: опрос города {lease.city}")
+            next_in = self.poll(lease.city, lease.url)
+        except Exception as e:
+            logger.error(f"Ошибка опроса города {lease.city}: {str(e)}", exc_info=True)
+        finally:
+            stop.set()
+            keeper.join()
+            self.lease = None
+            self.coordinator.release(lease, next_in)
+        self.polls += 1
+        return True
+
+    def run_forever(self, stop_at: float = None) -> None:
+        while stop_at is None or time.time() < stop_at:
+            if not self.run_once():
+                wait = self.coordinator.seconds_until_due()
+                time.sleep(min(self.idle_sleep, wait if wait is not None else self.idle_sleep) or 0.05)
+
+
+def _simulated_worker(path: str, lease_seconds: float, poll_seconds: float, stop_at: float,
+                      log_path: str) -> None:
+    """Процесс симуляции: опрос - это пауза, каждый опрос записывается в журнал"""
+    coordinator = CityCoordinator(path, lease_seconds)
+
+    def poll(city: str, url: str) -> float:
+        started = time.time()
+        time.sleep(poll_seconds)
+        with open(log_path, 'a') as f:
+            f.write(f"{city} {worker.worker_id} {started:.4f} {time.time():.4f}\n")
+        return poll_seconds
+
+    worker = CityWorker(coordinator, poll, worker_id=f"sim-{os.getpid()}", idle_sleep=poll_seconds / 4)
+    worker.run_forever(stop_at)
+
+
+def simulate(workers: int, cities: int, seconds: float, poll_seconds: float = 0.2,
+             lease_seconds: float = 1.0, kill_one: bool = False, directory: str = None) -> Dict:
+    """
+    Несколько процессов на одной базе: пропускная способность
+    и проверка, что город никогда не опрашивался двумя процессами сразу
+    """
+    import tempfile
+    directory = directory or tempfile.mkdtemp(prefix='quizplease_cities_')
+    path = os.path.join(directory, 'cities.sqlite3')
+    log_path = os.path.join(directory, 'polls.log')
+    coordinator = CityCoordinator(path, lease_seconds)
+    coordinator.sync_cities({f'city{i:03d}': f'http://city{i:03d}.example/schedule' for i in range(cities)})
+
+    stop_at = time.time() + seconds
+    processes = [multiprocessing.Process(target=_simulated_worker,
+                                         args=(path, lease_seconds, poll_seconds, stop_at, log_path))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    if kill_one and processes:
+        # Процесс убивается посреди опроса: его город должен вернуться к остальным
+        time.sleep(seconds / 3)
+        processes[0].kill()
+    for process in processes:
+        process.join()
+
+    polls: Dict[str, List] = {}
+    if os.path.exists(log_path):
+        with open(log_path) as f:
+            for line in f:
+                city, worker_id, started, finished = line.split()
+                polls.setdefault(city, []).append((float(started), float(finished), worker_id))
+
+    overlaps = 0
+    for intervals in polls.values():
+        intervals.sort()
+        for (_, end, _), (start, _, _) in zip(intervals, intervals[1:]):
+            if start < end:
+                overlaps += 1
+
+    total = sum(len(intervals) for intervals in polls.values())
+    return {
+        'workers': workers,
+        'cities': cities,
+        'seconds': seconds,
+        'polls': total,
+        'polls_per_second': round(total / seconds, 2),
+        'cities_polled': len(polls),
+        'overlapping_polls': overlaps,
+        'status': coordinator.status(),
+    }
+
+
+def main():
+    default_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'data', 'cities.sqlite3')
+    arg_parser = argparse.ArgumentParser(description="Аренды городов для процессов мониторинга")
+    arg_parser.add_argument('--path', default=default_path)
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('status', help="Города, их владельцы и время до следующего опроса")
+    sim = commands.add_parser('simulate', help="Проверка на нескольких локальных процессах")
+    sim.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    sim.add_argument('--cities', type=int, default=16)
+    sim.add_argument('--seconds', type=float, default=5)
+    sim.add_argument('--poll-seconds', type=float, default=0.2, help="Длительность одного опроса")
+    sim.add_argument('--lease-seconds', type=float, default=1.0)
+    sim.add_argument('--kill-one', action='store_true', help="Убить один процесс посреди работы")
+    args = arg_parser.parse_args()
+
+    if args.command == 'status':
+        for row in CityCoordinator(args.path).status():
+            owner = row['owner'] or (f"аренда {row['expired_owner']} истекла" if row['expired_owner'] else "свободен")
+            print(f"{row['city']:<12} {owner:<32} через {row['due_in']:>5} с  опросов: {row['polls']}")
+        return 0
+
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    for workers in args.workers:
+        result = simulate(workers, args.cities, args.seconds, args.poll_seconds, args.lease_seconds, args.kill_one)
+        print(f"процессов: {workers:>3}  опросов: {result['polls']:>5}  в секунду: {result['polls_per_second']:>7}  "
+              f"городов опрошено: {result['cities_polled']}/{args.cities}  "
+              f"одновременных опросов города: {result['overlapping_polls']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""
+Колоночная выгрузка истории для аналитики.
+
+Каждое наблюдение игры в запуске - одна строка. Каждая колонка хранится
+отдельным двоичным файлом массива фиксированной ширины (модуль array),
+строки (id, номер, название, место, статус, тип доступности) - кодами
+словаря, сам словарь лежит рядом в JSON. Файлы можно отображать в память
+(mmap) и обрабатывать векторно через numpy, если он установлен.
+
+После каждого запуска дописываются только новые строки; meta.json
+записывается последним и хранит число строк, поэтому недописанный хвост
+колонок после сбоя отбрасывается при следующем открытии.
+
+    python src/columnar_export.py              # догнать историю
+    python src/columnar_export.py --summary    # наблюдения по местам и статусам
+"""
+
+import os
+import sys
+import json
+import mmap
+import array
+import logging
+import argparse
+from collections import Counter
+from datetime import datetime
+from typing import List, Dict
+
+from game_dates import parse_game_datetime
+
+try:
+    import numpy
+except ImportError:  # Без numpy колонки читаются как memoryview
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+# Имя колонки -> (код типа array, поле игры); поле None - колонка вычисляется
+NUMERIC_COLUMNS = {
+    'ts': ('q', None),  # Время запуска, секунды Unix
+    'start': ('q', None),  # Начало игры, секунды Unix; -1 - дата не распознана
+    'is_available': ('b', 'is_available'),
+}
+
+DICTIONARY_COLUMNS = {
+    'game_id': 'id',
+    'game_number': 'game_number',
+    'title': 'title',
+    'venue': 'place',
+    'status': 'status',
+    'availability_type': 'availability_type',
+}
+
+# Коды словаря хранятся как беззнаковые 32-битные числа
+DICTIONARY_TYPECODE = 'I'
+
+
+class ColumnarHistory:
+    """Колоночные файлы истории в одной директории"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.meta_file = os.path.join(directory, 'meta.json')
+        os.makedirs(directory, exist_ok=True)
+        self.meta = self._load_meta()
+        self.dictionaries: Dict[str, List[str]] = {
+            name: self._load_dictionary(name) for name in DICTIONARY_COLUMNS
+        }
+        self._codes = {name: {value: code for code, value in enumerate(values)}
+                       for name, values in self.dictionaries.items()}
+        self._truncate_to_meta()
+
+    @staticmethod
+    def _typecode(name: str) -> str:
+        return NUMERIC_COLUMNS[name][0] if name in NUMERIC_COLUMNS else DICTIONARY_TYPECODE
+
+    def _column_file(self, name: str) -> str:
+        return os.path.join(self.directory, f'{name}.bin')
+
+    def _dictionary_file(self, name: str) -> str:
+        return os.path.join(self.directory, f'{name}.dict.json')
+
+    def _load_meta(self) -> Dict:
+        if os.path.exists(self.meta_file):
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('byteorder') != sys.byteorder:
+                raise ValueError(f"Колонки записаны с порядком байтов {meta.get('byteorder')}")
+            return meta
+        return {
+            'rows': 0,
+            'last_ts': None,
+            'byteorder': sys.byteorder,
+            'columns': {name: self._typecode(name) for name in [*NUMERIC_COLUMNS, *DICTIONARY_COLUMNS]},
+        }
+
+    def _load_dictionary(self, name: str) -> List[str]:
+        path = self._dictionary_file(name)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_json(self, path: str, data) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _truncate_to_meta(self) -> None:
+        """Отбрасывание строк, записанных после последнего сохранения meta.json"""
+        for name, typecode in self.meta['columns'].items():
+            path = self._column_file(name)
+            expected = self.meta['rows'] * array.array(typecode).itemsize
+            if os.path.exists(path) and os.path.getsize(path) > expected:
+                with open(path, 'r+b') as f:
+                    f.truncate(expected)
+
+    def _encode(self, name: str, value) -> int:
+        value = '' if value is None else str(value)
+        codes = self._codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.dictionaries[name])
+            self.dictionaries[name].append(value)
+        return code
+
+    def append_runs(self, runs) -> int:
+        """Дописывание запусков [(timestamp, игры)]; возвращает число новых строк"""
+        buffers = {name: array.array(typecode) for name, typecode in self.meta['columns'].items()}
+        dictionary_sizes = {name: len(values) for name, values in self.dictionaries.items()}
+        last_ts = self.meta['last_ts']
+
+        for timestamp, games in runs:
+            if last_ts and timestamp <= last_ts:
+                continue
+            ts = int(datetime.fromisoformat(timestamp).timestamp())
+            for game in games:
+                start = parse_game_datetime(game.get('date', ''), game.get('time', ''),
+                                            now=datetime.fromtimestamp(ts))
+                buffers['ts'].append(ts)
+                buffers['start'].append(int(start.timestamp()) if start else -1)
+                buffers['is_available'].append(1 if game.get('is_available') else 0)
+                for name, field_name in DICTIONARY_COLUMNS.items():
+                    buffers[name].append(self._encode(name, game.get(field_name)))
+            last_ts = timestamp
+
+        rows = len(buffers['ts'])
+        if not rows:
+            return 0
+
+        for name, buffer in buffers.items():
+            with open(self._column_file(name), 'ab') as f:
+                buffer.tofile(f)
+        for name, values in self.dictionaries.items():
+            if len(values) != dictionary_sizes[name]:
+                self._write_json(self._dictionary_file(name), values)
+
+        self.meta['rows'] += rows
+        self.meta['last_ts'] = last_ts
+        self._write_json(self.meta_file, self.meta)
+        return rows
+
+    def update(self, history) -> int:
+        """Догоняющая выгрузка запусков истории, которых ещё нет в колонках"""
+        rows = self.append_runs(history.iter_runs(since=self.meta['last_ts']))
+        if rows:
+            logger.info(f"Колоночная выгрузка: добавлено строк - {rows}, всего - {self.meta['rows']}")
+        return rows
+
+    def column(self, name: str):
+        """
+        Колонка, отображённая в память: numpy.memmap, если numpy установлен,
+        иначе memoryview нужного типа
+        """
+        typecode = self.meta['columns'][name]
+        if not self.meta['rows']:
+            return numpy.zeros(0, dtype=typecode) if numpy else memoryview(array.array(typecode))
+        length = self.meta['rows'] * array.array(typecode).itemsize
+        if numpy:
+            return numpy.memmap(self._column_file(name), dtype=typecode, mode='r', shape=(self.meta['rows'],))
+        with open(self._column_file(name), 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ)
+        return memoryview(mapped).cast(typecode)
+
+    def decode(self, name: str, code: int) -> str:
+        return self.dictionaries[name][code]
+
+    def count_by(self, *names: str) -> Dict[tuple, int]:
+        """Число строк по сочетанию значений словарных колонок"""
+        columns = [self.column(name) for name in names]
+        if numpy and self.meta['rows']:
+            # Коды колонок складываются в один ключ и считаются одним bincount
+            key = numpy.zeros(self.meta['rows'], dtype=numpy.int64)
+            for name, column in zip(names, columns):
+                key = key * max(len(self.dictionaries[name]), 1) + column
+            counts = numpy.bincount(key)
+            result = {}
+            for flat in numpy.nonzero(counts)[0]:
+                codes, rest = [], int(flat)
+                for name in reversed(names):
+                    size = max(len(self.dictionaries[name]), 1)
+                    codes.append(rest % size)
+                    rest //= size
+                result[tuple(self.decode(name, code) for name, code in zip(names, reversed(codes)))] = int(counts[flat])
+            return result
+        counter = Counter(zip(*columns))
+        return {tuple(self.decode(name, code) for name, code in zip(names, codes)): count
+                for codes, count in counter.items()}
+
+
+def main():
+    from extract_classic_games import GameStorage
+
+    arg_parser = argparse.ArgumentParser(description="Колоночная выгрузка истории игр")
+    arg_parser.add_argument('--summary', action='store_true', help="Наблюдения по местам и типу доступности")
+    args = arg_parser.parse_args()
+
+    storage = GameStorage()
+    columns = storage.columns or ColumnarHistory(os.path.join(storage.output_dir, 'columns'))
+    columns.update(storage.history)
+    print(f"Строк: {columns.meta['rows']}, последний запуск: {columns.meta['last_ts']}")
+
+    if args.summary:
+        for (venue, availability), count in sorted(columns.count_by('venue', 'availability_type').items()):
+            print(f"{venue} | {availability}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,19 @@
 import os
 import sys
 import json
+import argparse
 import logging
 import requests
 import re
 import time
-from bs4 import BeautifulSoup
-from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from bs4 import BeautifulSoup, SoupStrainer
+from html.parser import HTMLParser
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple, Callable, Iterator, Iterable
 from dataclasses import dataclass, asdict, field
+from urllib.parse import urlparse, urljoin
 import hashlib
+from functools import lru_cache
 
 # Определение корневой директории проекта
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -21,71 +25,88 @@ SRC_DIR = os.path.join(BASE_DIR, 'src')
 if SRC_DIR not in sys.path:
     sys.path.insert(0, SRC_DIR)
 
+from layout_monitor import LayoutMonitor
+from logging_setup import setup_logging
+from change_feed import ChangeFeed, diff_snapshots
+from history_store import HistoryStore
+from analytics import FillRateAnalytics
+from columnar_export import ColumnarHistory
+from game_price import Price, parse_price, format_price
+from keyword_classifier import KeywordClassifier, DEFAULT_KEYWORD_TABLES
+from game_types import GameTypeRegistry, default_registry, classic_title, is_classic_title, CLASSIC_TITLE
+from http_transport import BROWSER_HEADERS, TransportError, create_transport
+from page_archive import PageArchive
+from outbox import Outbox
+from settings import (Settings, SettingsLoader, SettingsError, NotificationSettings, FilterSettings,
+                      ProxySettings)
+from game_dates import parse_game_datetime
+from notification_queue import (NotificationQueue, PRIORITY_AVAILABILITY,
+                                PRIORITY_NEW_GAME, PRIORITY_BULK)
+
 # Создание директорий, если они не существуют
 os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(LOGS_DIR, exist_ok=True)
 
-# Настройка логирования
-LOG_FILE = os.path.join(LOGS_DIR, 'extract_games.log')
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
+# Настройки читаются из config.py / config.toml и окружения при первом обращении
+settings_loader = SettingsLoader()
 
 
-def load_configuration():
-    try:
-        # Пытаемся импортировать конфигурацию
-        import config
+def load_optional_config(name: str) -> Dict:
+    """Загрузка необязательного раздела настроек (пустой словарь, если раздела нет)"""
+    return settings_loader.section(name)
+
 
-        # Проверяем обязательные поля
-        required_fields = ['TELEGRAM_CONFIG', 'PARSER_CONFIG']
-        for field in required_fields:
-            if not hasattr(config, field):
-                raise AttributeError(f"В config.py отсутствует обязательный параметр: {field}")
+# Настройка логирования: запись в фоне, ротация и параметры из LOGGING_CONFIG
+LOG_FILE = os.path.join(LOGS_DIR, 'extract_games.log')
+
+setup_logging(load_optional_config('LOGGING_CONFIG'), LOG_FILE)
+logger = logging.getLogger(__name__)
 
-        # Проверяем токен Telegram
-        telegram_config = config.TELEGRAM_CONFIG
-        if 'token' not in telegram_config or not telegram_config['token']:
-            raise ValueError("Токен Telegram не указан в config.py")
 
-        if 'chat_id' not in telegram_config or not telegram_config['chat_id']:
-            raise ValueError("Chat ID не указан в config.py")
+_settings: Optional[Settings] = None
 
-        # Проверяем базовый URL парсера
-        parser_config = config.PARSER_CONFIG
-        if 'base_url' not in parser_config or not parser_config['base_url']:
-            raise ValueError("Базовый URL не указан в config.py")
 
-        logger.info("✓ Конфигурация успешно загружена из config.py")
+def get_settings() -> Settings:
+    """
+    Проверенные настройки. Загружаются при первом обращении, а не при импорте,
+    поэтому модуль импортируют API, аналитика и прогон по архиву без config.py.
+    Если настроек нет или они неверны, программа завершается
+    """
+    global _settings
+    if _settings is None:
+        try:
+            _settings = settings_loader.load()
+        except SettingsError as e:
+            logger.error(f"❌ ОШИБКА КОНФИГУРАЦИИ: {e}")
+            print_error_and_exit()
+        logger.info(f"✓ Конфигурация успешно загружена из {_settings.source}")
 
         # Маскируем токен для безопасного логирования
-        token = telegram_config['token']
+        token = _settings.telegram.token
         masked_token = f"{token[:10]}...{token[-5:]}" if len(token) > 15 else "***"
         logger.info(f"  Telegram токен: {masked_token}")
-        logger.info(f"  Chat ID: {telegram_config['chat_id']}")
-        logger.info(f"  Базовый URL: {parser_config['base_url']}")
-
-        return telegram_config, parser_config
-
-    except ImportError:
-        logger.error("❌ ФАЙЛ config.py НЕ НАЙДЕН!")
-        print_error_and_exit()
-    except AttributeError as e:
-        logger.error(f"❌ ОШИБКА В СТРУКТУРЕ config.py: {e}")
-        print_error_and_exit()
-    except ValueError as e:
-        logger.error(f"❌ ОШИБКА В ДАННЫХ config.py: {e}")
-        print_error_and_exit()
-    except Exception as e:
-        logger.error(f"❌ НЕОЖИДАННАЯ ОШИБКА ПРИ ЗАГРУЗКЕ КОНФИГУРАЦИИ: {e}")
-        print_error_and_exit()
+        logger.info(f"  Chat ID: {_settings.telegram.chat_id}")
+        logger.info(f"  Базовый URL: {_settings.parser.base_url}")
+    return _settings
+
+
+def reload_settings() -> Optional[Settings]:
+    """Новые настройки, если файл или окружение изменились; иначе None"""
+    global _settings
+    settings = settings_loader.reload_if_changed(_settings)
+    if settings is not None:
+        _settings = settings
+    return settings
+
+
+def __getattr__(name: str):
+    """Прежние глобальные словари (TELEGRAM_CONFIG, PARSER_CONFIG, ...) для внешних модулей"""
+    if name in ('TELEGRAM_CONFIG', 'PARSER_CONFIG'):
+        return get_settings().section(name)
+    if name.endswith('_CONFIG') and name.isupper():
+        return load_optional_config(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def print_error_and_exit():
@@ -117,15 +138,12 @@ def print_error_and_exit():
     print("   }")
     print()
     print("4. Убедитесь, что config.py находится в папке src/")
+    print("   (или задайте путь к config.py / config.toml в QUIZPLEASE_CONFIG)")
     print("5. Запустите скрипт снова")
     print("=" * 60)
     sys.exit(1)
 
 
-# Загружаем конфигурацию (программа завершится, если что-то не так)
-TELEGRAM_CONFIG, PARSER_CONFIG = load_configuration()
-
-
 @dataclass
 class Game:
     """Класс для хранения информации об игре"""
@@ -144,11 +162,27 @@ class Game:
     extracted_at: str
     is_available: bool = False
     game_hash: str = field(default="")  # Хэш для отслеживания изменений
+    city: str = ""  # Поддомен города: 'klg', 'spb'
+    game_type: str = "classic"  # Тип из реестра game_types: 'classic', 'music', 'cinema', ...
+    price_amount: Optional[int] = None  # Цена в рублях, разобранная из price
+    price_currency: str = ""  # 'RUB'
+    price_unit: str = ""  # 'person' - с человека, 'team' - с команды
+    payment_methods: List[str] = field(default_factory=list)  # 'cash', 'card', ...
 
     def __post_init__(self):
         """Вычисляем хэш игры после инициализации"""
         if not self.game_hash:
             self.game_hash = self.calculate_hash()
+        # Игры, сохранённые до появления разобранной цены
+        if self.price and self.price_amount is None:
+            self.set_price(parse_price(self.price))
+
+    def set_price(self, price: Price) -> None:
+        """Заполнение полей разобранной цены"""
+        self.price_amount = price.amount
+        self.price_currency = price.currency
+        self.price_unit = price.unit
+        self.payment_methods = price.payment_methods
 
     def calculate_hash(self) -> str:
         """Вычисление хэша игры для отслеживания изменений"""
@@ -160,98 +194,285 @@ class Game:
         return asdict(self)
 
     def to_telegram_message(self) -> str:
-        # Эмодзи в зависимости от типа доступности
-        if self.availability_type == 'reserve':
-            emoji = "⚠️"
-            availability_text = "ЗАПИСЬ В РЕЗЕРВ"
-        elif self.availability_type == 'active':
-            emoji = "✅"
-            availability_text = "СВОБОДНЫЕ МЕСТА"
-        else:
-            emoji = "❓"
-            availability_text = "СТАТУС НЕИЗВЕСТЕН"
-
-        # Очистка цены от лишних символов
-        price_display = self._clean_price(self.price) if self.price else 'Не указана'
-
-        # Определение статуса для отображения
-        status_display = self.status if self.status else self.button_text
-
-        message = (
-            f"{emoji} *{availability_text}*\n"
-            f"🎯 *{self.title} {self.game_number}*\n"
-            f"📅 *Дата:* {self.date}\n"
-            f"🕒 *Время:* {self.time if self.time else 'Не указано'}\n"
-            f"📍 *Место:* {self.place if self.place else 'Не указано'}\n"
-            f"🏠 *Адрес:* {self.address if self.address else 'Не указан'}\n"
-            f"💰 *Цена:* {price_display}\n"
-            f"📊 *Статус:* {status_display}\n"
-            f"🕐 *Обновлено:* {self.extracted_at}"
+        # Отрисовка кэшируется по содержимому игры; время обновления
+        # меняется каждый запуск, поэтому подставляется отдельно
+        head, tail = _render_telegram_message(
+            TELEGRAM_TEMPLATE_VERSION, self.availability_type, self.title, self.game_number,
+            self.date, self.time, self.place, self.address, self.price_amount, self.price_currency,
+            self.price_unit, tuple(self.payment_methods), self.price,
+            self.status if self.status else self.button_text, self.registration_url
         )
+        return f"{head}🕐 *Обновлено:* {self.extracted_at}{tail}"
+
+
+# Версия шаблона сообщения об игре: увеличивается при любом изменении
+# _render_telegram_message, чтобы не отдавать отрисованное по старому шаблону
+TELEGRAM_TEMPLATE_VERSION = 2
+
+
+@lru_cache(maxsize=1024)
+def _render_telegram_message(template_version: int, availability_type: str, title: str,
+                             game_number: str, date: str, time: str, place: str, address: str,
+                             price_amount: Optional[int], price_currency: str, price_unit: str,
+                             payment_methods: Tuple[str, ...], price: str,
+                             status_display: str, registration_url: str) -> Tuple[str, str]:
+    """
+    Сообщение об игре без строки времени обновления: (начало, окончание).
+    Ключ кэша - версия шаблона и все отображаемые поля игры, поэтому
+    неизменившиеся игры не отрисовываются заново ни между запусками,
+    ни для разных подписчиков
+    """
+    # Эмодзи в зависимости от типа доступности
+    if availability_type == 'reserve':
+        emoji = "⚠️"
+        availability_text = "ЗАПИСЬ В РЕЗЕРВ"
+    elif availability_type == 'active':
+        emoji = "✅"
+        availability_text = "СВОБОДНЫЕ МЕСТА"
+    else:
+        emoji = "❓"
+        availability_text = "СТАТУС НЕИЗВЕСТЕН"
+
+    head = (
+        f"{emoji} *{availability_text}*\n"
+        f"🎯 *{title} {game_number}*\n"
+        f"📅 *Дата:* {date}\n"
+        f"🕒 *Время:* {time if time else 'Не указано'}\n"
+        f"📍 *Место:* {place if place else 'Не указано'}\n"
+        f"🏠 *Адрес:* {address if address else 'Не указан'}\n"
+        f"💰 *Цена:* {format_price(price_amount, price_currency, price_unit, payment_methods, price)}\n"
+        f"📊 *Статус:* {status_display}\n"
+    )
+
+    # Добавляем ссылку, если есть
+    tail = ""
+    if registration_url and registration_url != "#":
+        tail = f"\n\n👉 [Ссылка для регистрации]({registration_url})"
+
+    return head, tail
+
+
+# Несколько возможных селекторов для блоков игр
+GAME_BLOCK_SELECTORS = [
+    'div.schedule-column',
+    'div[class*="schedule"][class*="column"]',
+    'div.game-card',
+    'div.schedule-game'
+]
+
+# Те же селекторы для потокового разбора: (список классов, атрибут class) -> совпадение
+_SELECTOR_MATCHERS = {
+    'div.schedule-column': lambda classes, class_attr: 'schedule-column' in classes,
+    'div[class*="schedule"][class*="column"]': lambda classes, class_attr: (
+        'schedule' in class_attr and 'column' in class_attr),
+    'div.game-card': lambda classes, class_attr: 'game-card' in classes,
+    'div.schedule-game': lambda classes, class_attr: 'schedule-game' in classes,
+}
+
+# Классы контейнеров блоков игр (все варианты селекторов)
+GAME_BLOCK_CLASS_RE = re.compile(
+    r'(?<![\w-])(schedule-column|game-card|schedule-game)(?![\w-])|schedule.*column'
+)
 
-        # Добавляем ссылку, если есть
-        if self.registration_url and self.registration_url != "#":
-            message += f"\n\n👉 [Ссылка для регистрации]({self.registration_url})"
-
-        return message
-
-    def _clean_price(self, price: str) -> str:
-        """Очистка строки цены от лишних символов"""
-        if not price:
-            return ""
-        # Убираем лишние пробелы и переносы строк
-        price = re.sub(r'\s+', ' ', price.strip())
-        # Убираем повторяющиеся пробелы
-        price = re.sub(r'\s{2,}', ' ', price)
-        # Заменяем переносы на пробелы
-        price = price.replace('\n', ' ').replace('\r', ' ').replace('/', ' / ')
-        # Убираем лишние пробелы вокруг слэша
-        price = re.sub(r'\s*/\s*', ' / ', price)
-        return price
+# Порядок признаков при поиске строки статуса в тексте блока
+STATUS_LABEL_PRIORITY = ['no_seats', 'few_seats', 'free_seats', 'signup', 'reserve']
+
+# Сколько первых блоков используется для отпечатка вёрстки
+LAYOUT_SAMPLE_BLOCKS = 5
+
+
+class _ScheduleBlockSplitter(HTMLParser):
+    """
+    Инкрементальный разбор потока HTML: по мере поступления данных
+    выделяет разметку блоков игр, не строя дерево всей страницы.
+
+    Как и поиск по дереву (parse_html), блоки берутся только по одному
+    селектору - первому в списке, который нашёл что-нибудь на странице.
+    Блоки первого селектора выдаются сразу; запасные селекторы проверяются,
+    только пока первый ничего не нашёл, и их блоки выдаются после конца
+    страницы, если первый так и не сработал
+    """
+
+    def __init__(self, selectors: List[str] = None):
+        super().__init__(convert_charrefs=False)
+        self.selectors = list(selectors or GAME_BLOCK_SELECTORS)
+        self.completed: List[Tuple[str, str]] = []
+        # Незавершённые блоки: селектор -> [части разметки, глубина вложенности div]
+        self._open: Dict[str, list] = {}
+        # Готовые блоки запасных селекторов; None - первый селектор уже сработал
+        self._fallback: Optional[Dict[str, List[str]]] = {selector: [] for selector in self.selectors[1:]}
+
+    def _matching_selectors(self, attrs) -> List[str]:
+        """Селекторы, которые ещё ищутся и которым соответствует блок"""
+        class_attr = next((value for name, value in attrs if name == 'class' and value), "")
+        if not class_attr:
+            return []
+        classes = class_attr.split()
+        candidates = self.selectors if self._fallback is not None else self.selectors[:1]
+        return [selector for selector in candidates
+                if selector not in self._open and _SELECTOR_MATCHERS[selector](classes, class_attr)]
+
+    def _append(self, text: str) -> None:
+        for block in self._open.values():
+            block[0].append(text)
+
+    def handle_starttag(self, tag, attrs):
+        text = self.get_starttag_text()
+        self._append(text)
+        if tag != 'div':
+            return
+
+        for block in self._open.values():
+            block[1] += 1
+        for selector in self._matching_selectors(attrs):
+            self._open[selector] = [[text], 1]
+            if selector == self.selectors[0] and self._fallback is not None:
+                # Основной селектор нашёл блок: запасные больше не нужны
+                self._fallback = None
+                self._open = {selector: self._open[selector]}
+
+    def handle_startendtag(self, tag, attrs):
+        self._append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        self._append(f"</{tag}>")
+        if tag != 'div':
+            return
+
+        for selector, block in list(self._open.items()):
+            block[1] -= 1
+            if block[1] == 0:
+                del self._open[selector]
+                block_html = ''.join(block[0])
+                if selector == self.selectors[0]:
+                    self.completed.append((selector, block_html))
+                elif self._fallback is not None:
+                    self._fallback[selector].append(block_html)
+
+    def handle_data(self, data):
+        self._append(data)
+
+    def handle_entityref(self, name):
+        self._append(f"&{name};")
+
+    def handle_charref(self, name):
+        self._append(f"&#{name};")
+
+    def close(self):
+        super().close()
+        if self._fallback is None:
+            return
+        # Первый селектор ничего не нашёл: берём первый из запасных, который нашёл
+        for selector in self.selectors[1:]:
+            if self._fallback[selector]:
+                self.completed.extend((selector, block_html) for block_html in self._fallback[selector])
+                break
+        self._fallback = None
+
+    def pop_completed(self) -> List[Tuple[str, str]]:
+        """Забрать готовые блоки (селектор, разметка), накопленные с прошлого вызова"""
+        completed, self.completed = self.completed, []
+        return completed
 
 
 class QuizPleaseParser:
     """Парсер сайта quizplease.ru - ТОЛЬКО классические игры"""
 
-    def __init__(self, base_url: str = None):
-        self.base_url = base_url or PARSER_CONFIG['base_url']
+    def __init__(self, base_url: str = None, keyword_tables: Dict[str, List[str]] = None,
+                 game_types: GameTypeRegistry = None, state_dir: str = None):
+        parser_config = load_optional_config('PARSER_CONFIG')
+        self.base_url = base_url or get_settings().parser.base_url
+        self.city = self._city_from_url(self.base_url)
+        self.keywords = KeywordClassifier(
+            {**DEFAULT_KEYWORD_TABLES,
+             **(load_optional_config('KEYWORDS_CONFIG') if keyword_tables is None else keyword_tables)})
+        self.game_types = game_types or default_registry()
+        self.layout = LayoutMonitor(os.path.join(state_dir or DATA_DIR, 'parser_state.json'), self.base_url)
+        self.timeout = parser_config.get('timeout', 30)
         self.session = requests.Session()
-        self._setup_session()
-
-    def _setup_session(self) -> None:
-        """Настройка HTTP-сессии"""
+        self._setup_session(parser_config.get('user_agent', ''))
+        # Прокси нужны до создания транспорта: клиент httpx получает их только при создании
+        proxy_config = load_optional_config('PROXY_CONFIG')
+        self.session.proxies.update(ProxySettings(**{key: proxy_config[key] for key in ('enabled', 'http', 'https')
+                                                     if key in proxy_config}).proxies())
+        self.transport_config = parser_config
+        self.transport = create_transport(parser_config, self.session)
+        # False, если последняя загрузка оборвалась: полученные игры - не всё расписание
+        self.last_read_complete = True
+        # Каждая загруженная страница сохраняется для разбора ошибок и прогона по архиву
+        self.archive = None
+        archive_config = load_optional_config('ARCHIVE_CONFIG')
+        if archive_config.get('enabled', True):
+            self.archive = PageArchive(archive_config.get('directory') or os.path.join(DATA_DIR, 'pages'),
+                                       retention_days=archive_config.get('retention_days', 60))
+
+    def apply_settings(self, settings: Settings, apply_url: bool = True) -> None:
+        """
+        Новые настройки между запусками: таймаут и прокси меняются у той же
+        сессии, транспорт пересоздаётся, только если сменился его тип
+        (или прокси у httpx, который получает их при создании клиента)
+        """
+        self.timeout = settings.parser.timeout
+        self.session.proxies.clear()
+        self.session.proxies.update(settings.proxy.proxies())
+        if apply_url and settings.parser.base_url != self.base_url:
+            logger.info(f"🔧 Новый адрес расписания: {settings.parser.base_url}")
+            self.base_url = settings.parser.base_url
+            self.city = self._city_from_url(self.base_url)
+
+        transport_config = settings.section('PARSER_CONFIG')
+        kind = (transport_config.get('transport', 'requests'), transport_config.get('http2', True))
+        previous_kind = (self.transport_config.get('transport', 'requests'), self.transport_config.get('http2', True))
+        # requests берёт прокси из сессии при каждом запросе, клиент httpx получает их при создании
+        proxies = dict(self.session.proxies)
+        if kind != previous_kind or getattr(self.transport, 'proxies', proxies) != proxies:
+            self.transport.close()
+            self.transport = create_transport(transport_config, self.session)
+            logger.info(f"🔧 Транспорт парсера: {self.transport.name}")
+        self.transport_config = transport_config
+
+        user_agent = settings.parser.user_agent or BROWSER_HEADERS['User-Agent']
+        if self.session.headers.get('User-Agent') != user_agent:
+            self.session.headers['User-Agent'] = user_agent
+            self.transport.update_headers({'User-Agent': user_agent})
+
+    def _setup_session(self, user_agent: str = "") -> None:
+        """Настройка HTTP-сессии; user_agent из PARSER_CONFIG заменяет браузерный"""
+        # br заявляется, только если установлен brotli: иначе ответ не распаковать
         self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
-            'Accept-Encoding': 'gzip, deflate, br',
+            **BROWSER_HEADERS,
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         })
+        if user_agent:
+            self.session.headers['User-Agent'] = user_agent
+
+    @staticmethod
+    def _city_from_url(url: str) -> str:
+        """Город определяется по поддомену: klg.quizplease.ru -> 'klg'"""
+        host = urlparse(url).hostname or ""
+        parts = host.split('.')
+        return parts[0] if len(parts) > 2 and not host.replace('.', '').isdigit() else ""
 
     def _determine_availability_type(self, button_text: str, status_text: str) -> Tuple[str, bool]:
         """
         Определение типа доступности игры
         """
-        button_lower = button_text.lower() if button_text else ""
-        status_lower = status_text.lower() if status_text else ""
+        button = self.keywords.labels(button_text)
+        status = self.keywords.labels(status_text)
 
         # Определение по тексту кнопки
-        if 'резерв' in button_lower:
+        if 'reserve' in button:
             return 'reserve', False
-        elif 'записаться' in button_lower:
+        elif 'signup' in button:
             return 'active', True
-        elif 'нет мест' in button_lower:
+        elif 'no_seats' in button:
             return 'reserve', False
 
         # Дополнительная проверка по статусу
-        if 'нет мест' in status_lower and 'резерв' in status_lower:
+        if 'no_seats' in status and 'reserve' in status:
             return 'reserve', False
-        elif 'осталось мало мест' in status_lower:
-            return 'active', True
-        elif 'свободные места' in status_lower:
-            return 'active', True
-        elif 'записаться' in status_lower:
+        elif status & {'few_seats', 'free_seats', 'signup'}:
             return 'active', True
 
         return 'unknown', False
@@ -295,9 +516,7 @@ class QuizPleaseParser:
                     href = button['href']
                     if href and href != "#":
                         # Преобразование относительного URL в абсолютный
-                        if href.startswith('/'):
-                            return f"https://klg.quizplease.ru{href}"
-                        return href
+                        return urljoin(self.base_url, href)
             return "#"
         except Exception as e:
             logger.debug(f"Не удалось извлечь URL регистрации: {str(e)}")
@@ -356,14 +575,14 @@ class QuizPleaseParser:
                 if re.search(r'\d{1,2}:\d{2}', text) or re.search(r'\d+\s*₽', text):
                     continue
 
+                labels = self.keywords.labels(text)
+
                 # Пропускаем даты
-                if any(month in text.lower() for month in ['янв', 'фев', 'мар', 'апр', 'май', 'июн',
-                                                           'июл', 'авг', 'сен', 'окт', 'ноя', 'дек']):
+                if 'month' in labels:
                     continue
 
                 # Проверяем на адресные признаки
-                if any(word in text.lower() for word in
-                       ['ул.', 'улица', 'проспект', 'пр.', 'дом', 'д.', 'г.', 'город']):
+                if 'address' in labels:
                     if not address and len(text) < 150:  # Адрес обычно не слишком длинный
                         address = text
                 else:
@@ -412,18 +631,8 @@ class QuizPleaseParser:
                 if text:
                     return text
 
-            # Поиск по тексту в блоке
-            block_text = block.get_text()
-            status_keywords = ['нет мест', 'осталось мало мест', 'свободные места', 'записаться', 'резерв']
-            for keyword in status_keywords:
-                if keyword in block_text.lower():
-                    # Ищем строку с ключевым словом
-                    lines = block_text.split('\n')
-                    for line in lines:
-                        if keyword in line.lower():
-                            return line.strip()
-
-            return ""
+            # Поиск по тексту в блоке: строка с самым приоритетным признаком статуса
+            return self.keywords.first_line(block.get_text(), STATUS_LABEL_PRIORITY)
         except Exception as e:
             logger.debug(f"Не удалось извлечь статус: {str(e)}")
             return ""
@@ -440,100 +649,241 @@ class QuizPleaseParser:
             logger.debug(f"Не удалось извлечь текст кнопки: {str(e)}")
             return ""
 
-    def _is_classic_or_regular_game(self, block) -> bool:
+    def _classify_game(self, block) -> Optional[Tuple[str, str]]:
         """
-        Проверка, является ли игра классической ИЛИ обычной игрой "Квиз, плиз! KLG"
+        Тип игры и её заголовок; None - в блоке нет заголовка игры.
+        Классической остаётся игра с заголовком "Квиз, плиз! KLG" или
+        с описанием классической игры, остальные получают свой тип
         """
         try:
             # Проверяем заголовок
             title_elem = block.find(['div', 'h2', 'h3'],
                                     class_=lambda x: x and ('h2-game-card' in x or 'game-title' in x or 'title' in x))
             if not title_elem:
-                return False
+                return None
 
             title = title_elem.text.strip() if hasattr(title_elem, 'text') else str(title_elem).strip()
-
-            # Заголовок должен быть именно "Квиз, плиз! KLG"
-            if title == "Квиз, плиз! KLG":
-                return True
-
-            # Дополнительная проверка: ищем описание классической игры
-            block_text = block.get_text()
-            classic_keywords = [
-                'классическая игра',
-                'вопросы на всевозможные темы',
-                'любое знание',
-                'классическая'
-            ]
-
-            # Если в тексте есть слова о классической игре
-            for keyword in classic_keywords:
-                if keyword in block_text.lower():
-                    return True
-
-            return False
+            game_type = self.game_types.classify(
+                title, self.keywords.labels(title), self.keywords.labels(block.get_text()))
+            return game_type, title
 
         except Exception as e:
             logger.debug(f"Ошибка при проверке игры: {str(e)}")
-            return False
+            return None
 
     def parse_games(self) -> List[Game]:
         """Парсинг только классических игр с сайта"""
         try:
             logger.info(f"Начинаем парсинг страницы: {self.base_url}")
 
-            response = self.session.get(self.base_url, timeout=30)
-            response.raise_for_status()
+            html = self.transport.get_text(self.base_url, self.timeout)
+            self._archive_page(html)
+            return self.parse_html(html)
 
-            soup = BeautifulSoup(response.text, 'html.parser')
+        except TransportError as e:
+            logger.error(f"Ошибка сети при запросе: {str(e)}")
+            return []
+        except Exception as e:
+            logger.error(f"Неожиданная ошибка при парсинге: {str(e)}", exc_info=True)
+            return []
 
-            # Ищем все блоки с играми
-            game_blocks = []
+    def _archive_page(self, html: str) -> None:
+        """Сохранение страницы в архив; ошибка архива не мешает парсингу"""
+        if not self.archive or not html:
+            return
+        try:
+            page = self.archive.store(self.base_url, html)
+            logger.debug(f"Страница сохранена в архив: {page.sha256[:12]}")
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить страницу в архив: {str(e)}")
 
-            # Несколько возможных селекторов для блоков игр
-            selectors = [
-                'div.schedule-column',
-                'div[class*="schedule"][class*="column"]',
-                'div.game-card',
-                'div.schedule-game'
-            ]
+    def parse_html(self, html: str) -> List[Game]:
+        """
+        Разбор уже загруженной страницы. В дерево попадают только контейнеры
+        блоков игр: шапка, подвал и скрипты отбрасываются ещё при разборе
+        """
+        strainer = SoupStrainer('div', attrs={'class': GAME_BLOCK_CLASS_RE})
+        soup = BeautifulSoup(html, 'html.parser', parse_only=strainer)
+
+        try:
+            # Ищем все блоки с играми, начиная с селектора, сработавшего в прошлый раз
+            game_blocks = []
+            matched_selector = None
 
-            for selector in selectors:
+            for selector in self.layout.ordered(GAME_BLOCK_SELECTORS):
+                self.layout.count('selector_scans')
                 game_blocks = soup.select(selector)
                 if game_blocks:
+                    matched_selector = selector
                     break
 
             logger.info(f"Найдено {len(game_blocks)} блоков с играми")
 
+            features = set()
+            for block in game_blocks[:LAYOUT_SAMPLE_BLOCKS]:
+                features.update(self._block_features(block))
+            self.layout.record(matched_selector, len(game_blocks), features)
+
             games = []
-            classic_count = 0
+            type_counts: Dict[str, int] = {}
 
             for block in game_blocks:
+                # Блок, вложенный в уже обработанный, освобождён вместе с ним
+                if block.decomposed:
+                    continue
+
                 try:
-                    # Проверяем, является ли игра классической ИЛИ обычной игрой "Квиз, плиз! KLG"
-                    if not self._is_classic_or_regular_game(block):
+                    # Тип определяется для каждого блока: все форматы игр из одного разбора
+                    classified = self._classify_game(block)
+                    if not classified:
                         continue
 
-                    game = self._parse_game_block(block)
+                    game = self._parse_game_block(block, *classified)
                     if game:
                         games.append(game)
-                        classic_count += 1
+                        type_counts[game.game_type] = type_counts.get(game.game_type, 0) + 1
 
                 except Exception as e:
                     logger.error(f"Ошибка при обработке блока: {str(e)}", exc_info=False)
                     continue
+                finally:
+                    # Поддерево блока больше не нужно
+                    block.decompose()
 
-            logger.info(f"Успешно обработано {classic_count} классических/обычных игр 'Квиз, плиз! KLG'")
+            self._log_type_counts(type_counts)
             return games
 
-        except requests.RequestException as e:
+        finally:
+            soup.decompose()
+
+    def iter_games(self) -> Iterator[Game]:
+        """
+        Потоковый парсинг: ответ читается частями, и каждая игра выдаётся,
+        как только её блок полностью загружен
+        """
+        self.last_read_complete = False
+        try:
+            logger.info(f"Начинаем потоковый парсинг страницы: {self.base_url}")
+
+            # Страница пишется в архив по частям, без буфера целой страницы
+            writer = self._open_archive_writer()
+
+            def chunks():
+                nonlocal writer
+                for chunk in self.transport.iter_text(self.base_url, self.timeout, chunk_size=16384):
+                    if writer:
+                        try:
+                            writer.write(chunk)
+                        except Exception as e:
+                            logger.warning(f"⚠️ Не удалось сохранить страницу в архив: {str(e)}")
+                            writer.discard()
+                            writer = None
+                    yield chunk
+
+            try:
+                yield from self._iter_games_from_chunks(chunks())
+                self.last_read_complete = True
+                # Архивируется только полностью прочитанная страница
+                if writer:
+                    try:
+                        page = writer.commit()
+                        writer = None
+                        logger.debug(f"Страница сохранена в архив: {page.sha256[:12]}")
+                    except Exception as e:
+                        logger.warning(f"⚠️ Не удалось сохранить страницу в архив: {str(e)}")
+            finally:
+                if writer:
+                    writer.discard()
+
+        except TransportError as e:
             logger.error(f"Ошибка сети при запросе: {str(e)}")
-            return []
         except Exception as e:
-            logger.error(f"Неожиданная ошибка при парсинге: {str(e)}", exc_info=True)
-            return []
+            logger.error(f"Неожиданная ошибка при потоковом парсинге: {str(e)}", exc_info=True)
+
+    def _open_archive_writer(self):
+        """Потоковая запись в архив или None, если архив выключен или недоступен"""
+        if not self.archive:
+            return None
+        try:
+            return self.archive.writer(self.base_url)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить страницу в архив: {str(e)}")
+            return None
+
+    def _iter_games_from_chunks(self, chunks: Iterable[str]) -> Iterator[Game]:
+        """Разбор HTML, поступающего частями"""
+        splitter = _ScheduleBlockSplitter(self.layout.ordered(GAME_BLOCK_SELECTORS))
+        blocks_count = 0
+        type_counts: Dict[str, int] = {}
+        selector_counts: Dict[str, int] = {}
+        features = set()
+
+        def completed_blocks():
+            for chunk in chunks:
+                splitter.feed(chunk)
+                yield from splitter.pop_completed()
+            # Блоки запасного селектора появляются только после конца страницы
+            splitter.close()
+            yield from splitter.pop_completed()
+
+        for selector, block_html in completed_blocks():
+            blocks_count += 1
+            selector_counts[selector] = selector_counts.get(selector, 0) + 1
+            sample = features if blocks_count <= LAYOUT_SAMPLE_BLOCKS else None
+            game = self._parse_block_html(block_html, features=sample)
+            if game:
+                type_counts[game.game_type] = type_counts.get(game.game_type, 0) + 1
+                yield game
+
+        logger.info(f"Найдено {blocks_count} блоков с играми")
+        matched_selector = max(selector_counts, key=selector_counts.get) if selector_counts else None
+        self.layout.record(matched_selector, blocks_count, features)
+        self._log_type_counts(type_counts)
+
+    def _log_type_counts(self, type_counts: Dict[str, int]) -> None:
+        details = ", ".join(f"{self.game_types.label(name)}: {count}" for name, count in type_counts.items())
+        logger.info(f"Успешно обработано {sum(type_counts.values())} игр ({details or 'нет'})")
+
+    def _parse_block_html(self, block_html: str, features: Optional[set] = None) -> Optional[Game]:
+        """Разбор разметки одного блока игры; features пополняется признаками вёрстки"""
+        soup = BeautifulSoup(block_html, 'html.parser')
+        try:
+            block = soup.div
+            if block is None:
+                return None
+            if features is not None:
+                features.update(self._block_features(block))
+            classified = self._classify_game(block)
+            if not classified:
+                return None
+            return self._parse_game_block(block, *classified)
+        except Exception as e:
+            logger.error(f"Ошибка при обработке блока: {str(e)}", exc_info=False)
+            return None
+        finally:
+            # Дерево блока содержит циклические ссылки, освобождаем его сразу
+            soup.decompose()
 
-    def _parse_game_block(self, block) -> Optional[Game]:
+    @staticmethod
+    def _block_features(block) -> List[str]:
+        """
+        Структурные элементы блока, на которые опирается извлечение полей.
+        Не зависят от статуса и текста игры, поэтому меняются только вместе с вёрсткой
+        """
+        checks = {
+            'title': lambda: block.find(['div', 'h2', 'h3'], class_=lambda x: x and (
+                'h2-game-card' in x or 'game-title' in x or 'title' in x)),
+            'game-number': lambda: block.find('span', class_='game-number'),
+            'date': lambda: block.find(['div', 'span'], class_=lambda x: x and (
+                'date' in x.lower() or 'day' in x.lower())),
+            'schedule-info': lambda: block.find('div', class_='schedule-info'),
+            'price': lambda: block.find(['div', 'span'], class_=lambda x: x and 'price' in x.lower()),
+            'status': lambda: block.find(['div', 'span'], class_=lambda x: x and 'status' in x.lower()),
+            'button': lambda: block.find('a', class_='button'),
+        }
+        return [name for name, check in checks.items() if check() is not None]
+
+    def _parse_game_block(self, block, game_type: str = 'classic', title: str = CLASSIC_TITLE) -> Optional[Game]:
         """Парсинг одного блока с игрой"""
         try:
             # Извлечение даты
@@ -542,8 +892,7 @@ class QuizPleaseParser:
                                            class_=lambda x: x and ('date' in x.lower() or 'day' in x.lower()))
             for elem in date_elements:
                 text = elem.text.strip()
-                if text and any(month in text.lower() for month in ['янв', 'фев', 'мар', 'апр', 'май', 'июн',
-                                                                    'июл', 'авг', 'сен', 'окт', 'ноя', 'дек']):
+                if text and 'month' in self.keywords.labels(text):
                     date_text = text
                     break
 
@@ -560,8 +909,9 @@ class QuizPleaseParser:
             # Извлечение места и адреса
             place_text, address_text = self._extract_place_and_address(block)
 
-            # Извлечение цены
+            # Извлечение цены: разбирается один раз, дальше используются поля игры
             price_text = self._extract_price(block)
+            price = parse_price(price_text)
 
             # Извлечение статуса
             status_text = self._extract_status(block)
@@ -589,7 +939,9 @@ class QuizPleaseParser:
             # Создание объекта игры
             game = Game(
                 id=game_id,
-                title="Квиз, плиз! KLG",  # Фиксируем название
+                # У классики название по городу, у остальных форматов - из заголовка
+                title=(title if is_classic_title(title) else classic_title(self.city))
+                if game_type == 'classic' else title,
                 game_number=game_number,
                 date=date_text,
                 time=time_text if time_text else "",
@@ -601,7 +953,13 @@ class QuizPleaseParser:
                 availability_type=availability_type,
                 registration_url=registration_url,
                 extracted_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                is_available=is_available
+                is_available=is_available,
+                city=self.city,
+                game_type=game_type,
+                price_amount=price.amount,
+                price_currency=price.currency,
+                price_unit=price.unit,
+                payment_methods=price.payment_methods
             )
 
             return game
@@ -614,9 +972,34 @@ class QuizPleaseParser:
 class GameStorage:
     """Класс для работы с хранением игр"""
 
-    def __init__(self, output_dir: str = None):
+    def __init__(self, output_dir: str = None, history_config: Dict = None):
         self.output_dir = output_dir or DATA_DIR
-        self.history_file = os.path.join(self.output_dir, 'games_history.json')
+        history_config = load_optional_config('HISTORY_CONFIG') if history_config is None else history_config
+        self.history = HistoryStore(
+            os.path.join(self.output_dir, 'history'),
+            keyframe_every=history_config.get('keyframe_every', 96),
+            retention_days=history_config.get('retention_days', 365)
+        )
+        self.change_feed = ChangeFeed(self.output_dir)
+        self.columns = None
+        if history_config.get('columnar_export', True):
+            try:
+                self.columns = ColumnarHistory(os.path.join(self.output_dir, 'columns'))
+            except Exception as e:
+                logger.error(f"Колоночная выгрузка истории недоступна: {str(e)}")
+        self._migrate_legacy_history()
+
+    def _migrate_legacy_history(self) -> None:
+        """Перенос games_history.json (полные копии игр) в историю с изменениями"""
+        legacy_file = os.path.join(self.output_dir, 'games_history.json')
+        if not os.path.exists(legacy_file) or os.path.exists(self.history.history_file):
+            return
+        try:
+            runs = self.history.import_legacy(legacy_file)
+            os.replace(legacy_file, f"{legacy_file}.migrated")
+            logger.info(f"История перенесена в новый формат: {runs} запусков")
+        except Exception as e:
+            logger.error(f"Не удалось перенести историю: {str(e)}")
 
     def save_games(self, games: List[Game], filename: str = "classic_games.json") -> str:
         """
@@ -642,30 +1025,54 @@ class GameStorage:
             return ""
 
     def _save_to_history(self, games: List[Game]) -> None:
-        """Сохранение игр в историю для отслеживания изменений"""
+        """Сохранение запуска в историю: полный снимок или только изменения"""
         try:
-            history = []
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    history = json.load(f)
+            self.history.append([game.to_dict() for game in games], datetime.now().isoformat())
+            if self.columns:
+                self.columns.update(self.history)
+        except Exception as e:
+            logger.error(f"Не удалось сохранить историю: {str(e)}")
 
-            # Добавляем текущие игры с timestamp
-            timestamp = datetime.now().isoformat()
-            for game in games:
-                game_data = game.to_dict()
-                game_data['timestamp'] = timestamp
-                game_data['parsed_at'] = game.extracted_at
-                history.append(game_data)
+    def iter_history_runs(self) -> Iterator[Tuple[str, List[Dict]]]:
+        """История, сгруппированная по запускам: (timestamp, игры запуска)"""
+        return self.history.iter_runs()
 
-            # Ограничиваем размер истории (последние 1000 записей)
-            if len(history) > 1000:
-                history = history[-1000:]
+    def load_games_at(self, moment: str) -> List[Game]:
+        """Расписание на момент времени (ISO строка) из истории"""
+        games = []
+        for game_data in self.history.state_at(moment):
+            try:
+                games.append(Game(**game_data))
+            except Exception as e:
+                logger.warning(f"Ошибка при создании игры из истории: {str(e)}")
+        return games
 
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(history, f, ensure_ascii=False, indent=2)
+    def snapshot_version(self, filename: str = "classic_games.json") -> int:
+        """Момент записи снимка (mtime в наносекундах); 0 - снимка нет"""
+        try:
+            return os.stat(os.path.join(self.output_dir, filename)).st_mtime_ns
+        except OSError:
+            return 0
 
+    def record_changes(self, current_games: List[Game], previous_games: List[Game],
+                       run_key: str = None) -> List[Dict]:
+        """
+        Запись отличий от предыдущего снимка в ленту изменений. Лента
+        дописывается до сохранения снимка; run_key (ключ прошлого снимка)
+        не даёт записать те же события дважды, если запуск повторяется после сбоя
+        """
+        try:
+            events = diff_snapshots([game.to_dict() for game in previous_games],
+                                    [game.to_dict() for game in current_games])
+            if run_key and events:
+                # Если расписание успело измениться, повторный запуск даст другие события
+                content = json.dumps([[e['type'], e['game_id'], e.get('changes')] for e in events],
+                                     ensure_ascii=False, sort_keys=True)
+                run_key = f"{run_key}:{hashlib.sha1(content.encode('utf-8')).hexdigest()[:12]}"
+            return self.change_feed.append(events, run=run_key)
         except Exception as e:
-            logger.debug(f"Не удалось сохранить историю: {str(e)}")
+            logger.error(f"Ошибка при записи ленты изменений: {str(e)}")
+            return []
 
     def load_games(self, filename: str = "classic_games.json") -> List[Game]:
         """
@@ -736,16 +1143,75 @@ class GameStorage:
         return changed_games
 
 
+class SnapshotDiff:
+    """
+    Сравнение с предыдущим снимком по одной игре за раз, чтобы изменения
+    обнаруживались ещё во время загрузки страницы. Правила те же, что у
+    GameStorage.find_new_games и GameStorage.find_changed_games
+    """
+
+    def __init__(self, previous_games: List[Game]):
+        self.has_previous = bool(previous_games)
+        self.previous_hashes = {game.game_hash for game in previous_games}
+        self.previous_by_number = {game.game_number: game for game in previous_games}
+        self.new_games: List[Game] = []
+        self.changed_games: List[Game] = []
+
+    def add(self, game: Game) -> Tuple[bool, bool]:
+        """Возвращает (новая игра, изменился статус)"""
+        is_new = not self.has_previous or game.game_hash not in self.previous_hashes
+        previous_game = self.previous_by_number.get(game.game_number)
+        is_changed = bool(previous_game and previous_game.availability_type != game.availability_type)
+
+        if is_new:
+            self.new_games.append(game)
+        if is_changed:
+            self.changed_games.append(game)
+        return is_new, is_changed
+
+    def log_summary(self) -> None:
+        if self.new_games:
+            logger.info(f"Найдено {len(self.new_games)} новых игр")
+        else:
+            logger.info("Новых игр не найдено")
+
+        if self.changed_games:
+            logger.info(f"Найдено {len(self.changed_games)} игр с измененным статусом")
+        else:
+            logger.info("Игр с измененным статусом не найдено")
+
+
 class QuizPleaseMonitor:
     """Основной класс мониторинга игр"""
 
-    def __init__(self, telegram_token: str = None, telegram_chat_id: str = None):
-        self.parser = QuizPleaseParser()
-        self.storage = GameStorage()
-        self.telegram = None
+    def __init__(self, telegram_token: str = None, telegram_chat_id: str = None,
+                 subscriptions_config: Dict = None, autoreg_config: Dict = None,
+                 notify_game_types: List[str] = None, parser: 'QuizPleaseParser' = None,
+                 storage: 'GameStorage' = None, telegram=None, outbox_config: Dict = None):
+        self.parser = parser or QuizPleaseParser()
+        self.storage = storage or GameStorage()
+        # Разбираются и сохраняются все типы игр, в общий чат уходят только выбранные (None - все)
+        self.notify_game_types: Optional[set] = set(notify_game_types or ['classic'])
+        self.settings: Optional[Settings] = None
+        self.notification_settings = NotificationSettings()
+        self.filter_settings = FilterSettings()
+        # Готовый бот (например, заглушка при прогоне по архиву) используется как есть
+        self.telegram = telegram
+        self.fan_out = None
+        self.notifications: Optional[NotificationQueue] = None
+        self.outbox: Optional[Outbox] = None
+        self._run_key = ""
+        self._previous_by_number: Dict[str, Game] = {}
+        self.last_run_changed = False
+        self.last_new_games: List[Game] = []
+        self.last_changed_games: List[Game] = []
+        self.autoreg = None
+        self.snapshot_listeners: List[Callable[[List[Game]], None]] = []
+        # Процесс городов проверяет аренду: без неё запуск прерывается до записи и уведомлений
+        self.lease_check: Optional[Callable[[], bool]] = None
 
         # Инициализация Telegram бота
-        if telegram_token and telegram_chat_id:
+        if telegram is None and telegram_token and telegram_chat_id:
             try:
                 from src.telegram_notifier import TelegramBot
                 self.telegram = TelegramBot(telegram_token, telegram_chat_id)
@@ -762,6 +1228,157 @@ class QuizPleaseMonitor:
                 logger.error(f"Ошибка инициализации Telegram бота: {str(e)}")
                 self.telegram = None
 
+        if self.telegram:
+            self._init_outbox(load_optional_config('OUTBOX_CONFIG') if outbox_config is None else outbox_config)
+            self._init_subscriptions(subscriptions_config or {})
+
+        if autoreg_config and autoreg_config.get('enabled'):
+            self._init_autoreg(autoreg_config)
+
+        # Хронологии заполнения пополняются после каждого запуска,
+        # чтобы /stats и CLI аналитики не разбирали накопившуюся историю
+        self.analytics = FillRateAnalytics(
+            self.storage.history, os.path.join(self.storage.output_dir, 'analytics_index.json'))
+        self.add_snapshot_listener(lambda games: self.analytics.update())
+
+    def apply_settings(self, settings: Settings, apply_url: bool = True) -> None:
+        """
+        Применение настроек. Вызывается между запусками, поэтому запуск
+        никогда не видит смесь старых и новых настроек; соединения
+        с Telegram и сайтом при этом не пересоздаются
+        """
+        previous, self.settings = self.settings, settings
+        self.notification_settings = settings.notification
+        self.filter_settings = settings.filter
+        types = settings.notify_game_types()
+        self.notify_game_types = set(types) if types is not None else None
+        self.parser.apply_settings(settings, apply_url)
+        if self.autoreg:
+            self.autoreg.transport = self.parser.transport
+
+        if self.telegram and str(getattr(self.telegram, 'chat_id', '')) != settings.telegram.chat_id:
+            self.telegram.chat_id = settings.telegram.chat_id
+        if previous is None:
+            return
+        if settings.telegram.token != previous.telegram.token:
+            logger.warning("⚠️ Новый токен Telegram вступит в силу после перезапуска")
+        if settings.logging != previous.logging:
+            setup_logging(asdict(settings.logging), LOG_FILE)
+
+    def _should_notify(self, game: Game) -> bool:
+        """Попадает ли игра в уведомления общего чата: типы игр и FILTER_CONFIG"""
+        if self.notify_game_types is not None and game.game_type not in self.notify_game_types:
+            return False
+        filters = self.filter_settings
+        if filters.only_available and game.availability_type != 'active':
+            return False
+        if filters.exclude_reserve and game.availability_type == 'reserve':
+            return False
+        if filters.future_days:
+            start = parse_game_datetime(game.date, game.time)
+            if start and start > datetime.now() + timedelta(days=filters.future_days):
+                return False
+        return True
+
+    def _init_autoreg(self, autoreg_config: Dict) -> None:
+        """Подключение авторегистрации на отслеживаемые игры"""
+        try:
+            from autoreg import AutoRegistrar
+            self.autoreg = AutoRegistrar(
+                autoreg_config,
+                os.path.join(self.storage.output_dir, 'autoreg_state.json'),
+                on_result=self._report_registration,
+                transport=self.parser.transport
+            )
+            # Прогреваем соединение и формы по последнему сохранённому расписанию
+            self.autoreg.prepare(self.storage.load_games())
+        except Exception as e:
+            logger.error(f"Ошибка инициализации авторегистрации: {str(e)}")
+            self.autoreg = None
+
+    def _report_registration(self, result) -> None:
+        """Результат авторегистрации - срочное уведомление"""
+        if not self.telegram:
+            return
+        if self.notifications is not None:
+            self.notifications.put(result.to_telegram_message(), priority=PRIORITY_AVAILABILITY)
+            self.notifications.dispatch(max_priority=PRIORITY_AVAILABILITY)
+        else:
+            self.telegram.send_message(result.to_telegram_message())
+
+    def _init_outbox(self, outbox_config: Dict) -> None:
+        """Очередь сообщений на диске: уведомления не теряются при сбоях Telegram"""
+        if not outbox_config.get('enabled', True):
+            return
+        try:
+            self.outbox = Outbox(os.path.join(self.storage.output_dir, 'outbox.sqlite3'), outbox_config)
+            counts = self.outbox.counts()
+            if counts.get('pending') or counts.get('dead'):
+                logger.info(f"📮 Outbox: ожидают отправки - {counts.get('pending', 0)}, "
+                            f"не доставлено - {counts.get('dead', 0)}")
+        except Exception as e:
+            logger.error(f"Ошибка инициализации outbox, уведомления будут отправляться напрямую: {str(e)}")
+            self.outbox = None
+
+    @staticmethod
+    def _snapshot_key(games: List[Game], version: int = 0) -> str:
+        """
+        Отпечаток сохранённого снимка: игры и момент записи (version). Ключи
+        уведомлений строятся от него: пока новый снимок не записан, повторный
+        запуск получает те же ключи и не отправляет сообщения второй раз, а
+        каждый сохранённый запуск - новые, даже если расписание вернулось
+        к прежнему состоянию
+        """
+        data = "\n".join(sorted(game.game_hash for game in games)) + f"\n{version}"
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()[:12]
+
+    def _event_key(self, kind: str, game: Game) -> str:
+        """Ключ события по игре: запуск и переход игры (прежний хэш > новый)"""
+        previous = self._previous_by_number.get(game.game_number)
+        return f"{self._run_key}:{kind}:{previous.game_hash if previous else '-'}>{game.game_hash}"
+
+    def _init_subscriptions(self, subscriptions_config: Dict) -> None:
+        """Подключение рассылки подписчикам"""
+        if not subscriptions_config.get('enabled', True):
+            return
+        try:
+            from subscriptions import SubscriptionStore, SubscriptionFanOut
+            store = SubscriptionStore(os.path.join(
+                self.storage.output_dir, subscriptions_config.get('file', 'subscriptions.json')))
+            self.fan_out = SubscriptionFanOut(
+                self.telegram,
+                store,
+                max_concurrency=subscriptions_config.get('max_concurrency', 20),
+                messages_per_second=subscriptions_config.get('messages_per_second', 25),
+                per_chat_interval=subscriptions_config.get('per_chat_interval', 1.0)
+            )
+        except Exception as e:
+            logger.error(f"Ошибка инициализации подписок: {str(e)}")
+            self.fan_out = None
+
+    def close(self) -> None:
+        """Освобождение соединений монитора; общий бот Telegram не закрывается"""
+        for name, close in (('outbox', self.outbox.close if self.outbox else None),
+                            ('transport', self.parser.transport.close),
+                            ('session', self.parser.session.close)):
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception as e:
+                logger.debug(f"Ошибка при закрытии {name}: {str(e)}")
+
+    def add_snapshot_listener(self, listener: Callable[[List[Game]], None]) -> None:
+        """Подписка на свежий снимок расписания после каждого запуска (кэш бота, API)"""
+        self.snapshot_listeners.append(listener)
+
+    def _publish_snapshot(self, games: List[Game]) -> None:
+        for listener in self.snapshot_listeners:
+            try:
+                listener(games)
+            except Exception as e:
+                logger.error(f"Ошибка в слушателе снимка расписания: {str(e)}")
+
     def run(self, send_notifications: bool = True) -> List[Game]:
         """
         Запуск полного цикла мониторинга
@@ -771,11 +1388,44 @@ class QuizPleaseMonitor:
             logger.info("Запуск мониторинга игр 'Квиз, плиз! KLG'")
             logger.info("=" * 60)
 
+            # Очередь уведомлений текущего запуска: срочные оповещения уходят сразу
+            send_notifications = send_notifications and self.notification_settings.send_telegram
+            self.notifications = (NotificationQueue(self.telegram, self.outbox)
+                                  if self.telegram and send_notifications else None)
+            self.last_new_games, self.last_changed_games = [], []
+
             # Загружаем предыдущие игры
             previous_games = self.storage.load_games()
-
-            # Парсим текущие игры
-            current_games = self.parser.parse_games()
+            self._run_key = self._snapshot_key(previous_games, self.storage.snapshot_version())
+
+            # Парсим текущие игры потоком и сравниваем каждую сразу по мере получения
+            diff = SnapshotDiff(previous_games)
+            self._previous_by_number = diff.previous_by_number
+            current_games = []
+            games_iter = self.parser.iter_games()
+            for game in games_iter:
+                if self._lease_lost():
+                    games_iter.close()
+                    return []
+                detected_at = time.monotonic()
+                current_games.append(game)
+
+                # Регистрация важнее любых уведомлений: форма уходит первой
+                if self.autoreg and game.availability_type == 'active':
+                    self.autoreg.register(game, detected_at)
+
+                is_new, is_changed = diff.add(game)
+                if is_new or is_changed:
+                    self._on_game_detected(game, is_new, is_changed, detected_at)
+
+            if not self.parser.last_read_complete:
+                # Часть страницы - не расписание: снимок, история и лента не меняются,
+                # и следующий полный запуск сравнит игры с тем же снимком заново
+                logger.warning(f"⚠️ Страница загружена не полностью (получено игр: {len(current_games)}), "
+                               f"результаты запуска отброшены")
+                current_games = []
+
+            self._report_layout_alerts(send_notifications)
 
             if not current_games:
                 logger.warning("Не удалось найти игры")
@@ -783,16 +1433,45 @@ class QuizPleaseMonitor:
                     self.telegram.send_message("❌ Не удалось получить расписание игр.")
                 return []
 
+            if self._lease_lost():
+                return []
+
+            # Изменения уже найдены во время загрузки
+            diff.log_summary()
+            new_games = diff.new_games
+            changed_games = diff.changed_games
+            self.last_run_changed = bool(new_games or changed_games)
+            self.last_new_games, self.last_changed_games = new_games, changed_games
+
+            # Уведомления записываются в очередь до сохранения снимка: после записи
+            # снимка эти игры уже не будут новыми, и потерять сообщения нельзя
+            if self.notifications is not None:
+                self._queue_telegram_notifications(*(
+                    [game for game in games if self._should_notify(game)]
+                    for games in (current_games, new_games, changed_games)))
+                self.notifications.flush()
+                if self.fan_out and self.outbox:
+                    self._queue_subscriber_notifications(new_games, changed_games)
+
+            # Лента изменений, как и очередь уведомлений, дописывается до записи снимка:
+            # после записи отличия от прошлого снимка уже не восстановить
+            self.storage.record_changes(current_games, previous_games, self._run_key)
+
             # Сохраняем текущие игры
             self.storage.save_games(current_games)
+            self._publish_snapshot(current_games)
 
-            # Анализируем изменения
-            new_games = self.storage.find_new_games(current_games, previous_games)
-            changed_games = self.storage.find_changed_games(current_games, previous_games)
+            # Формы для отслеживаемых игр готовятся заранее, до появления мест
+            if self.autoreg:
+                self.autoreg.prepare(current_games)
 
             # Отправляем уведомления в Telegram
-            if self.telegram and send_notifications:
-                self._send_telegram_notifications(current_games, new_games, changed_games)
+            if self.notifications is not None:
+                self._dispatch_notifications()
+
+            # Рассылаем новые и изменившиеся игры подписчикам по их фильтрам
+            if self.fan_out and self.notifications is not None:
+                self._send_to_subscribers(new_games, changed_games)
 
             # Выводим статистику
             self._print_statistics(current_games, new_games, changed_games)
@@ -806,56 +1485,157 @@ class QuizPleaseMonitor:
             logger.error(f"Критическая ошибка в мониторинге: {str(e)}", exc_info=True)
             return []
 
-    def _send_telegram_notifications(self, current_games: List[Game],
-                                     new_games: List[Game],
-                                     changed_games: List[Game]) -> None:
-        """Отправка уведомлений в Telegram - ПОЛНЫЙ ВЫВОД КАЖДОЙ ИГРЫ"""
-        try:
-            # 1. Отправляем сводку
-            self.telegram.send_summary(current_games)
-
-            # 2. Отправляем ПОЛНЫЙ РАСКЛАД по КАЖДОЙ найденной игре
-            if current_games:
-                # Заголовок для полного расклада
-                if len(current_games) == 1:
-                    self.telegram.send_message(f"🎲 *ПОЛНЫЙ РАСКЛАД ПО ИГРЕ:*")
-                else:
-                    self.telegram.send_message(f"🎲 *ПОЛНЫЙ РАСКЛАД ПО ВСЕМ {len(current_games)} ИГРАМ:*")
+    def run_forever(self, scheduler, send_notifications: bool = True,
+                    reload: Callable[[], Optional[Settings]] = None) -> None:
+        """
+        Непрерывный мониторинг: пауза между запусками выбирается планировщиком.
+        reload возвращает новые настройки, если файл изменился; они
+        применяются перед следующим запуском
+        """
+        scheduler.learn(self.storage.iter_history_runs())
+        while True:
+            settings = reload() if reload else None
+            if settings is not None:
+                self.apply_settings(settings)
+                apply_scheduler_settings(scheduler, settings)
+            self.last_run_changed = False
+            games = self.run(send_notifications=send_notifications)
+            scheduler.observe(datetime.now(), self.last_run_changed)
+            time.sleep(scheduler.next_interval(games))
+
+    def _lease_lost(self) -> bool:
+        """Аренда города потеряна: запуск прерывается, город уже опрашивает другой процесс"""
+        if self.lease_check is None or self.lease_check():
+            return False
+        logger.warning("⚠️ Аренда города потеряна: запуск прерван без записи и уведомлений")
+        return True
+
+    def _report_layout_alerts(self, send_notifications: bool) -> None:
+        """Предупреждения о смене вёрстки сайта уходят в Telegram отдельно от расписания"""
+        alerts = self.parser.layout.pop_alerts()
+        if alerts:
+            logger.info(f"Метрики парсера: {self.parser.layout.metrics}")
+        if not (alerts and self.telegram and send_notifications):
+            return
+        for alert in alerts:
+            self.telegram.send_message(f"⚠️ ВЁРСТКА РАСПИСАНИЯ\n{alert}", parse_mode=None)
+
+    def _on_game_detected(self, game: Game, is_new: bool, is_changed: bool,
+                          detected_at: float) -> None:
+        """
+        Вызывается для новой или изменившейся игры, пока страница ещё загружается.
+        Освободившиеся места - самое срочное событие: оповещение уходит сразу,
+        не дожидаясь окончания загрузки, сводки и полного расклада
+        """
+        if not is_changed or self.notification_settings.only_new_games or not self._should_notify(game):
+            return
+
+        logger.info(f"🔄 Игра {game.game_number}: статус изменился на '{game.availability_type}'")
+        if game.availability_type == 'active' and self.notifications is not None:
+            self.notifications.put(
+                f"🔥 *ОСВОБОДИЛИСЬ МЕСТА!*\n\n{game.to_telegram_message()}",
+                priority=PRIORITY_AVAILABILITY,
+                detected_at=detected_at,
+                key=self._event_key('available', game)
+            )
+            self.notifications.dispatch(max_priority=PRIORITY_AVAILABILITY)
 
-                # Отправляем каждую игру полным сообщением
-                for i, game in enumerate(current_games, 1):
-                    logger.info(f"Отправка игры {i}/{len(current_games)}: {game.game_number}")
-                    self.telegram.send_game_notification(game)
-                    # Пауза между сообщениями, чтобы не превысить лимиты Telegram API
-                    time.sleep(0.5)
+    def _queue_telegram_notifications(self, current_games: List[Game],
+                                      new_games: List[Game],
+                                      changed_games: List[Game]) -> None:
+        """
+        Постановка уведомлений в очередь по приоритетам: освободившиеся места
+        (уже отправлены при обнаружении), затем новые игры и изменения статуса,
+        и только потом сводка и ПОЛНЫЙ ВЫВОД КАЖДОЙ ИГРЫ.
+        Ключи событий зависят от прошлого снимка, ключи сводки - от запуска:
+        сводка и расклад, как и раньше, уходят при каждой проверке
+        """
+        queue = self.notifications
+        detected_at = time.monotonic()
+        key = self._run_key
+        run_key = f"{key}:{datetime.now().isoformat()}"
 
-            # 3. Отправляем уведомления о новых играх (если есть)
+        try:
+            # 1. Уведомления о новых играх (если есть)
             if new_games:
                 if len(new_games) == 1:
-                    self.telegram.send_message(f"🎉 *НОВАЯ ИГРА!*")
+                    queue.put(f"🎉 *НОВАЯ ИГРА!*", PRIORITY_NEW_GAME, detected_at, key=f"{key}:new")
                 else:
-                    self.telegram.send_message(f"🎉 *НОВЫЕ ИГРЫ!* ({len(new_games)})")
+                    queue.put(f"🎉 *НОВЫЕ ИГРЫ!* ({len(new_games)})", PRIORITY_NEW_GAME, detected_at,
+                              key=f"{key}:new")
 
-                # Новые игры уже отправлены в полном раскладе
                 for game in new_games:
-                    self.telegram.send_game_notification(game)
-                    time.sleep(0.3)
+                    queue.put(game.to_telegram_message(), PRIORITY_NEW_GAME, detected_at, pause=0.3,
+                              key=self._event_key('new', game))
+
+            # Только новые игры: без изменений статуса, сводки и расклада
+            if self.notification_settings.only_new_games:
+                return
+
+            # 2. Остальные изменения статуса (места освободились - уже отправлено срочно)
+            other_changes = [g for g in changed_games if g.availability_type != 'active']
+            if other_changes:
+                if len(other_changes) == 1:
+                    queue.put(f"🔄 *ИЗМЕНИЛСЯ СТАТУС ИГРЫ!*", PRIORITY_NEW_GAME, detected_at, key=f"{key}:changed")
+                else:
+                    queue.put(f"🔄 *ИЗМЕНИЛСЯ СТАТУС ИГР!* ({len(other_changes)})", PRIORITY_NEW_GAME, detected_at,
+                              key=f"{key}:changed")
 
-            # 4. Отправляем уведомления об изменении статуса (если есть)
-            if changed_games:
-                if len(changed_games) == 1:
-                    self.telegram.send_message(f"🔄 *ИЗМЕНИЛСЯ СТАТУС ИГРЫ!*")
+                for game in other_changes:
+                    queue.put(game.to_telegram_message(), PRIORITY_NEW_GAME, detected_at, pause=0.3,
+                              key=self._event_key('changed', game))
+
+            # 3. Сводка
+            queue.put(self.telegram.format_summary(current_games), PRIORITY_BULK, key=f"{run_key}:summary")
+
+            # 4. ПОЛНЫЙ РАСКЛАД по КАЖДОЙ найденной игре
+            if current_games and self.notification_settings.send_full_details:
+                if len(current_games) == 1:
+                    queue.put(f"🎲 *ПОЛНЫЙ РАСКЛАД ПО ИГРЕ:*", PRIORITY_BULK, key=f"{run_key}:full")
                 else:
-                    self.telegram.send_message(f"🔄 *ИЗМЕНИЛСЯ СТАТУС ИГР!* ({len(changed_games)})")
+                    queue.put(f"🎲 *ПОЛНЫЙ РАСКЛАД ПО ВСЕМ {len(current_games)} ИГРАМ:*", PRIORITY_BULK,
+                              key=f"{run_key}:full")
 
-                # Игры с измененным статусом уже отправлены в полном раскладе
-                for game in changed_games:
-                    self.telegram.send_game_notification(game)
-                    time.sleep(0.3)
+                # Пауза между сообщениями, чтобы не превысить лимиты Telegram API
+                for game in current_games:
+                    queue.put(game.to_telegram_message(), PRIORITY_BULK, pause=0.5,
+                              key=f"{run_key}:full:{game.id}")
+
+        except Exception as e:
+            logger.error(f"Ошибка при подготовке уведомлений: {str(e)}")
 
+    def _dispatch_notifications(self) -> None:
+        """Отправка очереди; недоставленное остаётся в outbox до следующей доставки"""
+        try:
+            self.notifications.dispatch()
+            logger.info(f"Итоги отправки уведомлений: {self.notifications.report()}")
         except Exception as e:
             logger.error(f"Ошибка при отправке уведомлений: {str(e)}")
 
+    def _queue_subscriber_notifications(self, new_games: List[Game], changed_games: List[Game]) -> None:
+        """Рассылка подписчикам записывается в outbox вместе с уведомлениями общего чата"""
+        try:
+            unique_games = list({game.id: game for game in new_games + changed_games}.values())
+            keys = {game.id: self._event_key('subscribers', game) for game in unique_games}
+            self.fan_out.enqueue(self.outbox, unique_games, keys, priority=PRIORITY_NEW_GAME)
+        except Exception as e:
+            logger.error(f"Ошибка при подготовке рассылки подписчикам: {str(e)}")
+
+    def _send_to_subscribers(self, new_games: List[Game], changed_games: List[Game]) -> None:
+        """
+        Рассылка подписчикам: каждая игра попадает в рассылку один раз.
+        С outbox отправляется уже записанная очередь, включая недоставленное ранее
+        """
+        try:
+            if self.outbox:
+                self.fan_out.deliver_outbox(self.outbox)
+                return
+            unique_games = list({game.id: game for game in new_games + changed_games}.values())
+            if unique_games:
+                self.fan_out.deliver(unique_games)
+        except Exception as e:
+            logger.error(f"Ошибка при рассылке подписчикам: {str(e)}")
+
     def _print_statistics(self, current_games: List[Game],
                           new_games: List[Game],
                           changed_games: List[Game]) -> None:
@@ -876,8 +1656,19 @@ class QuizPleaseMonitor:
         logger.info(f"🎉 Новые игры: {len(new_games)}")
         logger.info(f"🔄 Игры с измененным статусом: {len(changed_games)}")
 
+        prices = sorted(g.price_amount for g in current_games if g.price_amount is not None)
+        if prices:
+            logger.info(f"💰 Цена: от {prices[0]} до {prices[-1]} ₽, медиана {prices[len(prices) // 2]} ₽")
+
+        type_counts: Dict[str, int] = {}
+        for game in current_games:
+            type_counts[game.game_type] = type_counts.get(game.game_type, 0) + 1
+        types_line = ", ".join(f"{self.parser.game_types.label(name)}: {count}"
+                               for name, count in type_counts.items())
+        logger.info(f"🎲 По типам: {types_line}")
+
         # Вывод в консоль
-        print(f"\n🎯 Найдено {len(current_games)} игр 'Квиз, плиз! KLG'")
+        print(f"\n🎯 Найдено {len(current_games)} игр 'Квиз, плиз! KLG' ({types_line})")
         print(f"   ✅ Доступных для записи: {len(active_games)}")
         print(f"   ⚠️  Для записи в резерв: {len(reserve_games)}")
 
@@ -910,14 +1701,119 @@ class QuizPleaseMonitor:
         logger.info("=" * 50)
 
 
+def apply_scheduler_settings(scheduler, settings: Settings) -> None:
+    """Интервалы планировщика из новых настроек; накопленная статистика сохраняется"""
+    scheduler.base_interval = settings.notification.check_interval
+    scheduler.config.update(settings.section('SCHEDULER_CONFIG'))
+
+
+def run_city_worker() -> None:
+    """
+    Процесс мониторинга нескольких городов (CITIES_CONFIG). Города
+    распределяются между всеми запущенными процессами через аренды
+    в data/cities.sqlite3; у каждого города свои данные в data/cities/<город>
+    """
+    from city_coordinator import CityCoordinator, CityWorker, DEFAULT_CITIES_CONFIG
+    from scheduler import AdaptiveScheduler
+
+    settings = get_settings()
+    config = {**DEFAULT_CITIES_CONFIG, **settings.section('CITIES_CONFIG')}
+    base_url = settings.parser.base_url
+    cities = config['cities'] or {QuizPleaseParser._city_from_url(base_url) or 'default': base_url}
+    coordinator = CityCoordinator(os.path.join(DATA_DIR, 'cities.sqlite3'), config['lease_seconds'])
+    coordinator.sync_cities(cities)
+
+    # Город переходит между процессами, поэтому монитор (снимок, история, состояние
+    # авторегистрации и парсера) создаётся заново на каждую аренду из данных на диске.
+    # Между арендами живут только бот Telegram и статистика планировщиков
+    schedulers: Dict[str, AdaptiveScheduler] = {}
+    bot: Dict[str, object] = {}
+
+    def poll(city: str, url: str) -> float:
+        # Изменённые настройки применяются между опросами ко всем городам процесса
+        changed = reload_settings()
+        if changed is not None:
+            for scheduler in schedulers.values():
+                apply_scheduler_settings(scheduler, changed)
+
+        settings = get_settings()
+        city_dir = os.path.join(DATA_DIR, 'cities', city)
+        os.makedirs(city_dir, exist_ok=True)
+        # Бот создаётся (и шлёт тестовое сообщение) один раз на процесс
+        monitor = QuizPleaseMonitor(
+            telegram_token=None if bot else settings.telegram.token,
+            telegram_chat_id=None if bot else settings.telegram.chat_id,
+            subscriptions_config=settings.section('SUBSCRIPTIONS_CONFIG'),
+            autoreg_config=settings.section('AUTOREG_CONFIG'),
+            parser=QuizPleaseParser(url, state_dir=city_dir),
+            storage=GameStorage(city_dir),
+            telegram=bot.get('telegram'),
+            outbox_config=settings.section('OUTBOX_CONFIG')
+        )
+        bot.setdefault('telegram', monitor.telegram)
+        try:
+            monitor.apply_settings(settings, apply_url=False)
+            if city not in schedulers:
+                schedulers[city] = AdaptiveScheduler(settings.notification.check_interval,
+                                                     settings.section('SCHEDULER_CONFIG'))
+                schedulers[city].learn(monitor.storage.iter_history_runs())
+
+            monitor.lease_check = worker.holds_lease
+            monitor.last_run_changed = False
+            games = monitor.run(send_notifications=True)
+            schedulers[city].observe(datetime.now(), monitor.last_run_changed)
+            return schedulers[city].next_interval(games)
+        finally:
+            monitor.close()
+
+    worker = CityWorker(coordinator, poll, idle_sleep=config['idle_sleep'])
+    logger.info(f"🏙 Процесс {worker.worker_id}: мониторинг городов {', '.join(cities)}")
+    worker.run_forever()
+
+
 def main():
     """Основная функция запуска мониторинга"""
+    arg_parser = argparse.ArgumentParser(description="Мониторинг игр 'Квиз, плиз! KLG'")
+    arg_parser.add_argument('--loop', action='store_true',
+                            help="Работать непрерывно с адаптивным интервалом проверки")
+    arg_parser.add_argument('--serve', action='store_true',
+                            help="Вместе с --loop отдавать расписание по HTTP (API_CONFIG)")
+    arg_parser.add_argument('--worker', action='store_true',
+                            help="Опрашивать города из CITIES_CONFIG вместе с другими такими процессами")
+    args = arg_parser.parse_args()
+
+    if args.worker:
+        try:
+            run_city_worker()
+        except KeyboardInterrupt:
+            print("\n⏹️  Мониторинг прерван пользователем")
+        return 0
+
     try:
-        # Используем конфигурацию, загруженную в начале
+        # Настройки загружаются здесь (программа завершится, если что-то не так)
+        settings = get_settings()
         monitor = QuizPleaseMonitor(
-            telegram_token=TELEGRAM_CONFIG['token'],
-            telegram_chat_id=TELEGRAM_CONFIG['chat_id']
+            telegram_token=settings.telegram.token,
+            telegram_chat_id=settings.telegram.chat_id,
+            subscriptions_config=settings.section('SUBSCRIPTIONS_CONFIG'),
+            autoreg_config=settings.section('AUTOREG_CONFIG'),
+            outbox_config=settings.section('OUTBOX_CONFIG')
         )
+        monitor.apply_settings(settings)
+
+        if args.serve:
+            from api_server import SnapshotApi
+            api = SnapshotApi(settings.section('API_CONFIG'))
+            api.update(monitor.storage.load_games())
+            monitor.add_snapshot_listener(api.update)
+            api.start()
+            args.loop = True
+
+        if args.loop:
+            from scheduler import AdaptiveScheduler
+            scheduler = AdaptiveScheduler(settings.notification.check_interval, settings.section('SCHEDULER_CONFIG'))
+            monitor.run_forever(scheduler, send_notifications=True, reload=reload_settings)
+            return 0
 
         # Запускаем мониторинг
         games = monitor.run(send_notifications=True)
@@ -0,0 +1,68 @@
+"""
+Разбор дат игр в формате сайта ("4 января, Воскресенье")
+"""
+
+import re
+from datetime import datetime
+from typing import Optional
+
+MONTHS = {
+    'январ': 1, 'феврал': 2, 'март': 3, 'апрел': 4, 'мая': 5, 'май': 5,
+    'июн': 6, 'июл': 7, 'август': 8, 'сентябр': 9, 'октябр': 10,
+    'ноябр': 11, 'декабр': 12
+}
+
+WEEKDAYS = {
+    'понедельник': 0, 'вторник': 1, 'среда': 2, 'четверг': 3,
+    'пятница': 4, 'суббота': 5, 'воскресенье': 6
+}
+
+_DATE_RE = re.compile(r'(\d{1,2})\s+([а-яё]+)', re.IGNORECASE)
+_TIME_RE = re.compile(r'(\d{1,2}):(\d{2})')
+
+
+def parse_weekday(date_text: str) -> Optional[int]:
+    """День недели (0 = понедельник) из строки даты"""
+    if not date_text:
+        return None
+    lowered = date_text.lower()
+    for name, number in WEEKDAYS.items():
+        if name in lowered:
+            return number
+    return None
+
+
+def parse_game_datetime(date_text: str, time_text: str = "",
+                        now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Дата и время начала игры. Год на сайте не указан, поэтому берём
+    ближайший год, при котором игра не оказывается в далёком прошлом.
+    """
+    if not date_text:
+        return None
+
+    match = _DATE_RE.search(date_text)
+    if not match:
+        return None
+
+    day = int(match.group(1))
+    month_word = match.group(2).lower()
+    month = next((number for prefix, number in MONTHS.items() if month_word.startswith(prefix)), None)
+    if month is None:
+        return None
+
+    hour, minute = 0, 0
+    time_match = _TIME_RE.search(time_text or "")
+    if time_match:
+        hour, minute = int(time_match.group(1)), int(time_match.group(2))
+
+    now = now or datetime.now()
+    # Декабрьское расписание уже содержит январские игры следующего года
+    for year in (now.year, now.year + 1):
+        try:
+            result = datetime(year, month, day, hour, minute)
+        except ValueError:
+            continue
+        if (now - result).days <= 180:
+            return result
+    return None
@@ -0,0 +1,97 @@
+"""
+Разбор цены игры из текста сайта, например "600₽ \\n/\\n\\nс человека\\nналичные"
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# Признак валюты в тексте -> код валюты
+CURRENCIES = {
+    '₽': 'RUB',
+    'руб': 'RUB',
+    'р.': 'RUB',
+}
+
+CURRENCY_SIGNS = {
+    'RUB': '₽',
+}
+
+# Фраза в тексте -> за кого указана цена
+UNITS = {
+    'с человека': 'person',
+    'с игрока': 'person',
+    'за человека': 'person',
+    'с команды': 'team',
+    'за команду': 'team',
+}
+
+UNIT_LABELS = {
+    'person': 'с человека',
+    'team': 'с команды',
+}
+
+# Начало слова в тексте -> способ оплаты
+PAYMENT_METHODS = {
+    'наличн': 'cash',
+    'карт': 'card',
+    'онлайн': 'online',
+    'перевод': 'transfer',
+}
+
+PAYMENT_LABELS = {
+    'cash': 'наличные',
+    'card': 'карта',
+    'online': 'онлайн',
+    'transfer': 'перевод',
+}
+
+AMOUNT_RE = re.compile(r'(\d[\d\s]*)')
+
+
+@dataclass
+class Price:
+    """Цена игры в разобранном виде"""
+    amount: Optional[int] = None  # Сумма в рублях; None - не удалось разобрать
+    currency: str = ""  # 'RUB'
+    unit: str = ""  # 'person', 'team'
+    payment_methods: List[str] = field(default_factory=list)  # 'cash', 'card', ...
+
+
+def parse_price(text: str) -> Price:
+    """Разбор цены; нераспознанные части остаются пустыми"""
+    if not text:
+        return Price()
+
+    lower = ' '.join(text.lower().split())
+    price = Price()
+
+    match = AMOUNT_RE.search(lower)
+    if match:
+        price.amount = int(match.group(1).replace(' ', ''))
+
+    for sign, currency in CURRENCIES.items():
+        if sign in lower:
+            price.currency = currency
+            break
+
+    for phrase, unit in UNITS.items():
+        if phrase in lower:
+            price.unit = unit
+            break
+
+    price.payment_methods = [method for prefix, method in PAYMENT_METHODS.items() if prefix in lower]
+    return price
+
+
+def format_price(amount: Optional[int], currency: str, unit: str, payment_methods, raw: str = "") -> str:
+    """Цена для сообщений: "600₽ / с человека, наличные" """
+    if amount is None:
+        return ' '.join(raw.split()) if raw else 'Не указана'
+
+    text = f"{amount}{CURRENCY_SIGNS.get(currency, '')}"
+    if unit:
+        text += f" / {UNIT_LABELS.get(unit, unit)}"
+    if payment_methods:
+        text += ", " + ", ".join(PAYMENT_LABELS.get(method, method) for method in payment_methods)
+    return text
@@ -0,0 +1,80 @@
+"""
+Реестр типов игр. Каждый блок расписания получает тип при том же разборе
+страницы, поэтому одна загрузка обслуживает все форматы игр, а уведомления
+и подписчики выбирают нужные типы.
+"""
+
+import re
+import logging
+from typing import List, Dict, Set, Tuple, Callable
+
+logger = logging.getLogger(__name__)
+
+CLASSIC_TITLE_PREFIX = "Квиз, плиз!"
+CLASSIC_TITLE = f"{CLASSIC_TITLE_PREFIX} KLG"
+# Заголовок классики в любом городе: "Квиз, плиз! KLG", "Квиз, плиз! SPB" и т.п.
+CLASSIC_TITLE_RE = re.compile(re.escape(CLASSIC_TITLE_PREFIX) + r'\s+[A-Za-zА-Яа-яЁё-]+')
+
+# (заголовок, метки ключевых слов заголовка, метки ключевых слов всего блока) -> подходит ли тип
+TypeMatcher = Callable[[str, Set[str], Set[str]], bool]
+
+
+def is_classic_title(title: str) -> bool:
+    return bool(CLASSIC_TITLE_RE.fullmatch(title.strip()))
+
+
+def classic_title(city: str) -> str:
+    """Название классики для города; без города - название KLG, как раньше"""
+    return f"{CLASSIC_TITLE_PREFIX} {city.upper()}" if city else CLASSIC_TITLE
+
+
+class GameTypeRegistry:
+    """
+    Правила проверяются по порядку регистрации, первое подошедшее задаёт тип.
+    У одного типа может быть несколько правил на разных позициях
+    """
+
+    def __init__(self, fallback: str = 'other', fallback_label: str = 'Другие игры'):
+        self.fallback = fallback
+        self._labels: Dict[str, str] = {fallback: fallback_label}
+        self._rules: List[Tuple[str, TypeMatcher]] = []
+
+    def register(self, name: str, label: str, matcher: TypeMatcher) -> None:
+        self._labels[name] = label
+        self._rules.append((name, matcher))
+
+    def names(self) -> List[str]:
+        return list(self._labels)
+
+    def label(self, name: str) -> str:
+        return self._labels.get(name, name)
+
+    def classify(self, title: str, title_labels: Set[str], text_labels: Set[str]) -> str:
+        for name, matcher in self._rules:
+            try:
+                if matcher(title, title_labels, text_labels):
+                    return name
+            except Exception as e:
+                logger.debug(f"Ошибка в правиле типа игры {name}: {str(e)}")
+        return self.fallback
+
+
+def default_registry() -> GameTypeRegistry:
+    """
+    Классика определяется по заголовку вида "Квиз, плиз! <город>" или по
+    описанию классической игры. Тематические форматы - по меткам в заголовке
+    ('music', 'cinema' из таблиц ключевых слов), прочие игры в квадратных
+    скобках считаются тематическими
+    """
+    registry = GameTypeRegistry()
+    registry.register('classic', 'Классика',
+                      lambda title, title_labels, text_labels: is_classic_title(title))
+    registry.register('music', 'Музыкальные',
+                      lambda title, title_labels, text_labels: 'music' in title_labels)
+    registry.register('cinema', 'Кино и сериалы',
+                      lambda title, title_labels, text_labels: 'cinema' in title_labels)
+    registry.register('themed', 'Тематические',
+                      lambda title, title_labels, text_labels: '[' in title)
+    registry.register('classic', 'Классика',
+                      lambda title, title_labels, text_labels: 'classic' in text_labels)
+    return registry
@@ -1,5 +1,10 @@
 """
-Утилита для получения Chat ID из Telegram
+Утилита для получения Chat ID из Telegram.
+
+Обновления читаются без подтверждения (UpdateReader в режиме read_only),
+поэтому команды, ожидающие ответа бота, не пропадают. Не запускайте
+утилиту одновременно с bot_commands.py: Telegram отдаёт обновления
+только одному получателю и отвечает второму ошибкой 409 Conflict.
 """
 
 import requests
@@ -7,6 +12,10 @@ import os
 import sys
 import importlib.util
 
+from telegram_updates import UpdateReader, ChatIndex, TelegramApiError, MAX_PAGE_SIZE
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
 
 def load_token_from_config():
     """Загрузка токена из config.py с правильным импортом"""
@@ -121,7 +130,11 @@ def check_bot_info(token):
         return False
 
 
-def get_updates(token, limit=10):
+def get_updates(token, data_dir=DATA_DIR):
+    """
+    Чтение ожидающих обновлений бота без их подтверждения: они остаются
+    боту команд. Найденные чаты копятся в индексе data/telegram_chats.json
+    """
     if not token:
         print("❌ Токен не указан")
         return
@@ -130,83 +143,61 @@ def get_updates(token, limit=10):
     print("📡 ПОЛУЧЕНИЕ ОБНОВЛЕНИЙ ОТ БОТА")
     print("=" * 50)
 
-    try:
-        url = f"https://api.telegram.org/bot{token}/getUpdates"
-        params = {'limit': limit, 'timeout': 30}
+    chats = ChatIndex(os.path.join(data_dir, 'telegram_chats.json'))
+    reader = UpdateReader(token, chats=chats, read_only=True)
 
-        print(f"Запрашиваем последние {limit} обновлений...")
+    try:
+        # Если чатов ещё нет, ждём первое сообщение до 30 секунд
+        timeout = 0 if len(chats) else 30
+        print("Запрашиваем новые обновления...")
         print("(Если бот новый, сначала напишите ему сообщение)")
 
-        response = requests.get(url, params=params, timeout=35)
-
-        if response.status_code == 200:
-            data = response.json()
-
-            if data.get('ok') and data.get('result'):
-                updates = data['result']
-                print(f"\n✅ Получено {len(updates)} обновлений")
-
-                # Собираем уникальные чаты
-                unique_chats = {}
-                for update in updates:
-                    if 'message' in update:
-                        chat = update['message']['chat']
-                        chat_id = chat['id']
-                        if chat_id not in unique_chats:
-                            unique_chats[chat_id] = {
-                                'username': chat.get('username', 'Нет username'),
-                                'first_name': chat.get('first_name', ''),
-                                'last_name': chat.get('last_name', ''),
-                                'type': chat.get('type', 'private')
-                            }
-
-                if unique_chats:
-                    print("\n" + "=" * 50)
-                    print("👤 НАЙДЕННЫЕ CHAT ID:")
-                    print("=" * 50)
-
-                    for i, (chat_id, info) in enumerate(unique_chats.items(), 1):
-                        print(f"\n{i}. Chat ID: {chat_id}")
-                        if info['first_name'] or info['last_name']:
-                            name = f"{info['first_name']} {info['last_name']}".strip()
-                            print(f"   Имя: {name}")
-                        if info['username'] != 'Нет username':
-                            print(f"   Username: @{info['username']}")
-                        print(f"   Тип чата: {info['type']}")
-
-                    print("\n" + "=" * 50)
-                    print("📋 ДЛЯ КОПИРОВАНИЯ:")
-                    print("=" * 50)
-                    for chat_id in unique_chats.keys():
-                        print(f"chat_id: \"{chat_id}\"")
-
-                else:
-                    print("\n⚠️  Сообщений от пользователей не найдено")
-                    print("\n📝 Что делать:")
-                    print("1. Откройте Telegram")
-                    print("2. Найдите бота @QuizPleaseKlgBot")
-                    print("3. Нажмите /start или напишите любое сообщение")
-                    print("4. Подождите 5 секунд")
-                    print("5. Запустите этот скрипт снова")
-
-            else:
-                print("\n⚠️  В истории бота нет обновлений")
-                print("\n📝 Инструкция:")
-                print("1. Откройте Telegram")
-                print("2. Найдите вашего бота (по username из проверки выше)")
-                print("3. Нажмите кнопку 'Start' или напишите /start")
-                print("4. Подождите несколько секунд")
-                print("5. Запустите скрипт снова")
-
-        else:
-            print(f"❌ Ошибка при получении обновлений: {response.status_code}")
+        known = sum(info['updates'] for info in chats.chats.values())
+        received = sum(1 for _ in reader.iter_updates(timeout=timeout))
+        added = sum(info['updates'] for info in chats.chats.values()) - known
+        print(f"\n✅ Получено ожидающих обновлений: {received}, новых: {added}")
+        if received >= MAX_PAGE_SIZE:
+            print(f"   Без подтверждения Telegram отдаёт только первые {MAX_PAGE_SIZE} обновлений;")
+            print("   остальные чаты найдёт bot_commands.py - он пишет в тот же индекс чатов")
 
     except requests.exceptions.Timeout:
         print("❌ Таймаут при ожидании обновлений")
         print("   Telegram не отправил обновления за 30 секунд")
+    except TelegramApiError as e:
+        print(f"❌ Ошибка при получении обновлений: {e.status} {e}")
     except Exception as e:
         print(f"❌ Ошибка: {e}")
 
+    if chats.chats:
+        print("\n" + "=" * 50)
+        print("👤 НАЙДЕННЫЕ CHAT ID:")
+        print("=" * 50)
+
+        for i, (chat_id, info) in enumerate(chats.chats.items(), 1):
+            print(f"\n{i}. Chat ID: {chat_id}")
+            name = f"{info['first_name']} {info['last_name']}".strip() or info['title']
+            if name:
+                print(f"   Имя: {name}")
+            if info['username']:
+                print(f"   Username: @{info['username']}")
+            print(f"   Тип чата: {info['type']}")
+            print(f"   Обновлений: {info['updates']}")
+
+        print("\n" + "=" * 50)
+        print("📋 ДЛЯ КОПИРОВАНИЯ:")
+        print("=" * 50)
+        for chat_id in chats.chats:
+            print(f"chat_id: \"{chat_id}\"")
+
+    else:
+        print("\n⚠️  Сообщений от пользователей не найдено")
+        print("\n📝 Что делать:")
+        print("1. Откройте Telegram")
+        print("2. Найдите вашего бота (по username из проверки выше)")
+        print("3. Нажмите /start или напишите любое сообщение")
+        print("4. Подождите 5 секунд")
+        print("5. Запустите этот скрипт снова")
+
 
 def manual_token_input():
     """Ручной ввод токена"""
@@ -0,0 +1,316 @@
+"""
+История расписания в виде опорных снимков и изменений между запусками.
+
+Файл data/history/history.jsonl только дополняется. Каждые keyframe_every
+запусков в него пишется полный снимок (keyframe), а между снимками
+записываются только изменившиеся поля (delta). Состояние на любой момент
+восстанавливается от ближайшего предшествующего снимка.
+
+В историю одного города могут по очереди писать разные процессы (аренда
+города переходит между ними), поэтому запись идёт под блокировкой файла,
+а кэш последнего состояния сбрасывается, если файл изменил кто-то другой:
+
+    python src/history_store.py --at 2026-01-03T12:00
+"""
+
+import os
+import json
+import bisect
+import logging
+import argparse
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка файла недоступна
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Меняется при каждом запуске, в изменения не попадает
+VOLATILE_FIELDS = {'extracted_at', 'timestamp', 'parsed_at'}
+
+
+class HistoryStore:
+    """Хранилище истории запусков: опорные снимки + изменения"""
+
+    def __init__(self, directory: str, keyframe_every: int = 96, retention_days: int = 365):
+        self.directory = directory
+        self.history_file = os.path.join(directory, 'history.jsonl')
+        self.index_file = os.path.join(directory, 'keyframes.json')
+        self.lock_file = os.path.join(directory, 'history.lock')
+        self.keyframe_every = keyframe_every
+        self.retention_days = retention_days
+        os.makedirs(directory, exist_ok=True)
+        self._state: Optional[Dict[str, Dict]] = None
+        self._runs_since_keyframe = 0
+        # (inode, размер) файла истории, которому соответствуют кэш и индекс
+        self._file_id: Optional[Tuple[int, int]] = None
+        with self._locked():
+            self._reload()
+
+    @contextmanager
+    def _locked(self):
+        """Эксклюзивная блокировка записи (несколько процессов мониторинга)"""
+        with open(self.lock_file, 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _current_file_id(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.history_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size
+
+    def _reload(self) -> None:
+        """Индекс с диска и сброс кэша состояния; вызывается под блокировкой"""
+        size = self._recover_tail()
+
+        # [(timestamp, смещение)] опорных снимков, по возрастанию времени
+        self._keyframes: List[Tuple[str, int]] = self._load_index()
+        if any(offset >= size for _, offset in self._keyframes):
+            self._keyframes = [(ts, offset) for ts, offset in self._keyframes if offset < size]
+            self._save_index()
+        self._state = None
+        self._runs_since_keyframe = 0
+        self._file_id = self._current_file_id()
+
+    def _refresh(self) -> None:
+        """Перечитывание индекса, если файл истории дописал или сократил другой процесс"""
+        if self._current_file_id() != self._file_id:
+            with self._locked():
+                self._reload()
+
+    def _recover_tail(self) -> int:
+        """
+        Отбрасывание строки, недописанной при аварийном завершении: иначе
+        следующая запись приклеится к ней и история перестанет читаться.
+        Возвращает размер файла после восстановления
+        """
+        if not os.path.exists(self.history_file):
+            return 0
+        with open(self.history_file, 'r+b') as f:
+            size = f.seek(0, os.SEEK_END)
+            end = size
+            while end > 0:
+                f.seek(max(0, end - 65536))
+                chunk = f.read(end - max(0, end - 65536))
+                position = chunk.rfind(b'\n')
+                if position != -1:
+                    end = end - len(chunk) + position + 1
+                    break
+                end -= len(chunk)
+            if end != size:
+                f.truncate(end)
+                logger.error(f"История: отброшена недописанная последняя запись ({size - end} байт) "
+                             f"в {self.history_file}")
+        return end
+
+    def _load_index(self) -> List[Tuple[str, int]]:
+        if not os.path.exists(self.index_file):
+            return []
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return [tuple(item) for item in json.load(f)]
+        except Exception as e:
+            logger.warning(f"Индекс истории повреждён, будет построен заново: {str(e)}")
+            return self._rebuild_index()
+
+    def _rebuild_index(self) -> List[Tuple[str, int]]:
+        keyframes = []
+        for offset, record in self._scan(0):
+            if record['kind'] == 'keyframe':
+                keyframes.append((record['ts'], offset))
+        self._keyframes = keyframes
+        self._save_index()
+        return keyframes
+
+    def _save_index(self) -> None:
+        tmp_path = f"{self.index_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._keyframes, f)
+        os.replace(tmp_path, self.index_file)
+
+    def _scan(self, offset: int) -> Iterator[Tuple[int, Dict]]:
+        """Записи истории начиная со смещения: (смещение, запись)"""
+        if not os.path.exists(self.history_file):
+            return
+        with open(self.history_file, 'rb') as f:
+            f.seek(offset)
+            position = offset
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                yield position, json.loads(line)
+                position += len(line)
+
+    @staticmethod
+    def _apply(state: Dict[str, Dict], record: Dict) -> Dict[str, Dict]:
+        """
+        Применение записи к состоянию. Изменённые игры заменяются новыми
+        словарями, поэтому ранее выданные состояния не меняются задним числом
+        """
+        if record['kind'] == 'keyframe':
+            return dict(record['games'])
+        state = dict(state)
+        for game_id, fields in record.get('upsert', {}).items():
+            state[game_id] = {**state.get(game_id, {}), **fields}
+        for game_id in record.get('remove', []):
+            state.pop(game_id, None)
+        return state
+
+    def _current_state(self) -> Dict[str, Dict]:
+        """Последнее состояние: воспроизведение от последнего опорного снимка"""
+        if self._state is None:
+            state: Dict[str, Dict] = {}
+            runs = 0
+            offset = self._keyframes[-1][1] if self._keyframes else 0
+            for _, record in self._scan(offset):
+                state = self._apply(state, record)
+                runs = 0 if record['kind'] == 'keyframe' else runs + 1
+            self._state = state
+            self._runs_since_keyframe = runs
+        return self._state
+
+    @staticmethod
+    def _delta(previous: Dict[str, Dict], current: Dict[str, Dict]) -> Tuple[Dict, List[str]]:
+        upsert = {}
+        for game_id, game in current.items():
+            old = previous.get(game_id)
+            if old is None:
+                upsert[game_id] = game
+                continue
+            fields = {k: v for k, v in game.items() if k not in VOLATILE_FIELDS and old.get(k) != v}
+            if fields:
+                upsert[game_id] = fields
+        removed = [game_id for game_id in previous if game_id not in current]
+        return upsert, removed
+
+    def append(self, games: List[Dict], timestamp: str = None) -> None:
+        """Запись очередного запуска"""
+        with self._locked():
+            if self._current_file_id() != self._file_id:
+                self._reload()
+            self._append(games, timestamp)
+            self._file_id = self._current_file_id()
+
+    def _append(self, games: List[Dict], timestamp: str = None) -> None:
+        timestamp = timestamp or datetime.now().isoformat()
+        previous = self._current_state()
+        current = {game['id']: game for game in games}
+
+        if not self._keyframes or self._runs_since_keyframe + 1 >= self.keyframe_every:
+            record = {'kind': 'keyframe', 'ts': timestamp, 'games': current}
+        else:
+            upsert, removed = self._delta(previous, current)
+            record = {'kind': 'delta', 'ts': timestamp}
+            if upsert:
+                record['upsert'] = upsert
+            if removed:
+                record['remove'] = removed
+
+        with open(self.history_file, 'ab') as f:
+            offset = f.tell()
+            f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n')
+
+        self._state = self._apply(previous, record)
+        if record['kind'] == 'keyframe':
+            self._keyframes.append((timestamp, offset))
+            self._runs_since_keyframe = 0
+            self._save_index()
+            self._compact()
+        else:
+            self._runs_since_keyframe += 1
+
+    def state_at(self, moment: str) -> List[Dict]:
+        """Расписание на момент времени (ISO строка): последний запуск не позже moment"""
+        self._refresh()
+        position = bisect.bisect_right([ts for ts, _ in self._keyframes], moment)
+        if position == 0:
+            return []
+
+        state: Dict[str, Dict] = {}
+        for _, record in self._scan(self._keyframes[position - 1][1]):
+            if record['ts'] > moment:
+                break
+            state = self._apply(state, record)
+        return list(state.values())
+
+    def iter_runs(self, since: str = None) -> Iterator[Tuple[str, List[Dict]]]:
+        """Состояние после каждого запуска: (timestamp, игры), начиная с since"""
+        self._refresh()
+        offset = 0
+        if since and self._keyframes:
+            position = bisect.bisect_right([ts for ts, _ in self._keyframes], since)
+            offset = self._keyframes[position - 1][1] if position else 0
+
+        state: Dict[str, Dict] = {}
+        for _, record in self._scan(offset):
+            state = self._apply(state, record)
+            if since is None or record['ts'] > since:
+                yield record['ts'], list(state.values())
+
+    def _compact(self) -> None:
+        """
+        Удаление записей старше срока хранения. Файл переписывается начиная
+        с последнего опорного снимка до границы, чтобы состояние на границе
+        оставалось восстановимым
+        """
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+        position = bisect.bisect_right([ts for ts, _ in self._keyframes], cutoff)
+        if position <= 1:
+            return
+
+        start = self._keyframes[position - 1][1]
+        tmp_path = f"{self.history_file}.tmp"
+        with open(self.history_file, 'rb') as src, open(tmp_path, 'wb') as dst:
+            src.seek(start)
+            while True:
+                chunk = src.read(1024 * 1024)
+                if not chunk:
+                    break
+                dst.write(chunk)
+        os.replace(tmp_path, self.history_file)
+
+        self._keyframes = [(ts, offset - start) for ts, offset in self._keyframes[position - 1:]]
+        self._save_index()
+        logger.info(f"История сокращена до {self.retention_days} дней")
+
+    def import_legacy(self, legacy_file: str) -> int:
+        """Перенос истории из прежнего формата (полные копии игр на каждый запуск)"""
+        with open(legacy_file, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+
+        runs: Dict[str, List[Dict]] = {}
+        for record in records:
+            timestamp = record.get('timestamp')
+            game = {k: v for k, v in record.items() if k not in ('timestamp', 'parsed_at')}
+            runs.setdefault(timestamp, []).append(game)
+
+        for timestamp in sorted(runs, key=lambda ts: ts or ""):
+            self.append(runs[timestamp], timestamp)
+        return len(runs)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Расписание на момент времени из истории")
+    arg_parser.add_argument('--at', required=True, help="Момент времени, например 2026-01-03T12:00")
+    arg_parser.add_argument('--data-dir', default=os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+    args = arg_parser.parse_args()
+
+    store = HistoryStore(os.path.join(args.data_dir, 'history'))
+    for game in store.state_at(args.at):
+        print(json.dumps(game, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+HTTP-транспорт парсера.
+
+RequestsTransport - прежний синхронный requests.Session (HTTP/1.1).
+HttpxTransport - httpx.AsyncClient с HTTP/2 (если установлен пакет h2):
+запросы расписания и страниц игр к одному хосту идут по одному соединению,
+а fetch_all выполняет их параллельно, мультиплексируя потоки HTTP/2.
+Через fetch_all авторегистрация загружает страницы регистрации игр.
+Прокси из PROXY_CONFIG действуют для обоих транспортов.
+
+Оба транспорта заявляют в Accept-Encoding только те сжатия, которые умеют
+распаковать (br - только при установленном brotli), и записывают для
+каждого запроса объём данных по сети и после распаковки.
+"""
+
+import time
+import codecs
+import asyncio
+import logging
+from http.cookiejar import CookieJar
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Iterator, Optional, Deque
+
+import requests
+
+try:
+    import httpx
+except ImportError:  # Асинхронный транспорт недоступен
+    httpx = None
+
+try:
+    import h2  # noqa: F401  (нужен httpx для HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import brotli  # noqa: F401
+    BROTLI_AVAILABLE = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        BROTLI_AVAILABLE = True
+    except ImportError:
+        BROTLI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних запросов хранить в статистике
+STATS_HISTORY = 100
+
+
+def accept_encoding() -> str:
+    """Сжатия, которые клиент действительно умеет распаковать"""
+    return 'gzip, deflate, br' if BROTLI_AVAILABLE else 'gzip, deflate'
+
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept-Encoding': accept_encoding(),
+}
+
+
+def _charset(content_type: str) -> str:
+    """Кодировка из Content-Type; без charset страница считается UTF-8"""
+    for part in content_type.split(';'):
+        name, _, value = part.strip().partition('=')
+        if name.lower() == 'charset' and value:
+            try:
+                return codecs.lookup(value.strip('"\'')).name
+            except LookupError:
+                break
+    return 'utf-8'
+
+
+class TransportError(Exception):
+    """Сетевая ошибка или неуспешный статус ответа"""
+
+
+@dataclass
+class RequestStats:
+    """Статистика одного запроса"""
+    url: str
+    status: int
+    http_version: str
+    content_encoding: str
+    wire_bytes: int  # Получено по сети (сжатое тело)
+    body_bytes: int  # Тело после распаковки
+    elapsed: float  # Секунды от отправки до конца тела
+
+    def to_dict(self) -> Dict:
+        """Преобразование в словарь"""
+        return asdict(self)
+
+
+@dataclass
+class FetchedPage:
+    """Загруженная страница; url - адрес после перенаправлений"""
+    url: str
+    text: str
+
+
+class _Transport:
+    """Общая часть транспортов: учёт запросов"""
+
+    name = ""
+
+    def __init__(self):
+        self.stats: Deque[RequestStats] = deque(maxlen=STATS_HISTORY)
+        # Адрес последнего ответа после перенаправлений
+        self.last_url: Optional[str] = None
+
+    def _record(self, stats: RequestStats) -> None:
+        self.stats.append(stats)
+        ratio = f", сжатие {stats.body_bytes / stats.wire_bytes:.1f}x" if stats.wire_bytes else ""
+        logger.info(f"📦 {stats.url}: {stats.wire_bytes / 1024:.1f} КБ по сети, "
+                    f"{stats.body_bytes / 1024:.1f} КБ после распаковки "
+                    f"({stats.content_encoding or 'без сжатия'}, {stats.http_version}{ratio})")
+
+    def get_text(self, url: str, timeout: float) -> str:
+        return "".join(self.iter_text(url, timeout))
+
+    def iter_text(self, url: str, timeout: float, chunk_size: int = 16384) -> Iterator[str]:
+        raise NotImplementedError
+
+    def fetch_all(self, urls: List[str], timeout: float) -> Dict[str, Optional[FetchedPage]]:
+        """Несколько страниц; None - страница не загрузилась"""
+        pages = {}
+        for url in urls:
+            try:
+                text = self.get_text(url, timeout)
+                pages[url] = FetchedPage(self.last_url or url, text)
+            except TransportError as e:
+                logger.error(f"Не удалось загрузить {url}: {str(e)}")
+                pages[url] = None
+        return pages
+
+    def cookie_jar(self) -> CookieJar:
+        """Cookie, полученные транспортом (например, сессия сайта для отправки формы)"""
+        return CookieJar()
+
+    def update_headers(self, headers: Dict[str, str]) -> None:
+        """Заголовки следующих запросов (например, новый User-Agent из настроек)"""
+
+    def close(self) -> None:
+        pass
+
+
+class RequestsTransport(_Transport):
+    """Синхронный транспорт на requests.Session"""
+
+    name = 'requests'
+
+    def __init__(self, session: requests.Session = None):
+        super().__init__()
+        self.session = session or requests.Session()
+
+    def iter_text(self, url: str, timeout: float, chunk_size: int = 16384) -> Iterator[str]:
+        started = time.monotonic()
+        body_bytes = 0
+        try:
+            with self.session.get(url, timeout=timeout, stream=True) as response:
+                response.raise_for_status()
+                decoder = codecs.getincrementaldecoder(
+                    _charset(response.headers.get('Content-Type', '')))(errors='replace')
+
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    body_bytes += len(chunk)
+                    text = decoder.decode(chunk)
+                    if text:
+                        yield text
+                tail = decoder.decode(b'', final=True)
+                if tail:
+                    yield tail
+
+                self.last_url = response.url
+                version = getattr(response.raw, 'version', 11)
+                self._record(RequestStats(
+                    url=url,
+                    status=response.status_code,
+                    http_version=f"HTTP/{version // 10}.{version % 10}",
+                    content_encoding=response.headers.get('Content-Encoding', ''),
+                    # urllib3 считает байты, прочитанные из сокета, до распаковки
+                    wire_bytes=response.raw.tell(),
+                    body_bytes=body_bytes,
+                    elapsed=time.monotonic() - started
+                ))
+        except requests.RequestException as e:
+            raise TransportError(str(e)) from e
+
+    def cookie_jar(self) -> CookieJar:
+        return self.session.cookies
+
+    def update_headers(self, headers: Dict[str, str]) -> None:
+        self.session.headers.update(headers)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class HttpxTransport(_Transport):
+    """
+    Асинхронный клиент httpx с HTTP/2. Синхронные методы выполняют
+    корутины в собственном цикле событий транспорта, поэтому соединение
+    переиспользуется между запусками и запросами
+    """
+
+    name = 'httpx'
+
+    def __init__(self, headers: Dict[str, str] = None, http2: bool = True, proxies: Dict[str, str] = None):
+        super().__init__()
+        if httpx is None:
+            raise ImportError("Для транспорта httpx установите пакет: pip install 'httpx[http2]'")
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("Пакет h2 не установлен, httpx будет работать по HTTP/1.1")
+        http2 = http2 and HTTP2_AVAILABLE
+        self.proxies = dict(proxies or {})
+        # Прокси по схеме, как requests.Session.proxies: {'http': url, 'https': url}
+        mounts = {f"{scheme}://": httpx.AsyncHTTPTransport(http2=http2, proxy=httpx.Proxy(url))
+                  for scheme, url in self.proxies.items() if url}
+        self.loop = asyncio.new_event_loop()
+        self.client = httpx.AsyncClient(http2=http2, headers=headers or BROWSER_HEADERS,
+                                        follow_redirects=True, mounts=mounts or None)
+
+    def cookie_jar(self) -> CookieJar:
+        return self.client.cookies.jar
+
+    def update_headers(self, headers: Dict[str, str]) -> None:
+        self.client.headers.update(headers)
+
+    async def _stream(self, url: str, timeout: float, chunk_size: int):
+        started = time.monotonic()
+        body_bytes = 0
+        async with self.client.stream('GET', url, timeout=timeout) as response:
+            response.raise_for_status()
+            decoder = codecs.getincrementaldecoder(
+                _charset(response.headers.get('Content-Type', '')))(errors='replace')
+            async for chunk in response.aiter_bytes(chunk_size):
+                body_bytes += len(chunk)
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+            self.last_url = str(response.url)
+            self._record(RequestStats(
+                url=url,
+                status=response.status_code,
+                http_version=response.http_version,
+                content_encoding=response.headers.get('Content-Encoding', ''),
+                wire_bytes=response.num_bytes_downloaded,
+                body_bytes=body_bytes,
+                elapsed=time.monotonic() - started
+            ))
+
+    def iter_text(self, url: str, timeout: float, chunk_size: int = 16384) -> Iterator[str]:
+        stream = self._stream(url, timeout, chunk_size)
+        try:
+            while True:
+                try:
+                    yield self.loop.run_until_complete(stream.__anext__())
+                except StopAsyncIteration:
+                    break
+        except httpx.HTTPError as e:
+            raise TransportError(str(e)) from e
+        finally:
+            self.loop.run_until_complete(stream.aclose())
+
+    async def _fetch(self, url: str, timeout: float) -> Optional[FetchedPage]:
+        # Запросы идут параллельно, поэтому адрес после перенаправлений берётся из своего ответа
+        started = time.monotonic()
+        try:
+            async with self.client.stream('GET', url, timeout=timeout) as response:
+                response.raise_for_status()
+                body = await response.aread()
+                self._record(RequestStats(
+                    url=url,
+                    status=response.status_code,
+                    http_version=response.http_version,
+                    content_encoding=response.headers.get('Content-Encoding', ''),
+                    wire_bytes=response.num_bytes_downloaded,
+                    body_bytes=len(body),
+                    elapsed=time.monotonic() - started
+                ))
+                text = body.decode(_charset(response.headers.get('Content-Type', '')), errors='replace')
+                return FetchedPage(str(response.url), text)
+        except httpx.HTTPError as e:
+            logger.error(f"Не удалось загрузить {url}: {str(e)}")
+            return None
+
+    def fetch_all(self, urls: List[str], timeout: float) -> Dict[str, Optional[FetchedPage]]:
+        """Параллельная загрузка: по HTTP/2 запросы к одному хосту делят одно соединение"""
+        async def fetch():
+            return await asyncio.gather(*(self._fetch(url, timeout) for url in urls))
+        return dict(zip(urls, self.loop.run_until_complete(fetch())))
+
+    def close(self) -> None:
+        self.loop.run_until_complete(self.client.aclose())
+        self.loop.close()
+
+
+def create_transport(config: Dict, session: requests.Session = None) -> _Transport:
+    """Транспорт по PARSER_CONFIG['transport']; при отсутствии httpx - requests"""
+    if config.get('transport', 'requests') == 'httpx':
+        try:
+            return HttpxTransport(headers=dict(session.headers) if session else None,
+                                  http2=config.get('http2', True),
+                                  proxies=dict(session.proxies) if session else None)
+        except ImportError as e:
+            logger.warning(f"{str(e)}. Используется requests")
+    return RequestsTransport(session)
@@ -0,0 +1,144 @@
+"""
+Классификация текста по таблицам ключевых слов.
+
+Ключевые слова каждой метки собираются в одно регулярное выражение; проход
+finditer по тексту находит все вхождения метки и их позиции, вместо
+отдельной проверки `in` для каждого слова каждой таблицы. У каждой метки
+своё выражение: в общем выражении на одной позиции находится только одно
+слово, и метка, слово которой - начало слова другой метки, терялась бы.
+
+Проверка совпадения с прежними проверками `in` на таблицах по умолчанию
+(и на строках страницы, если она указана):
+
+    python src/keyword_classifier.py --selftest [--file page.html]
+"""
+
+import re
+import sys
+import argparse
+from typing import List, Dict, Set, Tuple, Iterable
+
+# Метка -> ключевые слова (в нижнем регистре). Переопределяются KEYWORDS_CONFIG
+DEFAULT_KEYWORD_TABLES: Dict[str, List[str]] = {
+    'reserve': ['резерв'],
+    'no_seats': ['нет мест'],
+    'few_seats': ['осталось мало мест'],
+    'free_seats': ['свободные места'],
+    'signup': ['записаться'],
+    'month': ['янв', 'фев', 'мар', 'апр', 'май', 'июн', 'июл', 'авг', 'сен', 'окт', 'ноя', 'дек'],
+    'address': ['ул.', 'улица', 'проспект', 'пр.', 'дом', 'д.', 'г.', 'город'],
+    'classic': ['классическая игра', 'вопросы на всевозможные темы', 'любое знание', 'классическая'],
+    'music': ['[music]', 'музык', 'мелоди'],
+    'cinema': ['[кино', 'кино и сериал', 'cinema'],
+}
+
+
+class KeywordClassifier:
+    """Поиск ключевых слов: по одному скомпилированному выражению на метку"""
+
+    def __init__(self, tables: Dict[str, Iterable[str]] = None):
+        self.tables = {label: [k.lower() for k in keywords]
+                       for label, keywords in (tables or DEFAULT_KEYWORD_TABLES).items()}
+
+        # Опережающая проверка даёт пересекающиеся вхождения (как у отдельных `in`),
+        # а длинные слова стоят первыми, чтобы «проспект» не терялся за «пр.»
+        self._patterns: List[Tuple[str, re.Pattern]] = []
+        for label, keywords in self.tables.items():
+            alternatives = '|'.join(re.escape(k) for k in sorted(set(keywords), key=len, reverse=True) if k)
+            if alternatives:
+                self._patterns.append((label, re.compile(f'(?=({alternatives}))', re.IGNORECASE)))
+
+    def spans(self, text: str) -> List[Tuple[int, str, Set[str]]]:
+        """Вхождения в порядке текста: (позиция, ключевое слово, метки)"""
+        if not text:
+            return []
+        found: Dict[Tuple[int, str], Set[str]] = {}
+        for label, pattern in self._patterns:
+            for match in pattern.finditer(text):
+                found.setdefault((match.start(), match.group(1).lower()), set()).add(label)
+        return [(position, keyword, labels) for (position, keyword), labels in sorted(found.items())]
+
+    def labels(self, text: str) -> Set[str]:
+        """Метки, ключевые слова которых встречаются в тексте"""
+        found: Set[str] = set()
+        for _, _, labels in self.spans(text):
+            found |= labels
+        return found
+
+    def first_line(self, text: str, priority: List[str]) -> str:
+        """
+        Строка текста с первым вхождением самой приоритетной найденной метки
+        (раньше - отдельный поиск и split('\\n') для каждого ключевого слова)
+        """
+        first: Dict[str, int] = {}
+        for position, _, labels in self.spans(text):
+            for label in labels:
+                first.setdefault(label, position)
+
+        for label in priority:
+            if label in first:
+                position = first[label]
+                start = text.rfind('\n', 0, position) + 1
+                end = text.find('\n', position)
+                return text[start:end if end != -1 else len(text)].strip()
+        return ""
+
+
+def naive_labels(tables: Dict[str, List[str]], text: str) -> Set[str]:
+    """Прежняя классификация: отдельная проверка `in` для каждого слова"""
+    lower = text.lower()
+    return {label for label, keywords in tables.items() if any(k.lower() in lower for k in keywords)}
+
+
+def naive_first_line(tables: Dict[str, List[str]], text: str, priority: List[str]) -> str:
+    """Прежний поиск строки: первая строка со словом самой приоритетной найденной метки"""
+    lines = text.split('\n')
+    for label in priority:
+        hits = [(i, line) for i, line in enumerate(lines)
+                if any(k.lower() in line.lower() for k in tables.get(label, []))]
+        if hits:
+            return hits[0][1].strip()
+    return ""
+
+
+def selftest(texts: Iterable[str] = None, tables: Dict[str, List[str]] = None) -> bool:
+    """
+    Сравнение с прежними проверками `in`: каждое слово отдельно, пары слов
+    подряд и внахлёст (слово одной метки внутри или в начале слова другой)
+    """
+    tables = tables or DEFAULT_KEYWORD_TABLES
+    classifier = KeywordClassifier(tables)
+    keywords = [k for words in tables.values() for k in words]
+    samples = list(texts or [])
+    samples += keywords + [k.upper() for k in keywords]
+    for first in keywords:
+        for second in keywords:
+            samples += [first + second, f"{first}\n{second}", first + second[1:], first[:-1] + second]
+
+    priority = list(tables)
+    mismatches = 0
+    for text in samples:
+        if classifier.labels(text) != naive_labels(tables, text):
+            mismatches += 1
+            print(f"Метки не совпадают: {text!r}: {sorted(classifier.labels(text))} "
+                  f"вместо {sorted(naive_labels(tables, text))}")
+        elif classifier.first_line(text, priority) != naive_first_line(tables, text, priority):
+            mismatches += 1
+            print(f"Строка не совпадает: {text!r}")
+    print(f"Проверено текстов: {len(samples)}, расхождений: {mismatches}")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Классификация текста по ключевым словам")
+    arg_parser.add_argument('--selftest', action='store_true',
+                            help="Сравнить с прежними проверками `in` на таблицах по умолчанию")
+    arg_parser.add_argument('--file', help="HTML страница: её строки тоже участвуют в проверке")
+    args = arg_parser.parse_args()
+    if args.selftest:
+        texts = []
+        if args.file:
+            with open(args.file, 'r', encoding='utf-8') as f:
+                texts = f.read().split('\n')
+        sys.exit(0 if selftest(texts) else 1)
+    arg_parser.print_help()
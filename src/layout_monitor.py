@@ -0,0 +1,130 @@
+"""
+Запоминание сработавшего селектора блоков игр и контроль вёрстки расписания
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime
+from typing import List, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Пока страница остаётся пустой, напоминание о ней повторяется не чаще раза в 6 часов
+EMPTY_ALERT_COOLDOWN = 6 * 3600
+
+
+class LayoutMonitor:
+    """
+    Хранит для каждой страницы последний сработавший селектор и отпечаток
+    структуры блоков. Селектор пробуется первым при следующем запуске,
+    а смена отпечатка или пустая страница порождают предупреждение.
+    О пустой странице сообщается при переходе в это состояние, затем
+    раз в empty_alert_cooldown секунд и при восстановлении
+    """
+
+    def __init__(self, state_file: str, page_key: str, empty_alert_cooldown: float = EMPTY_ALERT_COOLDOWN):
+        self.state_file = state_file
+        self.page_key = page_key
+        self.empty_alert_cooldown = empty_alert_cooldown
+        self._state = self._load()
+        self.alerts: List[str] = []
+
+    def _load(self) -> Dict:
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать состояние парсера: {str(e)}")
+            return {}
+
+    def _save(self) -> None:
+        try:
+            tmp_path = f"{self.state_file}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.state_file)
+        except Exception as e:
+            logger.debug(f"Не удалось сохранить состояние парсера: {str(e)}")
+
+    @property
+    def page_state(self) -> Dict:
+        return self._state.setdefault(self.page_key, {'metrics': {}})
+
+    @property
+    def metrics(self) -> Dict[str, int]:
+        return self.page_state.setdefault('metrics', {})
+
+    def count(self, metric: str, value: int = 1) -> None:
+        self.metrics[metric] = self.metrics.get(metric, 0) + value
+
+    def ordered(self, selectors: List[str]) -> List[str]:
+        """Селекторы в порядке проверки: сначала сработавший в прошлый раз"""
+        last = self.page_state.get('selector')
+        if last in selectors:
+            return [last] + [s for s in selectors if s != last]
+        return list(selectors)
+
+    @staticmethod
+    def fingerprint(selector: Optional[str], features: Iterable[str]) -> str:
+        data = f"{selector}|{','.join(sorted(set(features)))}"
+        return hashlib.md5(data.encode('utf-8')).hexdigest()
+
+    def record(self, selector: Optional[str], blocks_count: int, features: Iterable[str]) -> None:
+        """Фиксация результата разбора страницы и проверка вёрстки"""
+        features = sorted(set(features))
+        state = self.page_state
+        self.count('pages')
+
+        if blocks_count == 0:
+            self.count('empty_pages')
+            now = time.time()
+            if 'empty_since' not in state:
+                state['empty_since'] = state['empty_alerted_at'] = now
+                self._alert("На странице расписания не найдено ни одного блока игр. "
+                            "Возможно, изменилась вёрстка сайта")
+            elif now - state.get('empty_alerted_at', 0) >= self.empty_alert_cooldown:
+                state['empty_alerted_at'] = now
+                hours = (now - state['empty_since']) / 3600
+                self._alert(f"Блоков игр на странице расписания нет уже {hours:.1f} ч")
+            else:
+                logger.info("На странице расписания по-прежнему нет блоков игр")
+            self._save()
+            return
+
+        if 'empty_since' in state:
+            state.pop('empty_alerted_at', None)
+            hours = (time.time() - state.pop('empty_since')) / 3600
+            self._alert(f"Блоки игр снова найдены на странице расписания ({blocks_count}) "
+                        f"после {hours:.1f} ч без них")
+
+        fingerprint = self.fingerprint(selector, features)
+        previous = state.get('fingerprint')
+        if previous and previous != fingerprint:
+            self.count('layout_changes')
+            self._alert(
+                "Изменилась структура блоков игр: "
+                f"селектор {state.get('selector')} -> {selector}, "
+                f"элементы {', '.join(state.get('features', []))} -> {', '.join(features)}"
+            )
+
+        state.update({
+            'selector': selector,
+            'fingerprint': fingerprint,
+            'features': features,
+            'blocks': blocks_count,
+            'updated_at': datetime.now().isoformat(timespec='seconds')
+        })
+        self._save()
+
+    def _alert(self, message: str) -> None:
+        logger.warning(f"⚠️ {message}")
+        self.alerts.append(message)
+
+    def pop_alerts(self) -> List[str]:
+        alerts, self.alerts = self.alerts, []
+        return alerts
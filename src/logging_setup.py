@@ -0,0 +1,111 @@
+"""
+Настройка логирования: запись в файл и консоль выполняет фоновый поток.
+
+В один файл логов пишут все процессы (мониторинг, бот, API, процессы
+городов), поэтому по умолчанию файл ротирует внешний logrotate, а процесс
+только переоткрывает файл после переименования (WatchedFileHandler).
+Ротация внутри процесса ('size', 'time') безопасна, только если файл
+пишет один процесс
+"""
+
+import json
+import queue
+import atexit
+import logging
+from datetime import datetime
+from logging.handlers import (QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler,
+                              WatchedFileHandler)
+from typing import Dict, Optional
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+DEFAULT_LOGGING_CONFIG = {
+    'level': 'INFO',
+    'log_to_file': True,
+    'log_to_console': True,
+    'rotation': 'external',  # 'external' - logrotate, 'size' / 'time' - сам процесс (только один процесс)
+    'max_bytes': 5 * 1024 * 1024,  # Размер файла для ротации по размеру
+    'when': 'midnight',  # Период для ротации по времени
+    'backup_count': 7,  # Сколько старых файлов хранить
+    'json': False,  # Писать в файл JSON-строки вместо текста
+}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись лога - одна JSON-строка"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+def _file_handler(config: Dict, log_file: str) -> logging.Handler:
+    if config['rotation'] == 'external':
+        return WatchedFileHandler(log_file, encoding='utf-8')
+    if config['rotation'] == 'time':
+        return TimedRotatingFileHandler(log_file, when=config['when'],
+                                        backupCount=config['backup_count'], encoding='utf-8')
+    return RotatingFileHandler(log_file, maxBytes=config['max_bytes'],
+                               backupCount=config['backup_count'], encoding='utf-8')
+
+
+def setup_logging(logging_config: Dict, log_file: str) -> None:
+    """
+    Корневой логгер получает только QueueHandler: вызывающий поток кладёт
+    запись в очередь, а форматирование и запись на диск выполняет QueueListener
+    """
+    global _listener
+
+    config = {**DEFAULT_LOGGING_CONFIG, **(logging_config or {})}
+    level = getattr(logging, str(config['level']).upper(), logging.INFO)
+
+    handlers = []
+    if config['log_to_file']:
+        file_handler = _file_handler(config, log_file)
+        file_handler.setFormatter(JsonFormatter() if config['json'] else logging.Formatter(LOG_FORMAT))
+        handlers.append(file_handler)
+    if config['log_to_console']:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers.append(console_handler)
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(level)
+
+    if not handlers:
+        root.addHandler(logging.NullHandler())
+        return
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Дописать оставшиеся в очереди записи и остановить фоновый поток"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
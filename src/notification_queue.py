@@ -0,0 +1,131 @@
+"""
+Очередь уведомлений с приоритетами: срочные оповещения уходят раньше массовых.
+
+С outbox (outbox.Outbox) сообщения хранятся не в памяти, а в SQLite:
+недоставленные переживают перезапуск и уходят при следующей доставке
+"""
+
+import time
+import heapq
+import logging
+import itertools
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты (меньше - срочнее)
+PRIORITY_AVAILABILITY = 0  # Игра стала доступной для записи
+PRIORITY_NEW_GAME = 1  # Новые игры и прочие изменения статуса
+PRIORITY_BULK = 2  # Сводка и полный расклад
+
+LANE_NAMES = {
+    PRIORITY_AVAILABILITY: 'availability',
+    PRIORITY_NEW_GAME: 'new',
+    PRIORITY_BULK: 'bulk',
+}
+
+
+@dataclass(order=True)
+class Notification:
+    """Сообщение в очереди; порядок - приоритет, затем очередность постановки"""
+    priority: int
+    sequence: int
+    text: str = field(compare=False)
+    detected_at: Optional[float] = field(default=None, compare=False)  # time.monotonic()
+    pause: float = field(default=0.0, compare=False)  # Пауза после отправки (лимиты API)
+
+
+class NotificationQueue:
+    """Приоритетная очередь уведомлений поверх TelegramBot"""
+
+    def __init__(self, telegram, outbox=None):
+        self.telegram = telegram
+        self.outbox = outbox
+        self._pending: List[Dict] = []  # Ещё не записаны в outbox
+        self._detected_at: Dict[str, float] = {}
+        # Паузы нужны только настоящему боту с лимитами API
+        self.pauses = getattr(telegram, 'rate_limited', True)
+        self._heap: List[Notification] = []
+        self._sequence = itertools.count()
+        self.sent = 0
+        self.failed = 0
+        self.first_alert_latency: Optional[float] = None
+        self.lane_latencies: Dict[str, List[float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._heap) + len(self._pending)
+
+    def put(self, text: str, priority: int = PRIORITY_BULK,
+            detected_at: Optional[float] = None, pause: float = 0.0, key: str = None) -> None:
+        """
+        key - ключ идемпотентности: сообщение с уже поставленным в outbox
+        ключом не отправляется повторно. Без ключа сообщение всегда новое
+        """
+        if self.outbox is None:
+            heapq.heappush(self._heap, Notification(priority, next(self._sequence), text, detected_at, pause))
+            return
+        key = key or f"{time.time_ns()}-{next(self._sequence)}"
+        self._pending.append({'key': key, 'text': text, 'priority': priority, 'pause': pause})
+        if detected_at is not None:
+            self._detected_at[key] = detected_at
+
+    def flush(self) -> int:
+        """Запись накопленных сообщений в outbox одной транзакцией"""
+        if self.outbox is None or not self._pending:
+            return 0
+        pending, self._pending = self._pending, []
+        return self.outbox.enqueue(pending)
+
+    def dispatch(self, max_priority: int = PRIORITY_BULK) -> int:
+        """Отправка сообщений с приоритетом не ниже max_priority; остальные ждут"""
+        if self.outbox is not None:
+            return self._dispatch_outbox(max_priority)
+
+        sent = 0
+        while self._heap and self._heap[0].priority <= max_priority:
+            notification = heapq.heappop(self._heap)
+            if self.telegram.send_message(notification.text):
+                sent += 1
+                self.sent += 1
+                self._record_latency(notification.priority, notification.detected_at)
+            else:
+                self.failed += 1
+            if notification.pause and self.pauses and self._heap:
+                time.sleep(notification.pause)
+        return sent
+
+    def _dispatch_outbox(self, max_priority: int) -> int:
+        """Доставка из outbox, включая сообщения прошлых запусков, ждущие повтора"""
+        self.flush()
+
+        def on_sent(message) -> None:
+            self._record_latency(message.priority, self._detected_at.pop(message.key, None))
+
+        result = self.outbox.deliver(self.telegram.send_message, max_priority, on_sent=on_sent,
+                                     sleep=time.sleep if self.pauses else (lambda seconds: None))
+        self.sent += result['sent']
+        self.failed += result['failed']
+        return result['sent']
+
+    def _record_latency(self, priority: int, detected_at: Optional[float]) -> None:
+        if detected_at is None:
+            return
+        latency = time.monotonic() - detected_at
+        lane = LANE_NAMES.get(priority, str(priority))
+        self.lane_latencies.setdefault(lane, []).append(latency)
+        if self.first_alert_latency is None:
+            self.first_alert_latency = latency
+            logger.info(f"⏱ Первое уведомление отправлено через {latency * 1000:.0f} мс после обнаружения")
+
+    def report(self) -> Dict:
+        """Итоги отправки для статистики"""
+        first = self.first_alert_latency
+        stats = {
+            'sent': self.sent,
+            'failed': self.failed,
+            'first_alert_latency_ms': round(first * 1000) if first is not None else None,
+        }
+        for lane, latencies in self.lane_latencies.items():
+            stats[f'{lane}_max_latency_ms'] = round(max(latencies) * 1000)
+        return stats
@@ -0,0 +1,234 @@
+"""
+Надёжная очередь исходящих уведомлений (outbox) в SQLite.
+
+Сообщения записываются в data/outbox.sqlite3 до сохранения нового снимка
+расписания, а отправляются отдельно, с повторными попытками. Поэтому
+сбой Telegram не теряет уведомления: они остаются в очереди и уходят
+при следующей доставке, без повторного парсинга сайта.
+
+У каждого сообщения есть ключ идемпотентности: повторная постановка
+сообщения с тем же ключом (например, после перезапуска между записью
+очереди и снимка) игнорируется, и сообщение не отправляется дважды.
+Рассылка подписчикам идёт через ту же очередь: у таких сообщений указан
+chat_id получателя (у сообщений общего чата он пустой).
+Сообщения, исчерпавшие попытки, не удаляются, а помечаются 'dead':
+
+    python src/outbox.py              # состояние очереди
+    python src/outbox.py --dead       # сообщения, которые не удалось доставить
+    python src/outbox.py --retry-dead # вернуть их в очередь
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import List, Dict, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTBOX_CONFIG = {
+    'enabled': True,
+    'max_attempts': 10,  # После этого сообщение помечается 'dead'
+    'retry_delay': 30,  # Пауза перед первой повторной попыткой, секунд (дальше удваивается)
+    'max_retry_delay': 3600,
+    'max_consecutive_failures': 3,  # Столько ошибок подряд - Telegram недоступен, доставка откладывается
+    'retention_days': 7,  # Сколько хранить доставленные сообщения (и их ключи)
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    chat_id TEXT NOT NULL DEFAULT '',
+    priority INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    pause REAL NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, priority, id);
+"""
+
+
+@dataclass
+class OutboxMessage:
+    """Сообщение в очереди"""
+    id: int
+    key: str
+    priority: int
+    text: str
+    pause: float
+    attempts: int
+    chat_id: str = ''  # Пусто - общий чат
+
+
+class Outbox:
+    """Очередь сообщений в SQLite с ключами идемпотентности"""
+
+    def __init__(self, path: str, config: Dict = None):
+        self.path = path
+        self.config = {**DEFAULT_OUTBOX_CONFIG, **(config or {})}
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=FULL')
+        self.db.executescript(SCHEMA)
+        self._migrate()
+        self.prune()
+
+    def _migrate(self) -> None:
+        """Очередь, созданная до рассылки подписчикам через outbox, получает колонку chat_id"""
+        columns = {row[1] for row in self.db.execute('PRAGMA table_info(outbox)')}
+        if 'chat_id' not in columns:
+            with self.db:
+                self.db.execute("ALTER TABLE outbox ADD COLUMN chat_id TEXT NOT NULL DEFAULT ''")
+
+    def enqueue(self, messages: Iterable[Dict]) -> int:
+        """
+        Постановка сообщений ({key, text, priority, pause, chat_id}) одной транзакцией.
+        Сообщения с уже известным ключом пропускаются. Возвращает число новых
+        """
+        now = time.time()
+        rows = [(m['key'], m.get('chat_id', ''), m['priority'], m['text'], m.get('pause', 0.0), now)
+                for m in messages]
+        with self.db:
+            before = self.db.total_changes
+            self.db.executemany(
+                'INSERT OR IGNORE INTO outbox (key, chat_id, priority, text, pause, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                rows)
+            added = self.db.total_changes - before
+        if added < len(rows):
+            logger.info(f"📮 Outbox: пропущено уже поставленных сообщений - {len(rows) - added}")
+        return added
+
+    def due(self, max_priority: int, limit: int = 100, subscribers: bool = False) -> List[OutboxMessage]:
+        """
+        Сообщения, которые пора отправить, по приоритету и порядку постановки:
+        общего чата или (subscribers) рассылки подписчикам
+        """
+        rows = self.db.execute(
+            "SELECT id, key, priority, text, pause, attempts, chat_id FROM outbox "
+            f"WHERE status = 'pending' AND chat_id {'!=' if subscribers else '='} '' "
+            "AND priority <= ? AND next_attempt_at <= ? "
+            "ORDER BY priority, id LIMIT ?",
+            (max_priority, time.time(), limit)).fetchall()
+        return [OutboxMessage(*row) for row in rows]
+
+    def mark_sent(self, message: OutboxMessage) -> None:
+        with self.db:
+            self.db.execute("UPDATE outbox SET status = 'sent', attempts = attempts + 1, sent_at = ? WHERE id = ?",
+                            (time.time(), message.id))
+
+    def mark_failed(self, message: OutboxMessage, error: str = "") -> None:
+        """Неудачная попытка: повтор с экспоненциальной паузой или 'dead' после max_attempts"""
+        attempts = message.attempts + 1
+        if attempts >= self.config['max_attempts']:
+            status, next_attempt_at = 'dead', 0
+            logger.error(f"❌ Outbox: сообщение {message.key} не доставлено после {attempts} попыток, "
+                         f"оставлено в очереди со статусом dead")
+        else:
+            delay = min(self.config['retry_delay'] * 2 ** (attempts - 1), self.config['max_retry_delay'])
+            status, next_attempt_at = 'pending', time.time() + delay
+            logger.warning(f"⚠️ Outbox: сообщение {message.key} не доставлено (попытка {attempts}), "
+                           f"повтор через {delay:.0f} с")
+        with self.db:
+            self.db.execute("UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? "
+                            "WHERE id = ?", (status, attempts, next_attempt_at, error, message.id))
+
+    def deliver(self, send: Callable[[str], bool], max_priority: int,
+                on_sent: Callable[[OutboxMessage], None] = None,
+                sleep: Callable[[float], None] = time.sleep) -> Dict[str, int]:
+        """
+        Доставка подошедших сообщений общего чата. Каждое сообщение отмечается сразу после
+        попытки, поэтому прерванная доставка продолжается с того же места
+        """
+        result = {'sent': 0, 'failed': 0}
+        consecutive_failures = 0
+        messages = self.due(max_priority)
+        while messages:
+            for index, message in enumerate(messages):
+                try:
+                    ok, error = bool(send(message.text)), ""
+                except Exception as e:
+                    ok, error = False, str(e)
+
+                if ok:
+                    self.mark_sent(message)
+                    result['sent'] += 1
+                    consecutive_failures = 0
+                    if on_sent:
+                        on_sent(message)
+                else:
+                    self.mark_failed(message, error)
+                    result['failed'] += 1
+                    consecutive_failures += 1
+                    if consecutive_failures >= self.config['max_consecutive_failures']:
+                        logger.warning("⚠️ Outbox: Telegram не отвечает, доставка отложена до следующего запуска")
+                        return result
+
+                if message.pause and index < len(messages) - 1:
+                    sleep(message.pause)
+            messages = self.due(max_priority)
+        return result
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.db.execute('SELECT status, COUNT(*) FROM outbox GROUP BY status').fetchall())
+
+    def dead(self) -> List[Dict]:
+        rows = self.db.execute("SELECT key, chat_id, attempts, last_error, created_at, text FROM outbox "
+                               "WHERE status = 'dead' ORDER BY id").fetchall()
+        return [{'key': key, 'chat_id': chat_id, 'attempts': attempts, 'last_error': error,
+                 'created_at': created, 'text': text}
+                for key, chat_id, attempts, error, created, text in rows]
+
+    def retry_dead(self) -> int:
+        """Возврат недоставленных сообщений в очередь"""
+        with self.db:
+            return self.db.execute("UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = 0 "
+                                   "WHERE status = 'dead'").rowcount
+
+    def prune(self) -> int:
+        """Удаление давно доставленных сообщений; недоставленные не удаляются никогда"""
+        cutoff = time.time() - self.config['retention_days'] * 86400
+        with self.db:
+            return self.db.execute("DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?", (cutoff,)).rowcount
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def main():
+    default_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'data', 'outbox.sqlite3')
+    arg_parser = argparse.ArgumentParser(description="Очередь исходящих уведомлений")
+    arg_parser.add_argument('--path', default=default_path)
+    arg_parser.add_argument('--dead', action='store_true', help="Показать недоставленные сообщения")
+    arg_parser.add_argument('--retry-dead', action='store_true', help="Вернуть недоставленные сообщения в очередь")
+    args = arg_parser.parse_args()
+
+    outbox = Outbox(args.path)
+    if args.retry_dead:
+        print(f"Возвращено в очередь: {outbox.retry_dead()}")
+    elif args.dead:
+        for message in outbox.dead():
+            chat = f", чат {message['chat_id']}" if message['chat_id'] else ""
+            print(f"--- {message['key']}{chat} (попыток: {message['attempts']}, ошибка: {message['last_error'] or '-'})")
+            print(message['text'])
+    else:
+        counts = outbox.counts()
+        print(f"Ожидают: {counts.get('pending', 0)}, доставлено: {counts.get('sent', 0)}, "
+              f"не доставлено: {counts.get('dead', 0)}")
+    outbox.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+"""
+Архив загруженных страниц расписания и воспроизведение мониторинга по нему.
+
+Страница хранится сжатой под своим SHA-256 (data/pages/objects/ab/<sha>.html.gz),
+поэтому одинаковые страницы лежат в архиве один раз. Каждая загрузка
+записывается строкой в data/pages/index.jsonl: время, адрес и хэш страницы.
+
+Воспроизведение прогоняет весь конвейер QuizPleaseMonitor (разбор, сравнение,
+уведомления) по страницам из архива без пауз и без сети; сообщения уходят
+в заглушку вместо Telegram, данные пишутся во временную папку:
+
+    python src/page_archive.py list --since 2026-10-01
+    python src/page_archive.py replay --since 2026-10-01 --until 2026-10-08
+    python src/page_archive.py show <sha256>
+"""
+
+import io
+import os
+import sys
+import json
+import gzip
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+import tempfile
+import contextlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Dict, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка файла недоступна
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ArchivedPage:
+    """Одна загрузка страницы"""
+    ts: str
+    url: str
+    sha256: str
+    size: int
+
+    def to_dict(self) -> Dict:
+        return {'ts': self.ts, 'url': self.url, 'sha256': self.sha256, 'size': self.size}
+
+
+class PageArchive:
+    """Хранилище страниц с адресацией по содержимому"""
+
+    def __init__(self, directory: str, retention_days: int = 60):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, 'objects')
+        self.index_file = os.path.join(directory, 'index.jsonl')
+        self.lock_file = os.path.join(directory, 'index.lock')
+        self.retention_days = retention_days
+        self._pruned = False
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Блокировка индекса: дописывание и переписывание при очистке не пересекаются"""
+        with open(self.lock_file, 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _object_path(self, sha256: str) -> str:
+        return os.path.join(self.objects_dir, sha256[:2], f'{sha256}.html.gz')
+
+    def store(self, url: str, html: str, timestamp: str = None) -> ArchivedPage:
+        """Сохранение загруженной страницы; повторное содержимое не записывается"""
+        writer = self.writer(url)
+        writer.write(html)
+        return writer.commit(timestamp)
+
+    def writer(self, url: str) -> 'PageWriter':
+        """Потоковая запись страницы, которая загружается частями"""
+        return PageWriter(self, url)
+
+    def _record(self, page: ArchivedPage) -> ArchivedPage:
+        with self._locked(), open(self.index_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(page.to_dict(), ensure_ascii=False) + '\n')
+
+        # Старые записи удаляются один раз за время работы процесса
+        if not self._pruned:
+            self._pruned = True
+            self.prune()
+        return page
+
+    def pages(self, since: str = None, until: str = None) -> List[ArchivedPage]:
+        """Загрузки в диапазоне времени (ISO строки, until включительно)"""
+        if not os.path.exists(self.index_file):
+            return []
+        result = []
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break
+                page = ArchivedPage(**json.loads(line))
+                if since and page.ts < since:
+                    continue
+                if until and page.ts > until:
+                    break
+                result.append(page)
+        return result
+
+    def load(self, sha256: str) -> str:
+        with gzip.open(self._object_path(sha256), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def prune(self) -> int:
+        """Удаление записей старше срока хранения и страниц, на которые больше нет ссылок"""
+        if not self.retention_days or not os.path.exists(self.index_file):
+            return 0
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+        # Под блокировкой никто не дописывает индекс, пока он переписывается
+        with self._locked():
+            pages = self.pages()
+            kept = [page for page in pages if page.ts >= cutoff]
+            if len(kept) == len(pages):
+                return 0
+
+            tmp_path = f"{self.index_file}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for page in kept:
+                    f.write(json.dumps(page.to_dict(), ensure_ascii=False) + '\n')
+            os.replace(tmp_path, self.index_file)
+
+        referenced = {page.sha256 for page in kept}
+        for page in pages:
+            if page.sha256 not in referenced:
+                referenced.add(page.sha256)  # Удаляем один раз
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(self._object_path(page.sha256))
+        logger.info(f"Архив страниц: удалено записей старше {self.retention_days} дней - {len(pages) - len(kept)}")
+        return len(pages) - len(kept)
+
+
+class PageWriter:
+    """
+    Запись страницы по мере загрузки: части сразу хэшируются и сжимаются
+    во временный файл, целиком страница в памяти не держится. Файл получает
+    имя по хэшу только в commit(); discard() удаляет недописанную страницу
+    """
+
+    def __init__(self, archive: PageArchive, url: str):
+        self.archive = archive
+        self.url = url
+        self.size = 0
+        self._hash = hashlib.sha256()
+        fd, self._tmp_path = tempfile.mkstemp(dir=archive.objects_dir, suffix='.tmp')
+        self._file = os.fdopen(fd, 'wb')
+        self._gzip = gzip.GzipFile(filename='', mode='wb', compresslevel=9, fileobj=self._file, mtime=0)
+        self._closed = False
+
+    def write(self, text: str) -> None:
+        data = text.encode('utf-8')
+        self._hash.update(data)
+        self.size += len(data)
+        self._gzip.write(data)
+
+    def _close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._gzip.close()
+            self._file.close()
+
+    def commit(self, timestamp: str = None) -> ArchivedPage:
+        """Завершение записи; повторное содержимое не сохраняется второй раз"""
+        self._close()
+        sha256 = self._hash.hexdigest()
+        path = self.archive._object_path(sha256)
+        if os.path.exists(path):
+            os.remove(self._tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._tmp_path, path)
+
+        page = ArchivedPage(timestamp or datetime.now().isoformat(timespec='seconds'), self.url, sha256, self.size)
+        return self.archive._record(page)
+
+    def discard(self) -> None:
+        self._close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._tmp_path)
+
+
+class ArchivedPageTransport:
+    """Транспорт парсера, отдающий страницу из архива вместо сети"""
+
+    name = 'archive'
+
+    def __init__(self, html: str = ""):
+        self.html = html
+        self.stats: List = []
+
+    def iter_text(self, url: str, timeout: float, chunk_size: int = 16384) -> Iterator[str]:
+        for start in range(0, len(self.html), chunk_size):
+            yield self.html[start:start + chunk_size]
+
+    def get_text(self, url: str, timeout: float) -> str:
+        return self.html
+
+    def close(self) -> None:
+        pass
+
+
+def _dry_run_sink():
+    """Заглушка Telegram: сообщения копятся в списке, паузы между ними не нужны"""
+    from telegram_notifier import TelegramBot
+
+    class DryRunTelegram(TelegramBot):
+        rate_limited = False
+
+        def __init__(self):
+            self.chat_id = 'dry-run'
+            self.is_available = True
+            self.messages: List[str] = []
+
+        def send_message(self, text: str, parse_mode: str = 'Markdown') -> bool:
+            self.messages.append(text)
+            return True
+
+        async def send_message_async(self, text: str, chat_id=None, parse_mode: str = 'Markdown') -> bool:
+            self.messages.append(text)
+            return True
+
+    return DryRunTelegram()
+
+
+def replay(archive: PageArchive, since: str = None, until: str = None, url: str = None,
+           keep_dir: str = None, show_messages: bool = False) -> Dict:
+    """
+    Прогон мониторинга по архивным страницам. Каждый запуск использует
+    следующую страницу; хранилище, состояние парсера и уведомления
+    изолированы во временной папке
+    """
+    from extract_classic_games import QuizPleaseMonitor, QuizPleaseParser, GameStorage
+
+    pages = [page for page in archive.pages(since, until) if not url or page.url == url]
+    if not pages:
+        # Без страниц парсер взял бы адрес из настроек: прогонять нечего
+        logger.warning("В архиве нет страниц для прогона")
+        return {'pages': 0, 'unique_pages': 0, 'messages': 0, 'seconds': 0.0, 'runs': []}
+
+    work_dir = keep_dir or tempfile.mkdtemp(prefix='quizplease_replay_')
+    os.makedirs(work_dir, exist_ok=True)
+
+    transport = ArchivedPageTransport()
+    parser = QuizPleaseParser(pages[0].url, state_dir=work_dir)
+    parser.transport = transport
+    parser.archive = None
+    sink = _dry_run_sink()
+    monitor = QuizPleaseMonitor(
+        subscriptions_config={'enabled': False},
+        parser=parser,
+        storage=GameStorage(work_dir, history_config={'columnar_export': False}),
+        telegram=sink
+    )
+
+    runs = []
+    started = time.perf_counter()
+    try:
+        for page in pages:
+            transport.html = archive.load(page.sha256)
+            if parser.base_url != page.url:
+                parser.base_url = page.url
+                parser.city = parser._city_from_url(page.url)
+            sent_before = len(sink.messages)
+            # Консольная статистика монитора на каждом шаге только мешает
+            with contextlib.redirect_stdout(io.StringIO()):
+                games = monitor.run(send_notifications=True)
+            messages = sink.messages[sent_before:]
+            runs.append({
+                'ts': page.ts,
+                'url': page.url,
+                'sha256': page.sha256[:12],
+                'games': len(games),
+                'new': len(monitor.last_new_games),
+                'changed': len(monitor.last_changed_games),
+                'messages': len(messages),
+            })
+            if show_messages:
+                for text in messages:
+                    print(f"--- {page.ts}\n{text}")
+    finally:
+        if not keep_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'pages': len(pages),
+        'unique_pages': len({page.sha256 for page in pages}),
+        'messages': len(sink.messages),
+        'seconds': round(time.perf_counter() - started, 3),
+        'runs': runs,
+    }
+
+
+def main():
+    default_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'pages')
+    arg_parser = argparse.ArgumentParser(description="Архив страниц расписания")
+    arg_parser.add_argument('--dir', default=default_dir, help="Папка архива")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    list_parser = commands.add_parser('list', help="Загрузки страниц")
+    replay_parser = commands.add_parser('replay', help="Прогон мониторинга по архиву")
+    for sub in (list_parser, replay_parser):
+        sub.add_argument('--since', help="С момента, например 2026-10-01")
+        sub.add_argument('--until', help="По момент включительно, например 2026-10-08T23:59")
+        sub.add_argument('--url', help="Только страницы с этим адресом")
+    replay_parser.add_argument('--json', action='store_true', help="Итоги в JSON")
+    replay_parser.add_argument('--messages', action='store_true', help="Печатать отправленные сообщения")
+    replay_parser.add_argument('--keep', metavar='DIR', help="Сохранить данные прогона в папке")
+    replay_parser.add_argument('--verbose', action='store_true', help="Не скрывать логи мониторинга")
+
+    show_parser = commands.add_parser('show', help="Вывести сохранённую страницу")
+    show_parser.add_argument('sha256')
+
+    args = arg_parser.parse_args()
+    archive = PageArchive(args.dir)
+
+    if args.command == 'list':
+        for page in archive.pages(args.since, args.until):
+            if not args.url or page.url == args.url:
+                print(f"{page.ts}  {page.sha256[:12]}  {page.size:>8}  {page.url}")
+    elif args.command == 'show':
+        matches = [page for page in archive.pages() if page.sha256.startswith(args.sha256)]
+        if not matches:
+            print("Страница не найдена", file=sys.stderr)
+            return 1
+        sys.stdout.write(archive.load(matches[0].sha256))
+    else:
+        if not args.verbose:
+            logging.disable(logging.WARNING)
+        result = replay(archive, args.since, args.until, args.url, args.keep, args.messages)
+        if args.json:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        else:
+            for run in result['runs']:
+                print(f"{run['ts']}  {run['sha256']}  игр: {run['games']:>3}  новых: {run['new']:>3}  "
+                      f"изменений: {run['changed']:>3}  сообщений: {run['messages']:>3}")
+            print(f"Страниц: {result['pages']} (уникальных {result['unique_pages']}), "
+                  f"сообщений: {result['messages']}, время: {result['seconds']} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
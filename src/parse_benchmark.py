@@ -0,0 +1,96 @@
+"""
+Сравнение способов разбора страницы расписания по времени и пику памяти:
+полное дерево страницы, дерево только блоков игр (SoupStrainer) и потоковый разбор.
+
+Запуск:
+    python src/parse_benchmark.py                      # живая страница из PARSER_CONFIG
+    python src/parse_benchmark.py --file page.html     # сохранённая страница
+"""
+
+import time
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from typing import Callable, Dict, List
+
+from bs4 import BeautifulSoup
+
+from extract_classic_games import QuizPleaseParser
+
+
+def parse_full_tree(parser: QuizPleaseParser, html: str) -> List:
+    """Прежний способ: дерево всей страницы живёт до конца обработки"""
+    soup = BeautifulSoup(html, 'html.parser')
+    selectors = [
+        'div.schedule-column',
+        'div[class*="schedule"][class*="column"]',
+        'div.game-card',
+        'div.schedule-game'
+    ]
+    game_blocks = []
+    for selector in selectors:
+        game_blocks = soup.select(selector)
+        if game_blocks:
+            break
+    classified = ((block, parser._classify_game(block)) for block in game_blocks)
+    return [game for game in (parser._parse_game_block(block, *kind) for block, kind in classified if kind)
+            if game]
+
+
+def parse_strained(parser: QuizPleaseParser, html: str) -> List:
+    return parser.parse_html(html)
+
+
+def parse_streaming(parser: QuizPleaseParser, html: str, chunk_size: int = 16384) -> List:
+    chunks = (html[i:i + chunk_size] for i in range(0, len(html), chunk_size))
+    return list(parser._iter_games_from_chunks(chunks))
+
+
+def measure(func: Callable[[], List], repeat: int) -> Dict:
+    """Лучшее время из нескольких прогонов и пик памяти отдельного прогона"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        games = func()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'games': len(games), 'best_ms': min(timings) * 1000, 'peak_kb': peak / 1024}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Сравнение способов разбора расписания")
+    arg_parser.add_argument('--file', help="HTML файл вместо загрузки страницы")
+    arg_parser.add_argument('--repeat', type=int, default=5, help="Число прогонов каждого способа")
+    args = arg_parser.parse_args()
+
+    # Состояние парсера (порядок селекторов, метрики) пишется во временную папку,
+    # а страница не попадает в архив: замеры не меняют данные мониторинга
+    with tempfile.TemporaryDirectory(prefix='quizplease_parse_benchmark_') as state_dir:
+        parser = QuizPleaseParser(state_dir=state_dir)
+        parser.archive = None
+        if args.file:
+            with open(args.file, 'r', encoding='utf-8') as f:
+                html = f.read()
+        else:
+            html = parser.transport.get_text(parser.base_url, parser.timeout)
+
+        # Логи парсера не должны искажать замеры
+        logging.disable(logging.INFO)
+
+        print(f"Размер страницы: {len(html.encode('utf-8')) / 1024:.1f} КБ")
+        print(f"{'Способ':<22}{'Игр':>6}{'Время, мс':>12}{'Пик памяти, КБ':>18}")
+        for name, func in [('Полное дерево', parse_full_tree),
+                           ('SoupStrainer', parse_strained),
+                           ('Потоковый разбор', parse_streaming)]:
+            result = measure(lambda: func(parser, html), args.repeat)
+            print(f"{name:<22}{result['games']:>6}{result['best_ms']:>12.1f}{result['peak_kb']:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
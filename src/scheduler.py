@@ -0,0 +1,103 @@
+"""
+Адаптивный интервал опроса расписания.
+
+Частота изменений расписания изучается по истории запусков отдельно для
+каждого часа каждого дня недели. Чем чаще в это время что-то меняется,
+тем короче интервал. Дополнительно интервал сокращается перед началом
+ближайших игр и пока на скорые игры идёт запись в резерв.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import List, Dict, Tuple, Iterable, Optional
+
+from game_dates import parse_game_datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEDULER_CONFIG = {
+    'min_interval': 120,  # Нижняя граница интервала, секунд
+    'max_interval': 3600,  # Верхняя граница интервала, секунд
+    'min_observations': 3,  # Сколько запусков в часе нужно, чтобы доверять статистике
+    'near_start_hours': 6,  # За сколько часов до игры опрашивать чаще
+    'near_start_interval': 300,
+    'reserve_horizon_hours': 72,  # Игры в резерве, до которых осталось не больше N часов
+    'reserve_interval': 600,
+}
+
+
+class AdaptiveScheduler:
+    """Выбор паузы до следующего запуска мониторинга"""
+
+    def __init__(self, base_interval: int, config: Dict = None):
+        self.config = {**DEFAULT_SCHEDULER_CONFIG, **(config or {})}
+        self.base_interval = base_interval
+        # (день недели, час) -> [запусков с изменениями, всего запусков]
+        self.buckets: Dict[Tuple[int, int], List[int]] = {}
+
+    def learn(self, runs: Iterable[Tuple[str, List[Dict]]]) -> None:
+        """Обучение по истории: пары соседних запусков сравниваются по хэшам игр"""
+        previous_hashes = None
+        learned = 0
+        for timestamp, games in runs:
+            hashes = {game.get('game_hash') for game in games}
+            if previous_hashes is not None:
+                try:
+                    moment = datetime.fromisoformat(timestamp)
+                except (TypeError, ValueError):
+                    continue
+                self.observe(moment, hashes != previous_hashes)
+                learned += 1
+            previous_hashes = hashes
+        logger.info(f"Планировщик обучен на {learned} запусках из истории")
+
+    def observe(self, moment: datetime, changed: bool) -> None:
+        """Учёт результата очередного запуска"""
+        bucket = self.buckets.setdefault((moment.weekday(), moment.hour), [0, 0])
+        bucket[0] += int(changed)
+        bucket[1] += 1
+
+    def change_rate(self, moment: datetime) -> Optional[float]:
+        """Доля запусков с изменениями в этот час этого дня недели"""
+        changes, total = self.buckets.get((moment.weekday(), moment.hour), (0, 0))
+        if total < self.config['min_observations']:
+            return None
+        return changes / total
+
+    def next_interval(self, games: List, now: datetime = None) -> int:
+        """Пауза до следующего запуска, секунд"""
+        now = now or datetime.now()
+        min_interval = self.config['min_interval']
+        max_interval = self.config['max_interval']
+
+        rate = self.change_rate(now)
+        if rate is None:
+            interval = self.base_interval
+            reason = "нет статистики"
+        else:
+            # Чем выше доля запусков с изменениями, тем ближе к нижней границе
+            interval = max_interval - (max_interval - min_interval) * rate
+            reason = f"изменения в {rate:.0%} запусков"
+
+        nearest_start = None
+        reserve_soon = False
+        reserve_horizon = now + timedelta(hours=self.config['reserve_horizon_hours'])
+        for game in games:
+            start = parse_game_datetime(game.date, game.time, now=now)
+            if not start or start < now:
+                continue
+            if nearest_start is None or start < nearest_start:
+                nearest_start = start
+            if game.availability_type == 'reserve' and start <= reserve_horizon:
+                reserve_soon = True
+
+        if nearest_start and nearest_start - now <= timedelta(hours=self.config['near_start_hours']):
+            interval = min(interval, self.config['near_start_interval'])
+            reason += ", скоро начало игры"
+        if reserve_soon:
+            interval = min(interval, self.config['reserve_interval'])
+            reason += ", есть игры в резерве"
+
+        interval = int(max(min_interval, min(max_interval, interval)))
+        logger.info(f"Следующая проверка через {interval} с ({reason})")
+        return interval
@@ -0,0 +1,349 @@
+"""
+Типизированные настройки проекта.
+
+Источники (более поздний переопределяет более ранний):
+1. config.py (словари *_CONFIG) или config.toml (таблицы [telegram], [parser], ...);
+2. переменные окружения QUIZPLEASE_<РАЗДЕЛ>__<ПАРАМЕТР>, например
+   QUIZPLEASE_TELEGRAM__TOKEN=... или QUIZPLEASE_NOTIFICATION__GAME_TYPES='["classic", "music"]'.
+
+Путь к файлу можно задать переменной QUIZPLEASE_CONFIG. Изменение файла
+определяется по времени изменения и размеру (один stat), поэтому проверять
+его можно перед каждым запуском мониторинга.
+"""
+
+import os
+import json
+import logging
+import importlib.util
+from dataclasses import dataclass, field, fields, asdict
+from typing import List, Dict, Optional, Tuple, Any
+
+from logging_setup import DEFAULT_LOGGING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+ENV_PREFIX = 'QUIZPLEASE_'
+CONFIG_PATH_ENV = 'QUIZPLEASE_CONFIG'
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'off')
+
+
+class SettingsError(ValueError):
+    """Настройки отсутствуют или не проходят проверку"""
+
+
+@dataclass
+class TelegramSettings:
+    token: str = ""
+    chat_id: str = ""
+
+
+@dataclass
+class ParserSettings:
+    base_url: str = ""
+    timeout: float = 30.0
+    transport: str = 'requests'
+    http2: bool = True
+    user_agent: str = ""
+
+
+@dataclass
+class NotificationSettings:
+    send_telegram: bool = True  # Отправлять уведомления в общий чат
+    send_full_details: bool = True  # Полный расклад по каждой игре после сводки
+    only_new_games: bool = False  # Только уведомления о новых играх
+    check_interval: int = 1800  # Базовый интервал режима --loop, секунд
+    game_types: Optional[List[str]] = None  # None - по FILTER_CONFIG['only_classic_games']
+
+
+@dataclass
+class FilterSettings:
+    only_classic_games: bool = True
+    only_available: bool = False  # В уведомления - только игры со свободными местами
+    exclude_reserve: bool = False  # Не сообщать об играх в резерве
+    future_days: int = 0  # Не сообщать об играх дальше N дней (0 - без ограничения)
+
+
+@dataclass
+class ProxySettings:
+    enabled: bool = False
+    http: str = ""
+    https: str = ""
+
+    def proxies(self) -> Dict[str, str]:
+        """Словарь для requests.Session.proxies"""
+        if not self.enabled:
+            return {}
+        return {scheme: url for scheme, url in (('http', self.http), ('https', self.https)) if url}
+
+
+@dataclass
+class LoggingSettings:
+    level: str = DEFAULT_LOGGING_CONFIG['level']
+    log_to_file: bool = DEFAULT_LOGGING_CONFIG['log_to_file']
+    log_to_console: bool = DEFAULT_LOGGING_CONFIG['log_to_console']
+    rotation: str = DEFAULT_LOGGING_CONFIG['rotation']
+    max_bytes: int = DEFAULT_LOGGING_CONFIG['max_bytes']
+    when: str = DEFAULT_LOGGING_CONFIG['when']
+    backup_count: int = DEFAULT_LOGGING_CONFIG['backup_count']
+    json: bool = DEFAULT_LOGGING_CONFIG['json']
+
+
+# Раздел файла -> класс типизированных настроек
+TYPED_SECTIONS = {
+    'TELEGRAM_CONFIG': ('telegram', TelegramSettings),
+    'PARSER_CONFIG': ('parser', ParserSettings),
+    'NOTIFICATION_CONFIG': ('notification', NotificationSettings),
+    'FILTER_CONFIG': ('filter', FilterSettings),
+    'PROXY_CONFIG': ('proxy', ProxySettings),
+    'LOGGING_CONFIG': ('logging', LoggingSettings),
+}
+
+
+@dataclass
+class Settings:
+    """Проверенные настройки; остальные разделы config.py доступны через section()"""
+    telegram: TelegramSettings = field(default_factory=TelegramSettings)
+    parser: ParserSettings = field(default_factory=ParserSettings)
+    notification: NotificationSettings = field(default_factory=NotificationSettings)
+    filter: FilterSettings = field(default_factory=FilterSettings)
+    proxy: ProxySettings = field(default_factory=ProxySettings)
+    logging: LoggingSettings = field(default_factory=LoggingSettings)
+    sections: Dict[str, Dict] = field(default_factory=dict)
+    source: str = ""
+
+    def section(self, name: str) -> Dict:
+        """Раздел как словарь (копия), например section('AUTOREG_CONFIG')"""
+        return dict(self.sections.get(name) or {})
+
+    def notify_game_types(self) -> Optional[List[str]]:
+        """Типы игр для общего чата; None - все типы"""
+        if self.notification.game_types is not None:
+            return list(self.notification.game_types)
+        return ['classic'] if self.filter.only_classic_games else None
+
+
+def _coerce(value: Any, default: Any, where: str, errors: List[str]) -> Any:
+    """Приведение значения к типу значения по умолчанию (строки из окружения тоже)"""
+    if isinstance(default, bool):
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower() if isinstance(value, (int, str)) else None
+        if text in TRUE_VALUES or text in FALSE_VALUES:
+            return text in TRUE_VALUES
+    elif isinstance(default, int):
+        try:
+            if not isinstance(value, bool) and float(value) == int(float(value)):
+                return int(float(value))
+        except (TypeError, ValueError):
+            pass
+    elif isinstance(default, float):
+        try:
+            if not isinstance(value, bool):
+                return float(value)
+        except (TypeError, ValueError):
+            pass
+    elif isinstance(default, str):
+        if isinstance(value, (str, int)) and not isinstance(value, bool):
+            return str(value)
+    elif default is None:
+        # Optional[List[str]]
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = [item.strip() for item in value.split(',') if item.strip()]
+        if isinstance(value, (list, tuple)) and all(isinstance(item, str) for item in value):
+            return list(value)
+    errors.append(f"{where}: недопустимое значение {value!r}")
+    return default
+
+
+def _build(cls, raw: Dict, section: str, errors: List[str]):
+    defaults = cls()
+    values = {}
+    for item in fields(cls):
+        if item.name in raw:
+            values[item.name] = _coerce(raw[item.name], getattr(defaults, item.name),
+                                        f"{section}['{item.name}']", errors)
+    return cls(**values)
+
+
+def _validate(settings: Settings, errors: List[str]) -> None:
+    if not settings.telegram.token:
+        errors.append("Токен Telegram не указан (TELEGRAM_CONFIG['token'])")
+    if not settings.telegram.chat_id:
+        errors.append("Chat ID не указан (TELEGRAM_CONFIG['chat_id'])")
+    if not settings.parser.base_url:
+        errors.append("Базовый URL не указан (PARSER_CONFIG['base_url'])")
+    elif not settings.parser.base_url.startswith(('http://', 'https://')):
+        errors.append(f"Базовый URL должен начинаться с http:// или https://: {settings.parser.base_url}")
+    if settings.parser.timeout <= 0:
+        errors.append("PARSER_CONFIG['timeout'] должен быть больше нуля")
+    if settings.parser.transport not in ('requests', 'httpx'):
+        errors.append(f"PARSER_CONFIG['transport']: 'requests' или 'httpx', а не {settings.parser.transport!r}")
+    if settings.notification.check_interval <= 0:
+        errors.append("NOTIFICATION_CONFIG['check_interval'] должен быть больше нуля")
+    if settings.filter.future_days < 0:
+        errors.append("FILTER_CONFIG['future_days'] не может быть отрицательным")
+    if settings.proxy.enabled and not settings.proxy.proxies():
+        errors.append("PROXY_CONFIG включён, но адреса http/https не указаны")
+    if str(settings.logging.level).upper() not in LOG_LEVELS:
+        errors.append(f"LOGGING_CONFIG['level']: одно из {', '.join(LOG_LEVELS)}")
+    if settings.logging.rotation not in ('external', 'size', 'time'):
+        errors.append("LOGGING_CONFIG['rotation']: 'external', 'size' или 'time'")
+
+
+def build_settings(sections: Dict[str, Dict], source: str = "") -> Settings:
+    """Проверка разделов и сборка Settings; все ошибки сообщаются разом"""
+    errors: List[str] = []
+    typed = {}
+    for name, (attribute, cls) in TYPED_SECTIONS.items():
+        raw = sections.get(name) or {}
+        if not isinstance(raw, dict):
+            errors.append(f"{name} должен быть словарём")
+            raw = {}
+        typed[attribute] = _build(cls, raw, name, errors)
+    settings = Settings(**typed, sections=sections, source=source)
+    _validate(settings, errors)
+    if errors:
+        raise SettingsError("; ".join(errors))
+    return settings
+
+
+def _section_name(name: str) -> str:
+    """'telegram' и 'TELEGRAM_CONFIG' - один и тот же раздел"""
+    name = name.upper()
+    return name if name.endswith('_CONFIG') else f"{name}_CONFIG"
+
+
+def _read_python(path: str) -> Dict[str, Dict]:
+    # Модуль исполняется заново при каждом чтении и не попадает в sys.modules
+    spec = importlib.util.spec_from_file_location('_quizplease_config', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return {name: dict(value) for name, value in vars(module).items()
+            if name.endswith('_CONFIG') and isinstance(value, dict)}
+
+
+def _read_toml(path: str) -> Dict[str, Dict]:
+    try:
+        import tomllib
+    except ImportError:  # Python < 3.11
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise SettingsError("Для config.toml на Python < 3.11 установите пакет tomli")
+    with open(path, 'rb') as f:
+        data = tomllib.load(f)
+    return {_section_name(name): dict(value) for name, value in data.items() if isinstance(value, dict)}
+
+
+def _env_value(value: str) -> Any:
+    """Значения окружения: JSON (числа, true/false, списки) или строка как есть"""
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def _read_env(environ) -> Dict[str, Dict]:
+    sections: Dict[str, Dict] = {}
+    for name, value in environ.items():
+        if not name.startswith(ENV_PREFIX) or '__' not in name or name == CONFIG_PATH_ENV:
+            continue
+        section, _, key = name[len(ENV_PREFIX):].partition('__')
+        if section and key:
+            sections.setdefault(_section_name(section), {})[key.lower()] = _env_value(value)
+    return sections
+
+
+def default_config_path() -> Optional[str]:
+    """QUIZPLEASE_CONFIG, иначе модуль config на sys.path (как при import config), иначе config.toml рядом"""
+    path = os.environ.get(CONFIG_PATH_ENV)
+    if path:
+        return path
+    try:
+        spec = importlib.util.find_spec('config')
+    except (ImportError, ValueError):
+        spec = None
+    if spec and spec.origin and spec.origin.endswith('.py'):
+        return spec.origin
+    toml_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.toml')
+    return toml_path if os.path.exists(toml_path) else None
+
+
+class SettingsLoader:
+    """Загрузка настроек и дешёвая проверка их изменения"""
+
+    def __init__(self, path: str = None, environ=None):
+        self.path = path or default_config_path()
+        self.environ = os.environ if environ is None else environ
+        self._fingerprint = None
+        self._sections: Optional[Dict[str, Dict]] = None
+
+    def fingerprint(self) -> Tuple:
+        """Время изменения и размер файла плюс переменные окружения проекта"""
+        try:
+            stat = os.stat(self.path) if self.path else None
+            file_part = (stat.st_mtime_ns, stat.st_size) if stat else None
+        except OSError:
+            file_part = None
+        env_part = tuple(sorted((k, v) for k, v in self.environ.items() if k.startswith(ENV_PREFIX)))
+        return file_part, env_part
+
+    def read_sections(self) -> Dict[str, Dict]:
+        """Все разделы из файла и окружения без проверки (кэшируются до изменения файла)"""
+        fingerprint = self.fingerprint()
+        if self._sections is not None and fingerprint == self._fingerprint:
+            return self._sections
+
+        sections: Dict[str, Dict] = {}
+        if self.path and os.path.exists(self.path):
+            reader = _read_toml if self.path.endswith('.toml') else _read_python
+            sections = reader(self.path)
+        for name, values in _read_env(self.environ).items():
+            sections[name] = {**(sections.get(name) or {}), **values}
+
+        self._sections, self._fingerprint = sections, fingerprint
+        return sections
+
+    def section(self, name: str) -> Dict:
+        """Раздел без проверки; пустой словарь, если файла или раздела нет"""
+        try:
+            return dict(self.read_sections().get(name) or {})
+        except Exception as e:
+            logger.debug(f"Не удалось прочитать раздел {name}: {str(e)}")
+            return {}
+
+    def load(self) -> Settings:
+        """Проверенные настройки; SettingsError, если их нет или они неверны"""
+        try:
+            sections = self.read_sections()
+        except SettingsError:
+            raise
+        except Exception as e:
+            raise SettingsError(f"Не удалось прочитать {self.path}: {e}") from e
+        if not sections:
+            raise SettingsError(f"Файл настроек не найден (config.py, config.toml или {CONFIG_PATH_ENV})")
+        return build_settings(sections, source=self.path or 'env')
+
+    def reload_if_changed(self, current: Settings = None) -> Optional[Settings]:
+        """
+        Новые настройки, если файл или окружение изменились, иначе None.
+        Ошибочные настройки не применяются: остаются прежние
+        """
+        if self._sections is not None and self.fingerprint() == self._fingerprint:
+            return None
+        try:
+            settings = self.load()
+        except SettingsError as e:
+            # Ошибка сообщается один раз на изменение, а не на каждый запуск
+            self._fingerprint = self.fingerprint()
+            logger.error(f"❌ Новые настройки не применены, работают прежние: {e}")
+            return None
+        if current is not None and asdict(settings) == asdict(current):
+            return None
+        logger.info(f"🔧 Настройки перечитаны из {settings.source}")
+        return settings
@@ -0,0 +1,469 @@
+"""
+Замеры слоя хранения на синтетических расписаниях от 100 до 1 000 000 игр:
+снимок в JSON (GameStorage.save_games / load_games), история из опорных
+снимков и изменений, лента изменений, колоночная выгрузка и сравнение
+снимков (find_new_games, find_changed_games, SnapshotDiff).
+
+Каждый замер выполняется в отдельном процессе, поэтому пик памяти (RSS)
+относится только к нему. Результаты сохраняются в JSON и сравниваются
+с результатами другого коммита:
+
+    python src/storage_benchmark.py                                  # до 100 000 игр
+    python src/storage_benchmark.py --sizes 1000,1000000 --cases history,diff
+    python src/storage_benchmark.py --output before.json
+    python src/storage_benchmark.py --compare before.json            # код 1 при замедлении
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import statistics
+import tempfile
+import subprocess
+import multiprocessing
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import List, Dict, Callable, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows: пик памяти процесса недоступен
+    resource = None
+
+from extract_classic_games import Game, GameStorage, SnapshotDiff
+from history_store import HistoryStore
+from change_feed import ChangeFeed
+from columnar_export import ColumnarHistory
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+
+# Доли игр, которые меняются между двумя синтетическими запусками
+CHURN = 0.01  # Игра исчезла из расписания, вместо неё появилась новая
+FLIPS = 0.05  # Места закончились или освободились
+
+MONTH_NAMES = ['января', 'февраля', 'марта', 'апреля', 'мая', 'июня', 'июля',
+               'августа', 'сентября', 'октября', 'ноября', 'декабря']
+WEEKDAY_NAMES = ['Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница', 'Суббота', 'Воскресенье']
+VENUES = [('Бар "Сосед"', 'ул. Театральная, 30'), ('Паб "Овертайм"', 'ул. Глаголева, 3'),
+          ('Кафе "Ключ"', 'пр. Мира, 14'), ('Лофт "Этажи"', 'ул. Гагарина, 2'),
+          ('Ресторан "Рыба"', 'наб. Петра Великого, 1')]
+TITLES = [('classic', 'Квиз, плиз! KLG'), ('music', 'Квиз, плиз! [music] KLG'),
+          ('cinema', 'Квиз, плиз! [кино и сериалы] KLG'), ('themed', 'Квиз, плиз! [новички] KLG')]
+
+
+def _availability(rng: random.Random) -> Dict:
+    if rng.random() < 0.7:
+        return {'status': 'Есть места', 'button_text': 'Записаться',
+                'availability_type': 'active', 'is_available': True}
+    return {'status': 'Нет мест! Но можно записаться в резерв', 'button_text': 'Записаться в резерв',
+            'availability_type': 'reserve', 'is_available': False}
+
+
+def make_game(number: int, rng: random.Random, extracted_at: str) -> Game:
+    """Игра, похожая на разобранную со страницы (цена уже разобрана)"""
+    day = datetime(2026, 1, 1) + timedelta(days=number % 365)
+    game_type, title = TITLES[number % len(TITLES)]
+    place, address = VENUES[number % len(VENUES)]
+    return Game(
+        id=f"game_{number}",
+        title=title,
+        game_number=f"#{number}",
+        date=f"{day.day} {MONTH_NAMES[day.month - 1]}, {WEEKDAY_NAMES[day.weekday()]}",
+        time=rng.choice(['19:00', '19:30', '20:00']),
+        place=place,
+        address=address,
+        price="600₽ с человека, наличные или картой",
+        registration_url=f"https://klg.quizplease.ru/game-page?id={number}",
+        extracted_at=extracted_at,
+        game_type=game_type,
+        price_amount=600,
+        price_currency='RUB',
+        price_unit='person',
+        payment_methods=['cash', 'card'],
+        **_availability(rng)
+    )
+
+
+def make_snapshot(size: int, seed: int = 0) -> List[Game]:
+    rng = random.Random(seed)
+    extracted_at = datetime(2026, 1, 1).isoformat()
+    return [make_game(number, rng, extracted_at) for number in range(size)]
+
+
+def next_snapshot(games: List[Game], seed: int = 1) -> List[Game]:
+    """
+    Следующий запуск: у всех игр новое время разбора, у FLIPS игр сменилась
+    доступность, CHURN игр пропали и столько же новых добавилось в конец
+    """
+    rng = random.Random(seed)
+    extracted_at = datetime(2026, 1, 1, 0, 30).isoformat()
+    removed = max(1, int(len(games) * CHURN)) if games else 0
+    kept = games[removed:]
+    result = []
+    for game in kept:
+        if rng.random() < FLIPS:
+            changed = _availability(rng) if game.is_available else {
+                'status': 'Есть места', 'button_text': 'Записаться',
+                'availability_type': 'active', 'is_available': True}
+            result.append(replace(game, extracted_at=extracted_at, game_hash="", **changed))
+        else:
+            result.append(replace(game, extracted_at=extracted_at))
+    first_new = int(games[-1].game_number.lstrip('#')) + 1 if games else 0
+    result.extend(make_game(number, rng, extracted_at) for number in range(first_new, first_new + removed))
+    return result
+
+
+def snapshot_pair(size: int) -> List[List[Game]]:
+    """Два последовательных запуска: [предыдущий, текущий]"""
+    previous = make_snapshot(size)
+    return [previous, next_snapshot(previous)]
+
+
+def _peak_rss_kb() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # macOS отдаёт байты
+
+
+def _timestamps():
+    """Возрастающие метки времени запусков (история отбрасывает повторные)"""
+    moment = datetime(2026, 1, 2)
+    while True:
+        moment += timedelta(minutes=30)
+        yield moment.isoformat()
+
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+
+# Замер: (рабочая папка, число игр) -> (подготовка, замеряемое действие).
+# Подготовка выполняется один раз и не замеряется; действие повторяется repeat раз
+Bench = Callable[[str, int], Tuple[Callable[[], None], Callable[[], object]]]
+
+
+def bench_snapshot_save(work_dir: str, size: int):
+    storage = GameStorage(work_dir, history_config={'columnar_export': False})
+    snapshots = []
+
+    def setup():
+        snapshots.extend(snapshot_pair(size))
+        storage.save_games(snapshots[0])
+
+    def run():
+        snapshots.reverse()  # Каждый раз сохраняется другой снимок
+        return storage.save_games(snapshots[0])
+    return setup, run
+
+
+def bench_snapshot_load(work_dir: str, size: int):
+    storage = GameStorage(work_dir, history_config={'columnar_export': False})
+    return (lambda: storage.save_games(make_snapshot(size))), storage.load_games
+
+
+def _bench_history_save(columnar: bool):
+    def bench(work_dir: str, size: int):
+        storage = GameStorage(work_dir, history_config={'columnar_export': columnar})
+        snapshots = []
+
+        def setup():
+            snapshots.extend(snapshot_pair(size))
+            storage._save_to_history(snapshots[0])
+
+        def run():
+            snapshots.reverse()
+            storage._save_to_history(snapshots[0])
+        return setup, run
+    return bench
+
+
+def bench_history_keyframe(work_dir: str, size: int):
+    history = HistoryStore(os.path.join(work_dir, 'history'), keyframe_every=1)
+    games = []
+    timestamps = _timestamps()
+    return (lambda: games.extend(game.to_dict() for game in make_snapshot(size))), \
+        (lambda: history.append(games, next(timestamps)))
+
+
+def _write_history(work_dir: str, size: int, deltas: int = 8) -> Tuple[str, List[Dict], List[Dict]]:
+    """История: опорный снимок и deltas запусков с изменениями после него"""
+    directory = os.path.join(work_dir, 'history')
+    history = HistoryStore(directory)
+    snapshots = [[game.to_dict() for game in games] for games in snapshot_pair(size)]
+    timestamps = _timestamps()
+    for run in range(deltas + 1):
+        history.append(snapshots[run % 2], next(timestamps))
+    return directory, snapshots[0], snapshots[1]
+
+
+def bench_history_cold_append(work_dir: str, size: int):
+    """Первая запись после перезапуска: восстановление состояния от опорного снимка"""
+    state = {}
+    timestamps = _timestamps()
+
+    def setup():
+        state['directory'], state['previous'], _ = _write_history(work_dir, size)
+        for _ in range(16):
+            next(timestamps)
+
+    def run():
+        HistoryStore(state['directory']).append(state['previous'], next(timestamps))
+    return setup, run
+
+
+def bench_history_state_at(work_dir: str, size: int):
+    state = {}
+
+    def setup():
+        state['history'] = HistoryStore(_write_history(work_dir, size)[0])
+    return setup, lambda: state['history'].state_at(datetime(2100, 1, 1).isoformat())
+
+
+def bench_change_feed_record(work_dir: str, size: int):
+    storage = GameStorage(work_dir, history_config={'columnar_export': False})
+    snapshots = []
+
+    def setup():
+        snapshots.extend(snapshot_pair(size))
+
+    def run():
+        snapshots.reverse()
+        return storage.record_changes(snapshots[0], snapshots[1])
+    return setup, run
+
+
+def bench_change_feed_read(work_dir: str, size: int):
+    feed = ChangeFeed(work_dir)
+
+    def setup():
+        previous, current = snapshot_pair(size)
+        GameStorage(work_dir, history_config={'columnar_export': False}).record_changes(current, previous)
+    return setup, lambda: feed.read(0)
+
+
+def bench_columnar_append(work_dir: str, size: int):
+    columns = ColumnarHistory(os.path.join(work_dir, 'columns'))
+    games = []
+    timestamps = _timestamps()
+    return (lambda: games.extend(game.to_dict() for game in make_snapshot(size))), \
+        (lambda: columns.append_runs([(next(timestamps), games)]))
+
+
+def _bench_diff(method: str):
+    def bench(work_dir: str, size: int):
+        storage = GameStorage(work_dir, history_config={'columnar_export': False})
+        snapshots = []
+
+        def setup():
+            snapshots.extend(snapshot_pair(size))
+        return setup, lambda: getattr(storage, method)(snapshots[1], snapshots[0])
+    return bench
+
+
+def bench_snapshot_diff(work_dir: str, size: int):
+    """Потоковое сравнение, как в QuizPleaseMonitor.run: игра за игрой"""
+    snapshots = []
+
+    def setup():
+        snapshots.extend(snapshot_pair(size))
+
+    def run():
+        diff = SnapshotDiff(snapshots[0])
+        for game in snapshots[1]:
+            diff.add(game)
+        return diff
+    return setup, run
+
+
+# Имя замера -> (хранилище / способ сериализации, функция замера)
+CASES: Dict[str, Tuple[str, Bench]] = {
+    'snapshot.save': ('json', bench_snapshot_save),
+    'snapshot.load': ('json', bench_snapshot_load),
+    'history.save': ('jsonl delta', _bench_history_save(columnar=False)),
+    'history.save_columnar': ('jsonl delta + columns', _bench_history_save(columnar=True)),
+    'history.keyframe': ('jsonl keyframe', bench_history_keyframe),
+    'history.cold_append': ('jsonl delta', bench_history_cold_append),
+    'history.state_at': ('jsonl delta', bench_history_state_at),
+    'change_feed.record': ('jsonl events', bench_change_feed_record),
+    'change_feed.read': ('jsonl events', bench_change_feed_read),
+    'columnar.append': ('array columns', bench_columnar_append),
+    'diff.find_new_games': ('memory', _bench_diff('find_new_games')),
+    'diff.find_changed_games': ('memory', _bench_diff('find_changed_games')),
+    'diff.snapshot_diff': ('memory', bench_snapshot_diff),
+}
+
+
+def run_case(name: str, size: int, repeat: int) -> Dict:
+    """Один замер в текущем процессе"""
+    backend, bench = CASES[name]
+    work_dir = tempfile.mkdtemp(prefix='quizplease_bench_')
+    try:
+        setup, run = bench(work_dir, size)
+        setup()
+        rss_before = _peak_rss_kb()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        peak_rss = _peak_rss_kb()
+        disk_bytes = _dir_size(work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    median = statistics.median(timings)
+    return {
+        'case': name,
+        'backend': backend,
+        'size': size,
+        'repeat': repeat,
+        'best_ms': round(min(timings) * 1000, 3),
+        'median_ms': round(median * 1000, 3),
+        'per_game_us': round(median * 1e6 / size, 3),
+        'peak_rss_kb': peak_rss,
+        # Прирост пика памяти за время замера (без подготовки данных)
+        'rss_growth_kb': None if peak_rss is None else peak_rss - rss_before,
+        'disk_bytes': disk_bytes,
+    }
+
+
+def _child(connection, name: str, size: int, repeat: int) -> None:
+    logging.disable(logging.WARNING)
+    try:
+        connection.send(run_case(name, size, repeat))
+    except Exception as e:
+        connection.send({'case': name, 'size': size, 'error': f"{type(e).__name__}: {str(e)}"})
+    finally:
+        connection.close()
+
+
+def run_isolated(name: str, size: int, repeat: int) -> Dict:
+    """Замер в отдельном процессе: пик памяти не смешивается с другими замерами"""
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_child, args=(sender, name, size, repeat))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        # Например, процесс завершён системой из-за нехватки памяти
+        result = {'case': name, 'size': size, 'error': f"процесс завершился с кодом {process.exitcode}"}
+    process.join()
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict], baseline: List[Dict], threshold: float) -> List[Dict]:
+    """Замеры, ставшие медленнее или прожорливее базовых более чем на threshold"""
+    previous = {(item['case'], item['size']): item for item in baseline if 'error' not in item}
+    regressions = []
+    for item in results:
+        old = previous.get((item['case'], item['size']))
+        if not old or 'error' in item:
+            continue
+        for metric in ('median_ms', 'rss_growth_kb'):
+            before, after = old.get(metric), item.get(metric)
+            # Мелкие абсолютные значения слишком шумные для сравнения
+            if before is None or after is None or before < (1 if metric == 'median_ms' else 1024):
+                continue
+            ratio = after / before
+            if ratio > 1 + threshold:
+                regressions.append({'case': item['case'], 'size': item['size'], 'metric': metric,
+                                    'before': before, 'after': after, 'ratio': round(ratio, 2)})
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Замеры хранения и сравнения снимков")
+    arg_parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                            help="Числа игр через запятую, например 100,1000,1000000")
+    arg_parser.add_argument('--cases', help="Замеры или их группы через запятую: history,diff.find_new_games")
+    arg_parser.add_argument('--repeat', type=int, default=5, help="Число повторов каждого замера")
+    arg_parser.add_argument('--output', help="Записать результаты в JSON файл")
+    arg_parser.add_argument('--json', action='store_true', help="Вывести результаты в JSON")
+    arg_parser.add_argument('--compare', metavar='FILE', help="Сравнить с результатами из JSON файла")
+    arg_parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Допустимое ухудшение при сравнении (0.2 = 20%%)")
+    args = arg_parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    names = list(CASES)
+    if args.cases:
+        prefixes = [item.strip() for item in args.cases.split(',')]
+        names = [name for name in names if any(name == p or name.startswith(f"{p}.") for p in prefixes)]
+        if not names:
+            print(f"Нет замеров: {args.cases}. Доступны: {', '.join(CASES)}", file=sys.stderr)
+            return 2
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'repeat': args.repeat,
+            'churn': CHURN,
+            'flips': FLIPS,
+        },
+        'results': [],
+    }
+
+    if not args.json:
+        print(f"{'Замер':<26}{'Игр':>9}{'Медиана, мс':>14}{'мкс/игра':>11}{'Пик RSS, МБ':>13}"
+              f"{'Прирост, МБ':>13}{'Диск, МБ':>10}")
+    for size in sizes:
+        for name in names:
+            result = run_isolated(name, size, args.repeat)
+            report['results'].append(result)
+            if args.json:
+                continue
+            if 'error' in result:
+                print(f"{name:<26}{size:>9}  ошибка: {result['error']}")
+                continue
+            peak = '-' if result['peak_rss_kb'] is None else f"{result['peak_rss_kb'] / 1024:.1f}"
+            growth = '-' if result['rss_growth_kb'] is None else f"{result['rss_growth_kb'] / 1024:.1f}"
+            print(f"{name:<26}{size:>9}{result['median_ms']:>14.1f}{result['per_game_us']:>11.2f}"
+                  f"{peak:>13}{growth:>13}{result['disk_bytes'] / 1048576:>10.1f}", flush=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report['results'], baseline.get('results', []), args.threshold)
+        report['baseline'] = baseline.get('meta', {})
+        report['regressions'] = regressions
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    elif args.compare:
+        commit = report['baseline'].get('commit') or args.compare
+        if not regressions:
+            print(f"Ухудшений относительно {commit} нет")
+        for item in regressions:
+            print(f"⚠️ {item['case']} ({item['size']} игр): {item['metric']} "
+                  f"{item['before']} -> {item['after']} (x{item['ratio']})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""
+Подписчики с персональными фильтрами и рассылка уведомлений по ним
+"""
+
+import os
+import sys
+import json
+import time
+import bisect
+import asyncio
+import logging
+from dataclasses import dataclass, asdict, field
+from typing import List, Dict, Set, Optional, Iterable
+
+from game_dates import parse_weekday
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Subscriber:
+    """Подписчик и его фильтры. Пустой фильтр означает «без ограничений»"""
+    chat_id: str
+    name: str = ""
+    cities: List[str] = field(default_factory=list)  # поддомены: 'klg', 'spb'
+    only_active: bool = False  # только игры со свободными местами
+    weekdays: List[int] = field(default_factory=list)  # 0 = понедельник
+    venues: List[str] = field(default_factory=list)  # подстроки места или адреса
+    max_price: Optional[int] = None  # не дороже, рублей
+    game_types: List[str] = field(default_factory=lambda: ['classic'])  # пустой список - все типы
+    enabled: bool = True
+
+    def to_dict(self) -> Dict:
+        """Преобразование в словарь"""
+        return asdict(self)
+
+
+class SubscriptionStore:
+    """Хранение подписчиков в JSON файле"""
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self._subscribers: Dict[str, Subscriber] = {}
+        self._index: Optional['SubscriptionIndex'] = None
+        self.load()
+
+    def load(self) -> None:
+        """Загрузка подписчиков из файла"""
+        self._subscribers = {}
+        self._index = None
+        if not os.path.exists(self.filepath):
+            return
+
+        try:
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for item in data:
+                try:
+                    subscriber = Subscriber(**item)
+                    self._subscribers[str(subscriber.chat_id)] = subscriber
+                except TypeError as e:
+                    logger.warning(f"Пропущен некорректный подписчик: {str(e)}")
+            logger.info(f"Загружено {len(self._subscribers)} подписчиков из {self.filepath}")
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке подписчиков: {str(e)}")
+
+    def save(self) -> None:
+        """Сохранение подписчиков в файл"""
+        tmp_path = f"{self.filepath}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump([s.to_dict() for s in self._subscribers.values()], f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.filepath)
+
+    def add(self, subscriber: Subscriber) -> None:
+        """Добавление или обновление подписчика"""
+        self._subscribers[str(subscriber.chat_id)] = subscriber
+        self._index = None
+        self.save()
+
+    def remove(self, chat_id: str) -> bool:
+        """Удаление подписчика"""
+        removed = self._subscribers.pop(str(chat_id), None)
+        if removed:
+            self._index = None
+            self.save()
+        return removed is not None
+
+    def get(self, chat_id: str) -> Optional[Subscriber]:
+        return self._subscribers.get(str(chat_id))
+
+    def all(self) -> List[Subscriber]:
+        return list(self._subscribers.values())
+
+    @property
+    def index(self) -> 'SubscriptionIndex':
+        """Индекс строится один раз и сбрасывается при изменении подписчиков"""
+        if self._index is None:
+            self._index = SubscriptionIndex(self._subscribers.values())
+        return self._index
+
+
+class SubscriptionIndex:
+    """
+    Инвертированный индекс фильтров: для каждого измерения хранит
+    подписчиков по значению фильтра и отдельно тех, у кого фильтр не задан.
+    Подходящие подписчики игры находятся пересечением множеств,
+    без перебора всех подписчиков для каждой игры.
+    """
+
+    def __init__(self, subscribers: Iterable[Subscriber]):
+        self.all_ids: Set[str] = set()
+        self.by_city: Dict[str, Set[str]] = {}
+        self.any_city: Set[str] = set()
+        self.by_weekday: Dict[int, Set[str]] = {}
+        self.any_weekday: Set[str] = set()
+        self.by_venue: Dict[str, Set[str]] = {}
+        self.any_venue: Set[str] = set()
+        self.only_active: Set[str] = set()
+        # Лимиты цены по возрастанию и подписчики в том же порядке: отсекаемые - префикс списка
+        self.price_limits: List[int] = []
+        self.price_chat_ids: List[str] = []
+        self.by_type: Dict[str, Set[str]] = {}
+        self.any_type: Set[str] = set()
+
+        for subscriber in subscribers:
+            if not subscriber.enabled:
+                continue
+            chat_id = str(subscriber.chat_id)
+            self.all_ids.add(chat_id)
+            self._add(chat_id, [c.lower() for c in subscriber.cities], self.by_city, self.any_city)
+            self._add(chat_id, subscriber.weekdays, self.by_weekday, self.any_weekday)
+            self._add(chat_id, [v.lower() for v in subscriber.venues], self.by_venue, self.any_venue)
+            self._add(chat_id, subscriber.game_types, self.by_type, self.any_type)
+            if subscriber.only_active:
+                self.only_active.add(chat_id)
+            if subscriber.max_price is not None:
+                self.price_limits.append(subscriber.max_price)
+                self.price_chat_ids.append(chat_id)
+
+        order = sorted(range(len(self.price_limits)), key=self.price_limits.__getitem__)
+        self.price_limits = [self.price_limits[i] for i in order]
+        self.price_chat_ids = [self.price_chat_ids[i] for i in order]
+
+    @staticmethod
+    def _add(chat_id: str, values: List, index: Dict, wildcard: Set[str]) -> None:
+        if not values:
+            wildcard.add(chat_id)
+            return
+        for value in values:
+            index.setdefault(value, set()).add(chat_id)
+
+    def match(self, game) -> Set[str]:
+        """Chat ID подписчиков, которым подходит игра"""
+        if not self.all_ids:
+            return set()
+
+        result = self.any_city | self.by_city.get((getattr(game, 'city', '') or '').lower(), set())
+        if not result:
+            return result
+
+        result &= self.any_type | self.by_type.get(getattr(game, 'game_type', 'classic'), set())
+        if not result:
+            return result
+
+        weekday = parse_weekday(game.date)
+        result &= self.any_weekday | self.by_weekday.get(weekday, set())
+        if not result:
+            return result
+
+        # Подстроки мест сопоставляются по числу различных фильтров, а не подписчиков
+        venue_text = f"{game.place} {game.address}".lower()
+        venue_ids = set(self.any_venue)
+        for venue, chat_ids in self.by_venue.items():
+            if venue in venue_text:
+                venue_ids |= chat_ids
+        result &= venue_ids
+
+        if game.availability_type != 'active':
+            result -= self.only_active
+
+        # Цена сравнивается числом, разобранным парсером; неизвестная цена не отсекается
+        amount = getattr(game, 'price_amount', None)
+        if amount is not None:
+            result = result.difference(self.price_chat_ids[:bisect.bisect_left(self.price_limits, amount)])
+
+        return result
+
+
+class SubscriptionFanOut:
+    """Рассылка игр подписчикам с учётом лимитов Telegram API"""
+
+    def __init__(self, telegram, store: SubscriptionStore, max_concurrency: int = 20,
+                 messages_per_second: float = 25.0, per_chat_interval: float = 1.0):
+        self.telegram = telegram
+        self.store = store
+        self.max_concurrency = max_concurrency
+        self.messages_per_second = messages_per_second
+        self.per_chat_interval = per_chat_interval
+
+    def plan(self, games: List) -> Dict[str, List[str]]:
+        """
+        Сопоставление игр подписчикам: каждое сообщение рендерится один раз
+        и переиспользуется для всех получателей
+        """
+        index = self.store.index
+        deliveries: Dict[str, List[str]] = {}
+
+        for game in games:
+            chat_ids = index.match(game)
+            if not chat_ids:
+                continue
+            message = game.to_telegram_message()
+            for chat_id in chat_ids:
+                deliveries.setdefault(chat_id, []).append(message)
+
+        return deliveries
+
+    def deliver(self, games: List) -> Dict[str, int]:
+        """Отправка подходящих игр всем подписчикам"""
+        deliveries = self.plan(games)
+        if not deliveries:
+            logger.info("Нет подписчиков для рассылки")
+            return {'chats': 0, 'sent': 0, 'failed': 0}
+
+        total = sum(len(messages) for messages in deliveries.values())
+        logger.info(f"Рассылка {total} сообщений {len(deliveries)} подписчикам")
+
+        started = time.monotonic()
+        results = self._run(deliveries)
+        sent = sum(ok for chat_results in results.values() for ok in chat_results)
+        failed = total - sent
+        logger.info(f"✓ Рассылка завершена за {time.monotonic() - started:.1f}с: "
+                    f"отправлено {sent}, ошибок {failed}")
+        return {'chats': len(deliveries), 'sent': sent, 'failed': failed}
+
+    def enqueue(self, outbox, games: List, keys: Dict[str, str], priority: int = 1) -> int:
+        """
+        Постановка рассылки в outbox (outbox.Outbox) вместо немедленной отправки.
+        keys - ключ события для каждой игры (game.id); ключ сообщения - ключ
+        события и чат, поэтому повтор того же запуска не дублирует рассылку
+        """
+        messages = []
+        for game in games:
+            chat_ids = self.store.index.match(game)
+            if not chat_ids:
+                continue
+            text = game.to_telegram_message()
+            for chat_id in sorted(chat_ids):
+                messages.append({'key': f"{keys[game.id]}:{chat_id}", 'chat_id': chat_id,
+                                 'text': text, 'priority': priority})
+        return outbox.enqueue(messages) if messages else 0
+
+    def deliver_outbox(self, outbox) -> Dict[str, int]:
+        """
+        Доставка рассылки из outbox. Каждое сообщение отмечается доставленным
+        или неудачным; неудачные повторяются при следующих запусках
+        """
+        result = {'chats': 0, 'sent': 0, 'failed': 0}
+        chats = set()
+        attempted = set()
+        started = time.monotonic()
+        while True:
+            # Каждое сообщение - не больше одной попытки за доставку
+            due = [message for message in outbox.due(max_priority=sys.maxsize, limit=1000, subscribers=True)
+                   if message.id not in attempted]
+            if not due:
+                break
+            attempted.update(message.id for message in due)
+            deliveries: Dict[str, List] = {}
+            for message in due:
+                deliveries.setdefault(message.chat_id, []).append(message)
+            results = self._run({chat_id: [message.text for message in messages]
+                                 for chat_id, messages in deliveries.items()})
+            for chat_id, messages in deliveries.items():
+                for message, ok in zip(messages, results[chat_id]):
+                    if ok:
+                        outbox.mark_sent(message)
+                        result['sent'] += 1
+                    else:
+                        outbox.mark_failed(message, "ошибка отправки подписчику")
+                        result['failed'] += 1
+            chats.update(deliveries)
+
+        result['chats'] = len(chats)
+        if chats:
+            logger.info(f"✓ Рассылка завершена за {time.monotonic() - started:.1f}с: "
+                        f"отправлено {result['sent']}, ошибок {result['failed']}")
+        return result
+
+    def _run(self, deliveries: Dict[str, List[str]]) -> Dict[str, List[bool]]:
+        """Отправка {чат: сообщения}; результат - успех каждого сообщения"""
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self._deliver_all(deliveries))
+        finally:
+            loop.close()
+
+    async def _deliver_all(self, deliveries: Dict[str, List[str]]) -> Dict[str, List[bool]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limiter = _RateLimiter(self.messages_per_second)
+        tasks = [self._deliver_chat(chat_id, messages, semaphore, limiter)
+                 for chat_id, messages in deliveries.items()]
+        return dict(zip(deliveries, await asyncio.gather(*tasks)))
+
+    async def _deliver_chat(self, chat_id: str, messages: List[str],
+                            semaphore: asyncio.Semaphore, limiter: '_RateLimiter') -> List[bool]:
+        """Сообщения одному чату уходят последовательно, разные чаты — параллельно"""
+        results = []
+        async with semaphore:
+            for i, message in enumerate(messages):
+                if i:
+                    await asyncio.sleep(self.per_chat_interval)
+                await limiter.wait()
+                results.append(await self._send_with_retry(chat_id, message))
+        return results
+
+    async def _send_with_retry(self, chat_id: str, message: str, attempts: int = 3) -> bool:
+        for attempt in range(1, attempts + 1):
+            try:
+                await self.telegram.send_message_async(message, chat_id=chat_id)
+                return True
+            except Exception as e:
+                retry_after = getattr(e, 'retry_after', None)
+                if retry_after and attempt < attempts:
+                    logger.warning(f"Лимит Telegram для чата {chat_id}, ждём {retry_after}с")
+                    await asyncio.sleep(float(retry_after))
+                    continue
+                logger.error(f"Ошибка отправки подписчику {chat_id}: {str(e)}")
+                return False
+        return False
+
+
+class _RateLimiter:
+    """Общий лимит сообщений в секунду на всех получателей"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
@@ -60,15 +60,7 @@ class TelegramBot:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             
-            async def send():
-                await self.bot.send_message(
-                    chat_id=self.chat_id,
-                    text=text,
-                    parse_mode=parse_mode,
-                    disable_web_page_preview=False
-                )
-            
-            loop.run_until_complete(send())
+            loop.run_until_complete(self.send_message_async(text, parse_mode=parse_mode))
             loop.close()
             
             logger.info("✓ Сообщение отправлено в Telegram")
@@ -78,6 +70,15 @@ class TelegramBot:
             logger.error(f"Ошибка при отправке сообщения: {str(e)}")
             return False
 
+    async def send_message_async(self, text: str, chat_id: str = None, parse_mode: str = 'Markdown') -> None:
+        """Асинхронная отправка сообщения в указанный чат (по умолчанию - основной)"""
+        await self.bot.send_message(
+            chat_id=chat_id or self.chat_id,
+            text=text,
+            parse_mode=parse_mode,
+            disable_web_page_preview=False
+        )
+
     def send_game_notification(self, game) -> bool:
         """Отправка уведомления об игре"""
         try:
@@ -93,16 +94,29 @@ class TelegramBot:
             logger.info("Нет игр для отправки сводки")
             return True
 
+        return self.send_message(self.format_summary(games))
+
+    def format_summary(self, games: List) -> str:
+        """Текст сводки по играм"""
+        if not games:
+            return "📊 *СВОДКА ПО ИГРАМ КВИЗ, ПЛИЗ! KLG*\n\nИгр не найдено"
+
+        # Счётчики и список резерва за один проход по играм
         total_games = len(games)
-        active_games = [g for g in games if g.availability_type == 'active']
-        reserve_games = [g for g in games if g.availability_type == 'reserve']
+        active_count = 0
+        reserve_games = []
+        for game in games:
+            if game.availability_type == 'active':
+                active_count += 1
+            elif game.availability_type == 'reserve':
+                reserve_games.append(game)
 
         summary_lines = [
             f"📊 *СВОДКА ПО ИГРАМ КВИЗ, ПЛИЗ! KLG*",
             f"🕐 *Обновлено:* {games[0].extracted_at}",
             "",
             f"📋 *Всего игр:* {total_games}",
-            f"✅ *Доступно для записи:* {len(active_games)}",
+            f"✅ *Доступно для записи:* {active_count}",
             f"⚠️  *Запись в резерв:* {len(reserve_games)}",
         ]
 
@@ -119,8 +133,7 @@ class TelegramBot:
             f"[📅 Открыть полное расписание](https://klg.quizplease.ru/schedule)"
         ])
 
-        summary = "\n".join(summary_lines)
-        return self.send_message(summary)
+        return "\n".join(summary_lines)
 
     def send_test_message(self) -> bool:
         """Отправка тестового сообщения"""
@@ -0,0 +1,196 @@
+"""
+Чтение обновлений Telegram-бота (getUpdates) постранично.
+
+UpdateReader запрашивает обновления страницами по offset и сохраняет номер
+последнего обработанного обновления в data/telegram_updates.json, поэтому
+каждое обновление скачивается один раз - и при тысячах сообщений, и после
+перезапуска. ChatIndex накапливает чаты из всех прочитанных обновлений
+в data/telegram_chats.json: их не нужно искать повторно.
+
+Режим read_only не подтверждает обновления (offset не передаётся): так
+диагностика может посмотреть ожидающие сообщения, не забирая их у бота.
+Без подтверждения Telegram отдаёт только первую страницу (до 100 обновлений)
+и при каждом запуске ту же самую; ChatIndex учитывает каждое обновление
+один раз, поэтому счётчики чатов от повторного чтения не растут.
+"""
+
+import os
+import json
+import time
+import logging
+import requests
+from typing import List, Dict, Iterator, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Больше getUpdates за один запрос не отдаёт
+MAX_PAGE_SIZE = 100
+
+# Где в обновлении лежит чат
+CHAT_PATHS = ('message', 'edited_message', 'channel_post', 'edited_channel_post', 'my_chat_member', 'chat_member')
+
+
+class TelegramApiError(Exception):
+    """Telegram ответил ok=false"""
+
+    def __init__(self, description: str, status: int = None):
+        super().__init__(description)
+        self.status = status
+
+
+def _write_json(path: str, data) -> None:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def update_chat(update: Dict) -> Optional[Dict]:
+    """Чат, к которому относится обновление"""
+    for name in CHAT_PATHS:
+        if name in update:
+            return update[name].get('chat')
+    callback = update.get('callback_query') or {}
+    return (callback.get('message') or {}).get('chat')
+
+
+class ChatIndex:
+    """Все чаты, встреченные в обновлениях: id -> описание и время последнего сообщения"""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.chats: Dict[str, Dict] = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.chats = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Не удалось прочитать индекс чатов {path}: {str(e)}")
+
+    def __len__(self) -> int:
+        return len(self.chats)
+
+    def add(self, update: Dict) -> bool:
+        """
+        Учёт обновления; False - обновление этого чата уже учтено. Номера
+        обновлений растут, поэтому повторно прочитанные без подтверждения
+        (read_only) обновления отсекаются по last_update_id чата
+        """
+        chat = update_chat(update)
+        if not chat or 'id' not in chat:
+            return False
+        entry = self.chats.setdefault(str(chat['id']), {'updates': 0})
+        update_id = update.get('update_id')
+        last_update_id = entry.get('last_update_id')
+        if update_id is not None and last_update_id is not None and update_id <= last_update_id:
+            return False
+        entry.update({
+            'type': chat.get('type', 'private'),
+            'username': chat.get('username', ''),
+            'first_name': chat.get('first_name', ''),
+            'last_name': chat.get('last_name', ''),
+            'title': chat.get('title', ''),
+            'last_update_id': update_id,
+        })
+        entry['updates'] += 1
+        self._dirty = True
+        return True
+
+    def save(self) -> None:
+        if self.path and self._dirty:
+            _write_json(self.path, self.chats)
+            self._dirty = False
+
+
+class UpdateReader:
+    """
+    Постраничное чтение getUpdates. Обновление считается обработанным
+    (и не будет скачано снова), когда его подтвердили через acknowledge
+    или когда генератор iter_updates получил управление обратно
+    """
+
+    def __init__(self, token: str, state_file: str = None, session: requests.Session = None,
+                 allowed_updates: Iterable[str] = None, page_size: int = MAX_PAGE_SIZE,
+                 chats: ChatIndex = None, read_only: bool = False):
+        self.api_url = f"https://api.telegram.org/bot{token}"
+        self.state_file = state_file
+        self.session = session or requests.Session()
+        self.allowed_updates = list(allowed_updates) if allowed_updates else None
+        self.page_size = min(page_size, MAX_PAGE_SIZE)
+        self.chats = chats
+        self.read_only = read_only
+        self.last_update_id: Optional[int] = None
+        self._saved_update_id: Optional[int] = None
+        self._load_state()
+
+    def _load_state(self) -> None:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                self.last_update_id = json.load(f).get('last_update_id')
+            self._saved_update_id = self.last_update_id
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать состояние обновлений {self.state_file}: {str(e)}")
+
+    def save(self) -> None:
+        """Сохранение номера последнего обработанного обновления и индекса чатов"""
+        if self.state_file and not self.read_only and self.last_update_id != self._saved_update_id:
+            _write_json(self.state_file, {'last_update_id': self.last_update_id})
+            self._saved_update_id = self.last_update_id
+        if self.chats is not None:
+            self.chats.save()
+
+    def fetch(self, timeout: int = 0) -> List[Dict]:
+        """
+        Одна страница обновлений после последнего обработанного.
+        timeout > 0 - long polling: ждать новые обновления до timeout секунд
+        """
+        params = {'limit': self.page_size, 'timeout': timeout}
+        if self.last_update_id is not None and not self.read_only:
+            # offset подтверждает Telegram все предыдущие обновления
+            params['offset'] = self.last_update_id + 1
+        if self.allowed_updates is not None:
+            params['allowed_updates'] = json.dumps(self.allowed_updates)
+
+        response = self.session.get(f"{self.api_url}/getUpdates", params=params, timeout=timeout + 10)
+        try:
+            data = response.json()
+        except ValueError:
+            response.raise_for_status()
+            raise TelegramApiError(f"Некорректный ответ: {response.text[:100]}", response.status_code)
+        if not data.get('ok'):
+            raise TelegramApiError(data.get('description', 'Неизвестная ошибка'), response.status_code)
+        return data.get('result', [])
+
+    def acknowledge(self, update: Dict) -> None:
+        """Отметка обновления обработанным"""
+        update_id = update.get('update_id')
+        if not self.read_only and update_id is not None and (
+                self.last_update_id is None or update_id > self.last_update_id):
+            self.last_update_id = update_id
+        if self.chats is not None:
+            self.chats.add(update)
+
+    def iter_updates(self, timeout: int = 0, follow: bool = False) -> Iterator[Dict]:
+        """
+        Поток обновлений страница за страницей. Без follow поток кончается,
+        когда накопившиеся обновления прочитаны; с follow - ждёт новые
+        (long polling с timeout). Состояние сохраняется после каждой страницы
+        """
+        try:
+            while True:
+                page = self.fetch(timeout)
+                for update in page:
+                    yield update
+                    self.acknowledge(update)
+                self.save()
+                # Без подтверждения следующий запрос вернул бы ту же страницу
+                if self.read_only or (not follow and len(page) < self.page_size):
+                    return
+                if follow and not page:
+                    time.sleep(0 if timeout else 1)
+        finally:
+            self.save()